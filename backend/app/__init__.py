@@ -59,6 +59,10 @@ def create_app(config_name='default'):
     # Registrar handlers
     register_error_handlers(app)
     
+    # Registrar comandos CLI (flask classify-worker, ...)
+    from .cli import register_commands
+    register_commands(app)
+    
     # Ruta de prueba
     @app.route('/test')
     def test():
@@ -0,0 +1,16 @@
+# backend/app/api/metrics.py
+from flask import Blueprint, Response
+from app.services.llm_metrics import render_metrics
+
+# Inicializar Blueprint
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    Métricas de Prometheus de los procesos de gunicorn, sumadas entre workers. Las de
+    clasificación (Gemini, reglas, clasificador local) las expone `flask classify-worker`
+    en CLASSIFY_WORKER_METRICS_PORT
+    """
+    content, content_type = render_metrics()
+    return Response(content, content_type=content_type)
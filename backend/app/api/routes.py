@@ -6,6 +6,7 @@ from .webhooks import webhook_bp
 from .patient_data import patient_bp
 from .financial_data import financial_bp  # Comentado: blueprint financiero aún no existe
 from .health_data import health_bp  # Importar blueprint de salud
+from .metrics import metrics_bp
 
 def init_routes(app):
     """Inicializar y registrar todos los blueprints"""
@@ -15,6 +16,7 @@ def init_routes(app):
     app.register_blueprint(patient_bp, url_prefix='/api/patient')
     app.register_blueprint(financial_bp)  
     app.register_blueprint(health_bp)  
+    app.register_blueprint(metrics_bp)
     
     # Ruta de verificación de estado
     @app.route('/api/health-check', methods=['GET'])
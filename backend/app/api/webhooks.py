@@ -1,10 +1,18 @@
 #backend/app/api/webhooks.py
 import os
 import logging
-from flask import Blueprint, request, jsonify
-from app.services.classification_service import ClassificationService
-from app.models.caregiver import Caregiver
+from flask import Blueprint, request, jsonify, current_app
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from app.services.admission_control import AdmissionController
+from app.services.classification_queue import ClassificationQueue
+from app.services.message_dedup import MessageDeduplicator
+from app.services.caregiver_resolver import caregiver_resolver
+from app.services.media_downloader import media_downloader
+from app.services.outbound_queue import OutboundQueue
+from app.utils.message_parser import InboundRequest, provider_registry
 from app.models.message import Message
+from app.models.media_attachment import MediaAttachment
 from app.extensions import db
 
 # Configuración de logging
@@ -21,8 +29,16 @@ if not VERIFY_TOKEN:
     logger.warning("WHATSAPP_VERIFY_TOKEN no configurado en .env. Usando token predeterminado.")
     VERIFY_TOKEN = "serena-secret-key"  # Token predeterminado solo como fallback
 
-# Inicializar servicio de clasificación
-classification_service = ClassificationService()
+# Cola de clasificación: los workers (flask classify-worker) procesan los mensajes
+classification_queue = ClassificationQueue()
+
+# Límite de carga: con la cola llena se guarda sin clasificar o se responde 503
+admission_controller = AdmissionController(classification_queue)
+
+# Detección de reenvíos del proveedor (mismo ID de mensaje)
+message_deduplicator = MessageDeduplicator(
+    max_size=int(os.getenv("WEBHOOK_DEDUP_CACHE_SIZE", 10000))
+)
 
 @webhook_bp.route("/test", methods=["GET"])
 def test_webhook():
@@ -54,104 +70,86 @@ def whatsapp_webhook():
         return "Parámetros incorrectos", 400
     
     elif request.method == "POST":
-        try:
-            # Detectar tipo de proveedor primero
-            provider_type = detect_provider(request)
-            logger.info(f"Proveedor detectado: {provider_type}")
-            
-            # Obtener los datos según el tipo de proveedor
-            if provider_type == "twilio" and request.form:
-                data = request.form.to_dict()
-                logger.info(f"Datos de formulario recibidos: {data}")
-                return process_twilio_message(data)
-            elif request.is_json:
-                data = request.get_json(silent=True)
-                
-                if not data:
-                    logger.error("No se encontraron datos JSON o formulario válidos")
-                    return jsonify({"status": "error", "message": "No data provided"}), 400
-                
-                if provider_type == "whatsapp_cloud":
-                    return process_whatsapp_cloud_message(data)
-                elif provider_type == "twilio":
-                    return process_twilio_message(data)
-                elif provider_type == "messagebird":
-                    return process_messagebird_message(data)
-            
-            # Si no se pudo determinar el proveedor o no hay datos válidos
-            logger.warning("Formato de datos no reconocido, intentando procesamiento genérico")
-            
-            # Intentar obtener datos de cualquier fuente
-            data = {}
-            if request.form:
-                data = request.form.to_dict()
-            elif request.is_json:
-                data = request.get_json(silent=True) or {}
-            
-            return process_generic_message(data)
-                    
-        except Exception as e:
-            logger.error(f"Error procesando webhook: {e}")
-            return jsonify({"status": "error", "message": str(e)}), 500
+        with admission_controller.admission() as decision:
+            if decision == AdmissionController.REJECT:
+                return overloaded_response()
+            return receive_messages(defer=decision == AdmissionController.DEFER)
+
+@webhook_bp.route("/whatsapp/status", methods=["POST"])
+def whatsapp_status_callback():
+    """StatusCallback de Twilio: estado de entrega de los mensajes salientes"""
+    message_sid = request.form.get("MessageSid")
+    status = request.form.get("MessageStatus")
+    if not message_sid or not status:
+        return jsonify({"status": "error", "message": "Faltan MessageSid o MessageStatus"}), 400
+    
+    if not OutboundQueue().update_delivery_status(message_sid, status, request.form.get("ErrorCode")):
+        logger.info(f"Estado de entrega para mensaje desconocido: {message_sid}")
+    return jsonify({"status": "success"}), 200
+
+@webhook_bp.route("/stats", methods=["GET"])
+def webhook_stats():
+    """Estado del control de admisión y de la cola de clasificación, para monitoreo"""
+    stats = admission_controller.stats()
+    stats["backlog_depth"] = admission_controller.backlog_depth()
+    stats["jobs"] = classification_queue.count_by_status()
+    return jsonify({"status": "success", "data": stats}), 200
+
+def overloaded_response():
+    """Respuesta 503 para que el proveedor reintente más tarde"""
+    response = jsonify({"status": "error", "message": "Servicio sobrecargado, reintente más tarde"})
+    response.headers["Retry-After"] = str(admission_controller.retry_after())
+    return response, 503
 
-def detect_provider(request):
+def receive_messages(defer=False):
     """
-    Detecta el proveedor basado en los headers y formato del mensaje
+    Decodifica la petición y guarda sus mensajes
+
+    Args:
+        defer (bool): Si es True, los mensajes se guardan sin encolar su
+            clasificación inmediata (webhook sobrecargado)
     """
-    # Comprobar headers específicos de cada proveedor
-    user_agent = request.headers.get("User-Agent", "").lower()
-    
-    if "twilio" in user_agent:
-        return "twilio"
-    elif "messagebird" in user_agent:
-        return "messagebird"
-    
-    # Si no se detecta por headers, intentar por el formato de los datos
-    # Para form-data (application/x-www-form-urlencoded) como envía Twilio
-    if request.form:
-        data = request.form.to_dict()
-        if "SmsMessageSid" in data or "MessageSid" in data:
-            return "twilio"
-    
-    # Para JSON (application/json)
-    if request.is_json:
-        data = request.get_json(silent=True)
-        if not data:
-            return "unknown"
+    try:
+        # Decodificar el cuerpo una sola vez y elegir el adaptador del proveedor
+        inbound = InboundRequest.from_flask(request)
+        if not inbound.payload:
+            logger.error("No se encontraron datos JSON o formulario válidos")
+            return jsonify({"status": "error", "message": "No data provided"}), 400
         
-        # WhatsApp Cloud API format detection
-        if "object" in data and data.get("object") == "whatsapp_business_account":
-            return "whatsapp_cloud"
-        # Twilio format detection en JSON (menos común)
-        elif "SmsMessageSid" in data:
-            return "twilio"
-        # MessageBird format detection
-        elif "message" in data and "originator" in data.get("message", {}):
-            return "messagebird"
-    
-    # Default
-    return "unknown"
+        adapter = provider_registry.resolve(inbound)
+        messages, ignored = adapter.parse(inbound.payload)
+        logger.info(f"Proveedor detectado: {adapter.name} ({len(messages)} mensajes)")
+        
+        if adapter.batch:
+            return process_message_batch(messages, ignored, defer=defer)
+        
+        if not messages:
+            logger.error("No se pudieron extraer datos básicos del mensaje")
+            return jsonify({"status": "error", "message": "Could not extract message data"}), 400
+        return process_single_message(messages[0], defer=defer)
+                
+    except Exception as e:
+        logger.error(f"Error procesando webhook: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
 
-def process_twilio_message(data):
+def process_single_message(inbound_message, defer=False):
     """
-    Procesa un mensaje recibido a través de Twilio
+    Procesa un mensaje individual (Twilio, MessageBird o formato genérico)
     """
-    logger.info(f"Procesando mensaje de Twilio: {data}")
-    
     try:
-        # Extraer información del mensaje
-        sender = data.get('From', '')
-        body = data.get('Body', '')
-        message_sid = data.get('MessageSid', '')
+        sender = inbound_message.sender
+        body = inbound_message.body
+        message_sid = inbound_message.message_id
         
-        # Eliminar el prefijo 'whatsapp:' si existe
-        if sender and sender.startswith('whatsapp:'):
-            sender = sender[9:]
+        # Los reintentos del proveedor se confirman sin escribir en la BD ni clasificar
+        if message_deduplicator.is_duplicate(message_sid):
+            logger.info(f"Mensaje duplicado ignorado: {message_sid}")
+            return duplicate_response()
         
-        logger.info(f"Mensaje de WhatsApp recibido: De: {sender}, Contenido: {body}")
+        logger.info(f"Mensaje de WhatsApp recibido ({inbound_message.provider}): De: {sender}, ID: {message_sid}")
         
-        # Buscar al cuidador en la base de datos
-        caregiver = Caregiver.query.filter_by(phone=sender).first()
+        # Buscar al cuidador (caché en memoria; normaliza 'whatsapp:' y variantes del número)
+        caregiver = caregiver_resolver.resolve(sender)
         
         if not caregiver:
             logger.warning(f"Cuidador no encontrado para el número: {sender}")
@@ -161,29 +159,51 @@ def process_twilio_message(data):
                 "message": "Cuidador no registrado"
             }), 400
         
-        # Clasificar y procesar el mensaje
-        if body:
+        # Guardar el mensaje y encolar su clasificación (las notas de voz y fotos pueden no traer texto)
+        if body or inbound_message.media:
             try:
                 # Crear nuevo mensaje en la BD
                 message = Message(
                     content=body,
                     whatsapp_message_id=message_sid,
-                    caregiver_id=caregiver.id,
+                    caregiver_id=caregiver.caregiver_id,
                     patient_id=caregiver.patient_id
                 )
                 db.session.add(message)
-                db.session.commit()
+                attachments = [
+                    MediaAttachment(message=message, url=url, content_type=content_type)
+                    for url, content_type in inbound_message.media
+                ]
+                db.session.add_all(attachments)
+                db.session.flush()  # Para obtener el ID
                 
-                logger.info(f"Mensaje guardado con ID: {message.id}")
+                # El trabajo se confirma en la misma transacción que el mensaje
+                if body:
+                    classification_queue.enqueue(message, commit=False, deferred=defer)
+                db.session.commit()
+                message_deduplicator.mark_seen(message_sid)
                 
-                # Clasificar el mensaje usando el servicio de IA
-                classification_result = classification_service.gemini_service.classify_message(body)
+                # Los adjuntos se descargan en segundo plano, fuera de la respuesta al proveedor
+                if attachments:
+                    media_downloader.submit(
+                        current_app._get_current_object(), [attachment.id for attachment in attachments]
+                    )
+                    if not body:
+                        logger.info(f"Mensaje {message.id} guardado con {len(attachments)} adjuntos")
+                        return jsonify({"status": "success", "message": "Adjuntos recibidos"}), 200
                 
-                # Guardar los datos clasificados
-                classification_service._save_classification_data(message.id, classification_result, caregiver.patient_id)
+                if defer:
+                    logger.info(f"Mensaje guardado con ID: {message.id}, clasificación diferida")
+                    return jsonify({"status": "success", "message": "Mensaje recibido, clasificación diferida"}), 200
+                logger.info(f"Mensaje guardado con ID: {message.id} y encolado para clasificación")
+                return jsonify({"status": "success", "message": "Mensaje recibido, clasificación en cola"}), 200
                 
-                logger.info(f"Mensaje clasificado y guardado correctamente")
-                return jsonify({"status": "success", "message": "Mensaje procesado y clasificado"}), 200
+            except IntegrityError:
+                # Otra entrega del mismo mensaje se guardó en paralelo
+                db.session.rollback()
+                message_deduplicator.mark_seen(message_sid)
+                logger.info(f"Mensaje duplicado detectado al guardar: {message_sid}")
+                return duplicate_response()
                 
             except Exception as e:
                 db.session.rollback()
@@ -194,35 +214,94 @@ def process_twilio_message(data):
             return jsonify({"status": "error", "message": "Mensaje sin contenido"}), 400
     
     except Exception as e:
-        logger.error(f"Error procesando mensaje de Twilio: {e}")
+        logger.error(f"Error procesando mensaje de {inbound_message.provider}: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
-def process_whatsapp_cloud_message(data):
-    """
-    Procesa un mensaje recibido directamente a través de WhatsApp Cloud API
-    """
-    logger.info(f"Procesando mensaje de WhatsApp Cloud API (no implementado aún)")
-    return jsonify({"status": "not_implemented", "message": "WhatsApp Cloud API processing not implemented yet"}), 200
+def duplicate_response():
+    """Respuesta 200 para reenvíos, así el proveedor deja de reintentar"""
+    return jsonify({"status": "duplicate", "message": "Mensaje ya recibido"}), 200
 
-def process_messagebird_message(data):
-    """
-    Procesa un mensaje recibido a través de MessageBird
+def process_message_batch(inbound_messages, ignored=0, defer=False):
     """
-    logger.info(f"Procesando mensaje de MessageBird (no implementado aún)")
-    return jsonify({"status": "not_implemented", "message": "MessageBird processing not implemented yet"}), 200
-
-def process_generic_message(data):
+    Procesa un webhook con varios mensajes (WhatsApp Cloud API): todos se
+    guardan y encolan en una sola transacción.
     """
-    Intenta procesar un mensaje de formato desconocido
-    """
-    logger.warning(f"Proveedor no reconocido. Intentando procesamiento genérico.")
-    # Intenta buscar campos comunes en diferentes formatos
-    sender = data.get('From') or data.get('from') or data.get('sender')
-    body = data.get('Body') or data.get('body') or data.get('text') or data.get('content')
+    logger.info(f"Procesando lote de {len(inbound_messages)} mensajes ({ignored} ignorados)")
+    
+    stats = {"received": len(inbound_messages), "stored": 0, "duplicates": 0, "unknown_senders": 0, "ignored": ignored, "deferred": defer}
+    if not inbound_messages:
+        return jsonify({"status": "success", **stats}), 200
     
-    if sender and body:
-        logger.info(f"Mensaje genérico detectado - De: {sender}, Contenido: {body}")
-        return jsonify({"status": "success", "message": "Generic message processed"}), 200
-    else:
-        logger.error(f"No se pudieron extraer datos básicos del mensaje")
-        return jsonify({"status": "error", "message": "Could not extract message data"}), 400
\ No newline at end of file
+    # Quitar reenvíos, tanto dentro del payload como ya guardados
+    # Los mensajes sin ID del proveedor no se pueden comparar: se guardan todos
+    unique = {}
+    for item in inbound_messages:
+        if item.message_id:
+            unique.setdefault(item.message_id, item)
+    duplicates = message_deduplicator.find_duplicates(list(unique))
+    fresh = [
+        item for item in inbound_messages
+        if not item.message_id or (unique[item.message_id] is item and item.message_id not in duplicates)
+    ]
+    stats["duplicates"] = len(inbound_messages) - len(fresh)
+    
+    # Resolver todos los remitentes con una sola consulta
+    identities = caregiver_resolver.resolve_many([item.sender for item in fresh])
+    rows = []
+    for item in fresh:
+        caregiver = identities.get(item.sender)
+        if not caregiver:
+            logger.warning(f"Cuidador no encontrado para el número: {item.sender}")
+            stats["unknown_senders"] += 1
+            continue
+        rows.append({
+            "content": item.body,
+            "whatsapp_message_id": item.message_id,
+            "caregiver_id": caregiver.caregiver_id,
+            "patient_id": caregiver.patient_id
+        })
+    
+    if rows:
+        try:
+            # Un INSERT para todos los mensajes y otro para sus trabajos de clasificación;
+            # las filas vuelven en el orden de llegada para encolar en ese orden
+            inserted = db.session.execute(
+                insert(Message).returning(
+                    Message.id, Message.whatsapp_message_id, Message.caregiver_id, Message.patient_id,
+                    sort_by_parameter_order=True
+                ), rows
+            ).all()
+            classification_queue.enqueue_many(inserted, commit=False, deferred=defer)
+            db.session.commit()
+        except IntegrityError:
+            # Una entrega paralela guardó alguno de los mensajes; se reintenta sin duplicados
+            db.session.rollback()
+            logger.info("Conflicto de mensajes duplicados en lote, reintentando uno por uno")
+            inserted = store_messages_individually(rows, defer=defer)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error guardando lote de mensajes: {e}")
+            return jsonify({"status": "error", "message": str(e)}), 500
+        
+        for row in inserted:
+            message_deduplicator.mark_seen(row.whatsapp_message_id)
+        stats["stored"] = len(inserted)
+        stats["duplicates"] += len(rows) - len(inserted)
+    
+    logger.info(f"Lote de mensajes guardado: {stats}")
+    return jsonify({"status": "success", **stats}), 200
+
+def store_messages_individually(rows, defer=False):
+    """Guarda cada mensaje en su propia transacción, omitiendo los ya registrados"""
+    inserted = []
+    for row in rows:
+        try:
+            message = Message(**row)
+            db.session.add(message)
+            db.session.flush()
+            classification_queue.enqueue(message, commit=False, deferred=defer)
+            db.session.commit()
+            inserted.append(message)
+        except IntegrityError:
+            db.session.rollback()
+    return inserted
@@ -0,0 +1,161 @@
+# backend/app/cli.py
+import signal
+import click
+from flask import current_app
+
+def register_commands(app):
+    """Registrar comandos de línea de comandos (flask <comando>)"""
+
+    @app.cli.command('classify-worker')
+    @click.option('--concurrency', default=1, show_default=True, type=int,
+                  help='Número de hilos que procesan la cola en paralelo')
+    @click.option('--batch-size', default=1, show_default=True, type=int,
+                  help='Mensajes clasificados juntos en una sola llamada al modelo')
+    @click.option('--once', is_flag=True,
+                  help='Procesa los trabajos listos y termina')
+    @click.option('--metrics-port', default=None, type=int,
+                  help='Puerto de las métricas de Prometheus (por defecto CLASSIFY_WORKER_METRICS_PORT; 0 las desactiva)')
+    def classify_worker(concurrency, batch_size, once, metrics_port):
+        """Procesa la cola de clasificaciones pendientes"""
+        from .services.classification_worker import ClassificationWorker
+        from .services.llm_metrics import WORKER_METRICS_PORT, start_metrics_server
+
+        worker = ClassificationWorker(
+            current_app._get_current_object(),
+            concurrency=concurrency,
+            batch_size=batch_size
+        )
+
+        if once:
+            processed = worker.drain()
+            click.echo(f"Trabajos procesados: {processed}")
+            return
+
+        def handle_signal(signum, frame):
+            click.echo("Señal recibida, deteniendo workers...")
+            worker.stop()
+
+        signal.signal(signal.SIGINT, handle_signal)
+        signal.signal(signal.SIGTERM, handle_signal)
+
+        port = WORKER_METRICS_PORT if metrics_port is None else metrics_port
+        if port:
+            start_metrics_server(port)
+            click.echo(f"Métricas de Prometheus en http://0.0.0.0:{port}/metrics")
+
+        worker.start()
+        while not worker.wait(1):
+            pass
+
+    @app.cli.command('download-media')
+    @click.option('--limit', default=500, show_default=True, type=int,
+                  help='Número máximo de adjuntos a descargar')
+    def download_media(limit):
+        """Descarga los adjuntos pendientes o fallidos (con intentos disponibles)"""
+        from .models.media_attachment import MediaAttachment
+        from .services.media_downloader import media_downloader
+
+        app = current_app._get_current_object()
+        attachment_ids = [row.id for row in MediaAttachment.query.with_entities(MediaAttachment.id).filter(
+            MediaAttachment.status.in_([MediaAttachment.STATUS_PENDING, MediaAttachment.STATUS_FAILED]),
+            MediaAttachment.attempts < app.config['MEDIA_MAX_ATTEMPTS']
+        ).order_by(MediaAttachment.id).limit(limit)]
+
+        # El pool está acotado: se programa por tandas a medida que se liberan lugares
+        pending = list(attachment_ids)
+        while pending:
+            scheduled = media_downloader.submit(app, pending[:app.config['MEDIA_DOWNLOAD_WORKERS']])
+            pending = pending[scheduled:]
+            media_downloader.wait()
+        media_downloader.shutdown()
+
+        downloaded = MediaAttachment.query.filter(
+            MediaAttachment.id.in_(attachment_ids),
+            MediaAttachment.status == MediaAttachment.STATUS_DOWNLOADED
+        ).count() if attachment_ids else 0
+        click.echo(f"Adjuntos descargados: {downloaded}/{len(attachment_ids)}")
+
+    @app.cli.command('replay-dead-letters')
+    @click.option('--concurrency', default=4, show_default=True, type=int,
+                  help='Clasificaciones simultáneas')
+    @click.option('--rate', default=2.0, show_default=True, type=float,
+                  help='Llamadas al modelo por segundo')
+    @click.option('--limit', default=None, type=int,
+                  help='Número máximo de dead letters a reprocesar')
+    @click.option('--metrics-port', default=0, type=int,
+                  help='Expone las métricas de Prometheus en este puerto mientras dura el reproceso')
+    def replay_dead_letters(concurrency, rate, limit, metrics_port):
+        """Reprocesa las clasificaciones que agotaron sus reintentos"""
+        from .models.dead_letter import DeadLetter
+        from .services.dead_letter_replay import DeadLetterReplayer
+        from .services.llm_metrics import start_metrics_server
+
+        dead_letter_ids = [dead_letter.id for dead_letter in DeadLetter.get_open(limit)]
+        if not dead_letter_ids:
+            click.echo("No hay dead letters pendientes")
+            return
+
+        if metrics_port:
+            start_metrics_server(metrics_port)
+        replayer = DeadLetterReplayer(
+            current_app._get_current_object(),
+            concurrency=concurrency,
+            rate=rate
+        )
+        with click.progressbar(length=len(dead_letter_ids), label='Reprocesando') as progress:
+            summary = replayer.replay(dead_letter_ids, on_progress=lambda dead_letter_id, resolved: progress.update(1))
+        click.echo(f"Resueltos: {summary['resolved']} | Fallidos: {summary['failed']}")
+
+    @app.cli.command('send-worker')
+    @click.option('--concurrency', default=None, type=int,
+                  help='Envíos simultáneos (por defecto OUTBOUND_CONCURRENCY)')
+    @click.option('--once', is_flag=True,
+                  help='Envía los mensajes listos y termina')
+    def send_worker(concurrency, once):
+        """Envía la cola de mensajes de WhatsApp salientes"""
+        from .services.outbound_queue import OutboundDispatcher
+
+        dispatcher = OutboundDispatcher(current_app._get_current_object(), concurrency=concurrency)
+
+        if once:
+            sent = dispatcher.drain()
+            dispatcher.stop()
+            click.echo(f"Mensajes procesados: {sent}")
+            return
+
+        def handle_signal(signum, frame):
+            click.echo("Señal recibida, deteniendo envíos...")
+            dispatcher.stop()
+
+        signal.signal(signal.SIGINT, handle_signal)
+        signal.signal(signal.SIGTERM, handle_signal)
+
+        dispatcher.start()
+        while not dispatcher.wait(1):
+            pass
+
+    @app.cli.command('train-local-classifier')
+    @click.option('--output', default=None,
+                  help='Archivo .npz del modelo (por defecto LOCAL_CLASSIFIER_PATH)')
+    @click.option('--limit', default=None, type=int,
+                  help='Número máximo de mensajes clasificados a usar')
+    @click.option('--epochs', default=8, show_default=True, type=int,
+                  help='Pasadas sobre los datos de entrenamiento')
+    @click.option('--include-unlabeled', is_flag=True,
+                  help='Usa también los valores sin origen registrado (anteriores a registrarlo)')
+    def train_local_classifier(output, limit, epochs, include_unlabeled):
+        """Entrena el clasificador local con los mensajes ya clasificados por Gemini"""
+        from .services.local_classifier import LocalModel, load_training_data, LOCAL_CLASSIFIER_PATH
+
+        output = output or LOCAL_CLASSIFIER_PATH
+        if not output:
+            raise click.UsageError('Indicar --output o definir LOCAL_CLASSIFIER_PATH')
+
+        texts, label_sets = load_training_data(limit, include_unlabeled=include_unlabeled)
+        if not texts:
+            click.echo("No hay mensajes clasificados para entrenar")
+            return
+
+        model = LocalModel.train(texts, label_sets, epochs=epochs)
+        model.save(output)
+        click.echo(f"Modelo entrenado con {len(texts)} mensajes y {len(model.labels)} subcategorías: {output}")
@@ -6,6 +6,12 @@ from .message import Message
 from .category import Category
 from .subcategory import Subcategory
 from .classified_value import ClassifiedValue
+from .classification_job import ClassificationJob
+from .media_blob import MediaBlob
+from .media_attachment import MediaAttachment
+from .dead_letter import DeadLetter
+from .outbound_message import OutboundMessage
+from .classification_cache_entry import ClassificationCacheEntry
 
 __all__ = [
     'Patient', 
@@ -13,5 +19,11 @@ __all__ = [
     'Message', 
     'Category',
     'Subcategory',
-    'ClassifiedValue'
+    'ClassifiedValue',
+    'ClassificationJob',
+    'MediaBlob',
+    'MediaAttachment',
+    'DeadLetter',
+    'OutboundMessage',
+    'ClassificationCacheEntry'
 ]
\ No newline at end of file
@@ -1,5 +1,6 @@
 # backend/app/models/caregiver.py
 from .base import Base, db
+from ..utils.formatters import phone_variants
 
 class Caregiver(Base):
     """Modelo para representar a un cuidador"""
@@ -19,5 +20,8 @@ class Caregiver(Base):
     
     @staticmethod
     def get_by_phone(phone):
-        """Obtener cuidador por número de teléfono"""
-        return Caregiver.query.filter_by(phone=phone).first()
\ No newline at end of file
+        """Obtener cuidador por número de teléfono (acepta 'whatsapp:' y variantes de formato)"""
+        variants = phone_variants(phone)
+        if not variants:
+            return None
+        return Caregiver.query.filter(Caregiver.phone.in_(variants)).first()
\ No newline at end of file
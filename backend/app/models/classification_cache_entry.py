@@ -0,0 +1,20 @@
+# backend/app/models/classification_cache_entry.py
+from .base import Base, db
+
+class ClassificationCacheEntry(Base):
+    """
+    Resultado de clasificación reutilizable, direccionado por el hash del mensaje
+    normalizado, la versión del prompt y el modelo. Si cambian el prompt o la
+    taxonomía, cambia la versión y las entradas anteriores dejan de coincidir.
+    """
+    __tablename__ = 'classification_cache'
+
+    key = db.Column(db.String(64), nullable=False, unique=True)  # SHA-256
+    prompt_version = db.Column(db.String(64), nullable=False, index=True)
+    model_name = db.Column(db.String(100), nullable=False)
+    result = db.Column(db.Text, nullable=False)  # JSON con categorias y resumen
+    hits = db.Column(db.Integer, nullable=False, default=0)
+    last_hit_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"<ClassificationCacheEntry {self.key[:12]} hits={self.hits}>"
@@ -0,0 +1,41 @@
+# backend/app/models/classification_job.py
+from datetime import datetime
+from .base import Base, db
+
+class ClassificationJob(Base):
+    """
+    Modelo para la cola persistente de clasificaciones pendientes.
+    Cada mensaje recibido genera un trabajo que los workers procesan de forma asíncrona.
+    """
+    __tablename__ = 'classification_jobs'
+
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_DEFERRED = 'deferred'  # Guardado con el webhook sobrecargado; se encola cuando hay capacidad
+    UNFINISHED_STATUSES = (STATUS_PENDING, STATUS_PROCESSING, STATUS_DEFERRED)
+
+    message_id = db.Column(db.Integer, db.ForeignKey('messages.id'), nullable=False, unique=True)
+    shard_key = db.Column(db.Integer, index=True)  # Cuidador o paciente: sus mensajes se clasifican en orden
+    status = db.Column(db.String(20), nullable=False, default=STATUS_PENDING, index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    locked_at = db.Column(db.DateTime)  # Momento en que un worker tomó el trabajo
+    locked_by = db.Column(db.String(100))  # Identificador del worker
+    last_error = db.Column(db.Text)
+    origin = db.Column(db.String(20))  # Quién clasificó el mensaje (ver ClassifiedValue.ORIGIN_*)
+
+    # Relaciones
+    message = db.relationship('Message', backref=db.backref('classification_job', uselist=False))
+
+    def __repr__(self):
+        return f"<ClassificationJob id={self.id} message_id={self.message_id} status={self.status}>"
+
+    @classmethod
+    def count_by_status(cls, status):
+        """
+        Cuenta los trabajos en un estado determinado.
+        """
+        return cls.query.filter_by(status=status).count()
@@ -6,11 +6,17 @@ class ClassifiedValue(Base):  # Cambiado de BaseModel a Base
     Modelo para los valores clasificados extraídos de mensajes.
     """
     __tablename__ = 'classified_values'
+
+    # Quién produjo el valor; NULL en los valores cargados a mano o guardados antes de registrarlo
+    ORIGIN_MODEL = 'modelo'  # Gemini
+    ORIGIN_RULES = 'reglas'
+    ORIGIN_LOCAL = 'local'
     
     message_id = db.Column(db.Integer, db.ForeignKey('messages.id'), nullable=False)
     subcategory_id = db.Column(db.Integer, db.ForeignKey('subcategories.id'), nullable=False)
     value = db.Column(db.Text)
     confidence = db.Column(db.Float)
+    origin = db.Column(db.String(20), index=True)
     
     # Relaciones (message se define como backref desde Message)
     
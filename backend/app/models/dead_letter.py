@@ -0,0 +1,38 @@
+# backend/app/models/dead_letter.py
+from .base import Base, db
+
+class DeadLetter(Base):
+    """
+    Clasificación que agotó sus reintentos. Se conserva con el error, los intentos
+    y los modelos probados para poder reprocesarla (flask replay-dead-letters).
+    """
+    __tablename__ = 'dead_letters'
+
+    STATUS_OPEN = 'open'
+    STATUS_RESOLVED = 'resolved'
+
+    job_id = db.Column(db.Integer, db.ForeignKey('classification_jobs.id'), nullable=False, unique=True)
+    message_id = db.Column(db.Integer, db.ForeignKey('messages.id'), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default=STATUS_OPEN, index=True)
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, nullable=False, default=0)  # Intentos del worker
+    model_name = db.Column(db.String(255))  # Modelos probados, separados por comas
+    replay_attempts = db.Column(db.Integer, nullable=False, default=0)
+    resolved_at = db.Column(db.DateTime)
+
+    # Relaciones
+    job = db.relationship('ClassificationJob', backref=db.backref('dead_letter', uselist=False))
+    message = db.relationship('Message')
+
+    def __repr__(self):
+        return f"<DeadLetter id={self.id} message_id={self.message_id} status={self.status}>"
+
+    @classmethod
+    def get_open(cls, limit=None):
+        """
+        Obtiene las clasificaciones pendientes de reprocesar, las más antiguas primero.
+        """
+        query = cls.query.filter_by(status=cls.STATUS_OPEN).order_by(cls.id)
+        if limit:
+            query = query.limit(limit)
+        return query.all()
@@ -0,0 +1,28 @@
+# backend/app/models/media_attachment.py
+from .base import Base, db
+
+class MediaAttachment(Base):
+    """
+    Adjunto de un mensaje (nota de voz, foto de un comprobante, ...).
+    Se registra al recibir el mensaje y se descarga en segundo plano.
+    """
+    __tablename__ = 'media_attachments'
+
+    STATUS_PENDING = 'pending'
+    STATUS_DOWNLOADED = 'downloaded'
+    STATUS_FAILED = 'failed'
+
+    message_id = db.Column(db.Integer, db.ForeignKey('messages.id'), nullable=False, index=True)
+    url = db.Column(db.Text, nullable=False)  # URL del proveedor (p. ej. MediaUrl0 de Twilio)
+    content_type = db.Column(db.String(100))
+    status = db.Column(db.String(20), nullable=False, default=STATUS_PENDING, index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    blob_id = db.Column(db.Integer, db.ForeignKey('media_blobs.id'))
+
+    # Relaciones
+    message = db.relationship('Message', backref=db.backref('media', lazy=True, cascade="all, delete-orphan"))
+    blob = db.relationship('MediaBlob')
+
+    def __repr__(self):
+        return f"<MediaAttachment id={self.id} message_id={self.message_id} status={self.status}>"
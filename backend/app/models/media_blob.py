@@ -0,0 +1,17 @@
+# backend/app/models/media_blob.py
+from .base import Base, db
+
+class MediaBlob(Base):
+    """
+    Archivo multimedia almacenado en disco, direccionado por el SHA-256 de su contenido.
+    Si dos mensajes traen el mismo archivo, ambos apuntan al mismo blob.
+    """
+    __tablename__ = 'media_blobs'
+
+    sha256 = db.Column(db.String(64), nullable=False, unique=True)
+    size = db.Column(db.Integer, nullable=False)  # Bytes
+    content_type = db.Column(db.String(100))
+    path = db.Column(db.String(255), nullable=False)  # Relativa a MEDIA_STORAGE_DIR
+
+    def __repr__(self):
+        return f"<MediaBlob {self.sha256[:12]} {self.size} bytes>"
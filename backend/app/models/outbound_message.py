@@ -0,0 +1,31 @@
+# backend/app/models/outbound_message.py
+from datetime import datetime
+from .base import Base, db
+
+class OutboundMessage(Base):
+    """
+    Mensaje de WhatsApp saliente (confirmaciones, resúmenes diarios).
+    Se encola y un dispatcher lo envía a Twilio con límite de tasa y reintentos.
+    """
+    __tablename__ = 'outbound_messages'
+
+    STATUS_QUEUED = 'queued'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'  # Aceptado por Twilio; twilio_status sigue la entrega
+    STATUS_FAILED = 'failed'
+
+    to_number = db.Column(db.String(30), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    caregiver_id = db.Column(db.Integer, db.ForeignKey('caregivers.id'))
+    status = db.Column(db.String(20), nullable=False, default=STATUS_QUEUED, index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    locked_at = db.Column(db.DateTime)
+    twilio_sid = db.Column(db.String(64), unique=True)
+    twilio_status = db.Column(db.String(20))  # queued, sent, delivered, read, undelivered, failed
+    error_code = db.Column(db.String(20))
+    last_error = db.Column(db.Text)
+    sent_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"<OutboundMessage id={self.id} to={self.to_number} status={self.status}>"
@@ -0,0 +1,141 @@
+# backend/app/services/admission_control.py
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from flask import current_app
+
+# Configuración de logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class AdmissionController:
+    """
+    Control de admisión del webhook. Cuenta las peticiones en curso del proceso y
+    la profundidad de la cola de clasificación; al superar el límite, los mensajes
+    se guardan sin encolar su clasificación (modo persist_only) o se rechazan con
+    503 y Retry-After (modo reject).
+    """
+
+    ACCEPT = 'accept'
+    DEFER = 'defer'
+    REJECT = 'reject'
+
+    MODE_OFF = 'off'
+    MODE_PERSIST_ONLY = 'persist_only'
+    MODE_REJECT = 'reject'
+
+    def __init__(self, queue):
+        """
+        Args:
+            queue (ClassificationQueue): Cola cuya profundidad se vigila
+        """
+        self.queue = queue
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._backlog_depth = 0
+        self._backlog_checked_at = None
+        self._counters = {self.ACCEPT: 0, self.DEFER: 0, self.REJECT: 0}
+
+    @contextmanager
+    def admission(self):
+        """
+        Decide si se admite una petición y la cuenta como en curso mientras dura
+
+        Yields:
+            str: ACCEPT, DEFER (guardar sin clasificar) o REJECT (responder 503)
+        """
+        decision = self.admit()
+        try:
+            yield decision
+        finally:
+            if decision != self.REJECT:
+                self.release()
+
+    def admit(self):
+        """Registra una petición entrante y devuelve la decisión de admisión"""
+        config = current_app.config
+        mode = config['WEBHOOK_ADMISSION_MODE']
+        backlog = self.backlog_depth() if mode != self.MODE_OFF else 0
+
+        with self._lock:
+            overloaded = mode != self.MODE_OFF and (
+                self._in_flight >= config['WEBHOOK_MAX_IN_FLIGHT']
+                or backlog >= config['WEBHOOK_BACKLOG_HIGH_WATER']
+            )
+            if not overloaded:
+                decision = self.ACCEPT
+            elif mode == self.MODE_REJECT:
+                decision = self.REJECT
+            else:
+                decision = self.DEFER
+            self._counters[decision] += 1
+            if decision != self.REJECT:
+                self._in_flight += 1
+            in_flight = self._in_flight
+
+        if decision != self.ACCEPT:
+            logger.warning(
+                f"Webhook sobrecargado ({in_flight} en curso, {backlog} en cola): {decision}"
+            )
+        return decision
+
+    def release(self):
+        """Marca como terminada una petición admitida"""
+        with self._lock:
+            self._in_flight -= 1
+
+    def backlog_depth(self):
+        """
+        Profundidad de la cola de clasificación. Se consulta a la base como mucho
+        una vez cada WEBHOOK_BACKLOG_CHECK_INTERVAL segundos.
+        """
+        interval = current_app.config['WEBHOOK_BACKLOG_CHECK_INTERVAL']
+        now = time.monotonic()
+        with self._lock:
+            stale = self._backlog_checked_at is None or now - self._backlog_checked_at >= interval
+            if stale:
+                # Los demás hilos usan el valor anterior mientras este consulta
+                self._backlog_checked_at = now
+            else:
+                return self._backlog_depth
+
+        try:
+            depth = self.queue.backlog_depth()
+        except Exception as e:
+            logger.error(f"No se pudo consultar la profundidad de la cola: {e}")
+            return self._backlog_depth
+        with self._lock:
+            self._backlog_depth = depth
+        return depth
+
+    def retry_after(self):
+        """Segundos sugeridos al proveedor antes de reintentar"""
+        return int(current_app.config['WEBHOOK_RETRY_AFTER'])
+
+    def stats(self):
+        """
+        Estado actual para monitoreo
+
+        Returns:
+            dict: Modo, peticiones en curso, profundidad de la cola y contadores
+        """
+        with self._lock:
+            return {
+                "mode": current_app.config['WEBHOOK_ADMISSION_MODE'],
+                "in_flight": self._in_flight,
+                "backlog_depth": self._backlog_depth,
+                "accepted": self._counters[self.ACCEPT],
+                "deferred": self._counters[self.DEFER],
+                "rejected": self._counters[self.REJECT],
+                "shed": self._counters[self.DEFER] + self._counters[self.REJECT]
+            }
+
+    def reset(self):
+        """Reinicia contadores y la profundidad cacheada"""
+        with self._lock:
+            self._in_flight = 0
+            self._backlog_depth = 0
+            self._backlog_checked_at = None
+            self._counters = {self.ACCEPT: 0, self.DEFER: 0, self.REJECT: 0}
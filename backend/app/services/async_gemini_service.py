@@ -0,0 +1,226 @@
+# backend/app/services/async_gemini_service.py
+import os
+import time
+import asyncio
+import logging
+from app.services import llm_metrics
+from app.services.gemini_service import GeminiService, ModelTimeout, MAX_BATCH_SIZE, estimate_tokens
+from app.utils.deadline import DeadlineExceeded
+from app.utils.rate_limit import QuotaLimiter
+
+# Configuración de logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Llamadas simultáneas en vuelo por instancia
+ASYNC_CONCURRENCY = int(os.getenv("GEMINI_ASYNC_CONCURRENCY", 32))
+
+# Cuota del proyecto: peticiones y tokens por minuto
+REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_RPM", 1000))
+TOKENS_PER_MINUTE = float(os.getenv("GEMINI_TPM", 1000000))
+
+# Tokens de respuesta que se reservan por llamada además del prompt
+RESPONSE_TOKEN_ESTIMATE = int(os.getenv("GEMINI_RESPONSE_TOKEN_ESTIMATE", 256))
+
+# Cuota compartida por todas las instancias del proceso
+gemini_quota = QuotaLimiter(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE)
+
+class AsyncGeminiService(GeminiService):
+    """
+    Variante asíncrona de GeminiService para mantener muchas clasificaciones en vuelo
+    desde un solo hilo. Un semáforo limita las llamadas simultáneas y cada llamada
+    espera turno en la cuota de peticiones y tokens por minuto, de modo que la
+    concurrencia no termina en errores de cuota. Caché, prompts, estado de salud de
+    los modelos y métricas son los mismos que los del servicio síncrono.
+    """
+
+    def __init__(self, concurrency=ASYNC_CONCURRENCY, quota=None, **kwargs):
+        """
+        Args:
+            concurrency (int): Llamadas simultáneas al modelo
+            quota (QuotaLimiter, optional): Cuota de peticiones y tokens por minuto
+            **kwargs: Dependencias de GeminiService (health, registry, cache, ...)
+        """
+        super().__init__(**kwargs)
+        self.concurrency = max(1, concurrency)
+        self.quota = quota or gemini_quota
+        self._semaphore = None
+        self._semaphore_loop = None
+
+    async def classify_message(self, message_text, deadline=None):
+        """
+        Clasifica un mensaje (ver GeminiService.classify_message)
+
+        Args:
+            message_text (str): El mensaje original del cuidador
+            deadline (Deadline, optional): Plazo para todos los intentos; al vencer,
+                la llamada en curso se cancela
+
+        Returns:
+            dict: Datos clasificados en categorías estructuradas
+        """
+        started = time.monotonic()
+        prompt_version = self.prompt_version()
+        result = self.cache.get(message_text, prompt_version, self.model_name)
+        cached = result is not None
+        if not cached:
+            result = await self._classify_single(message_text, prompt_version, deadline)
+        self._observe_classification("message", started, [result], cached)
+        return result
+
+    async def classify_messages(self, messages, deadline=None):
+        """
+        Clasifica varios mensajes en lotes de MAX_BATCH_SIZE enviados en paralelo
+
+        Returns:
+            list: Un resultado por mensaje, en el mismo orden que la entrada
+        """
+        started = time.monotonic()
+        prompt_version = self.prompt_version()
+        results = [self.cache.get(text, prompt_version, self.model_name) for text in messages]
+        missing = [i for i, result in enumerate(results) if result is None]
+        chunks = [missing[start:start + MAX_BATCH_SIZE] for start in range(0, len(missing), MAX_BATCH_SIZE)]
+        batch_results = await asyncio.gather(*(
+            self._classify_batch([messages[i] for i in indexes], prompt_version, deadline) for indexes in chunks
+        ))
+        for indexes, chunk_results in zip(chunks, batch_results):
+            for index, result in zip(indexes, chunk_results):
+                results[index] = result
+        self._observe_classification("messages", started, results, not missing)
+        return results
+
+    async def _classify_single(self, message_text, prompt_version, deadline=None):
+        prompt = self._create_classification_prompt(message_text)
+        models = self._candidate_models()
+        try:
+            response, answered_by = await self._generate_content(
+                prompt, self.prompts.compiled().single_schema, models, deadline
+            )
+            result = self._complete_single(self._process_response(response))
+            self.cache.set(message_text, prompt_version, answered_by, result)
+            return result
+        except Exception as e:
+            return {
+                "categorias": [],
+                "resumen": "Error en clasificación",
+                "error": str(e),
+                "modelos": models
+            }
+
+    async def _classify_batch(self, messages, prompt_version, deadline=None):
+        if len(messages) == 1:
+            return [await self._classify_single(messages[0], prompt_version, deadline)]
+
+        results = [None] * len(messages)
+        try:
+            response, answered_by = await self._generate_content(
+                self._create_batch_classification_prompt(messages), self.prompts.compiled().batch_schema,
+                deadline=deadline
+            )
+            batch_data = self._process_response(response)
+            if "error" in batch_data:
+                raise ValueError(batch_data["error"])
+
+            for item in batch_data.get("resultados", []):
+                index = self._batch_index(item.get("id"), len(messages))
+                if index is not None and "resumen" in item:
+                    results[index] = {
+                        "categorias": item.get("categorias", []),
+                        "resumen": item.get("resumen", "")
+                    }
+                    self.cache.set(messages[index], prompt_version, answered_by, results[index])
+        except Exception as e:
+            logger.warning(f"Error en clasificación por lote de {len(messages)} mensajes: {str(e)}")
+
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            logger.info(f"Clasificando individualmente {len(missing)} de {len(messages)} mensajes del lote")
+        singles = await asyncio.gather(*(
+            self._classify_single(messages[i], prompt_version, deadline) for i in missing
+        ))
+        for index, result in zip(missing, singles):
+            results[index] = result
+        return results
+
+    async def _generate_content(self, prompt, schema=None, candidates=None, deadline=None):
+        """
+        Envía el prompt al modelo preferido y, si falla, a los alternativos, dentro del plazo
+
+        Returns:
+            tuple: (respuesta, nombre del modelo que respondió)
+        """
+        first_error = None
+        attempts = 0
+        try:
+            for candidate in candidates or self._candidate_models():
+                if deadline is not None and deadline.expired:
+                    first_error = first_error or DeadlineExceeded(
+                        f"Plazo de {deadline.timeout:g} s agotado antes de probar {candidate}"
+                    )
+                    break
+                if first_error is not None:
+                    logger.info(f"Intentando clasificación con modelo alternativo: {candidate}")
+                attempts += 1
+                try:
+                    return await self._call_model(candidate, prompt, schema, deadline), candidate
+                except Exception as e:
+                    first_error = first_error or e
+            raise first_error
+        finally:
+            if attempts:
+                llm_metrics.ATTEMPTS.observe(attempts)
+
+    async def _call_model(self, model_name, prompt, schema=None, deadline=None):
+        """
+        Una llamada asíncrona dentro del límite de concurrencia y de la cuota. La espera
+        de turno y la llamada usan lo que queda del plazo; si vence durante la llamada,
+        se cancela y cuenta como timeout del modelo.
+        """
+        reserved = estimate_tokens(prompt) + RESPONSE_TOKEN_ESTIMATE
+        semaphore = self._call_slots()
+        await self._within(semaphore.acquire(), deadline, "un turno de llamada")
+        try:
+            await self._within(self.quota.acquire(reserved), deadline, "la cuota de la API")
+            started = time.monotonic()
+            try:
+                model = self.registry.get(model_name)
+                response = await self._within(
+                    model.generate_content_async(prompt, **self._request_options(schema)), deadline, model_name
+                )
+                latency = time.monotonic() - started
+            except DeadlineExceeded as e:
+                self._record_timeout(model_name, deadline)
+                raise ModelTimeout(model_name, str(e)) from e
+            except Exception as e:
+                llm_metrics.record_call(model_name, "error", time.monotonic() - started)
+                self.health.mark_failure(model_name, e)
+                logger.warning(f"Error al clasificar con el modelo {model_name}: {str(e)}")
+                raise
+        finally:
+            semaphore.release()
+        prompt_tokens, response_tokens = self._record_usage(model_name, prompt, response, latency)
+        llm_metrics.record_call(model_name, "success", latency)
+        self.quota.debit(prompt_tokens + response_tokens - reserved)
+        self.health.mark_success(model_name, latency)
+        return response
+
+    def _call_slots(self):
+        """
+        Semáforo de llamadas del bucle de eventos actual: en Python 3.9 (la imagen de
+        Docker) un semáforo queda ligado al bucle en que se creó
+        """
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def _within(self, awaitable, deadline, operation):
+        """Espera `awaitable` como mucho lo que queda del plazo y la cancela si vence"""
+        if deadline is None:
+            return await awaitable
+        try:
+            return await asyncio.wait_for(awaitable, timeout=deadline.remaining())
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"Plazo de {deadline.timeout:g} s agotado esperando {operation}") from None
@@ -0,0 +1,146 @@
+# backend/app/services/caregiver_resolver.py
+import os
+import logging
+from collections import namedtuple
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app.extensions import db
+from app.models.caregiver import Caregiver
+from app.utils.cache import LRUCache
+from app.utils.formatters import normalize_phone, phone_variants
+
+# Configuración de logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Identidad mínima que necesita el webhook para guardar un mensaje
+CaregiverIdentity = namedtuple('CaregiverIdentity', ['caregiver_id', 'patient_id'])
+
+_MISSING = object()
+
+class CaregiverResolver:
+    """
+    Resuelve el teléfono de un remitente a (caregiver_id, patient_id) con caché en memoria.
+    Los remitentes desconocidos también se cachean (por menos tiempo) para que los
+    números de spam no consulten la base de datos en cada mensaje.
+    """
+
+    def __init__(self, ttl=300, negative_ttl=60, max_size=10000):
+        """
+        Args:
+            ttl (float): Segundos de validez de un cuidador encontrado
+            negative_ttl (float): Segundos de validez de un número desconocido
+            max_size (int): Número máximo de teléfonos en caché
+        """
+        self.negative_ttl = negative_ttl
+        self._cache = LRUCache(max_size=max_size, ttl=ttl)
+
+    def resolve(self, phone):
+        """
+        Obtiene la identidad del cuidador asociado a un teléfono
+
+        Args:
+            phone (str): Número del remitente en cualquier formato
+
+        Returns:
+            CaregiverIdentity: Identidad del cuidador, o None si no está registrado
+        """
+        key = normalize_phone(phone)
+        if not key:
+            return None
+
+        cached = self._cache.get(key, _MISSING)
+        if cached is not _MISSING:
+            return cached
+
+        caregiver = Caregiver.get_by_phone(key)
+        if caregiver:
+            identity = CaregiverIdentity(caregiver.id, caregiver.patient_id)
+            self._cache.set(key, identity)
+        else:
+            identity = None
+            self._cache.set(key, None, ttl=self.negative_ttl)
+        return identity
+
+    def resolve_many(self, phones):
+        """
+        Resuelve varios teléfonos con una sola consulta para los que no están en caché
+
+        Args:
+            phones (list): Números de los remitentes en cualquier formato
+
+        Returns:
+            dict: Teléfono recibido -> CaregiverIdentity o None
+        """
+        keys = {phone: normalize_phone(phone) for phone in phones}
+        identities = {}
+        pending = set()
+        for key in set(keys.values()):
+            cached = self._cache.get(key, _MISSING) if key else None
+            if cached is _MISSING:
+                pending.add(key)
+            else:
+                identities[key] = cached
+
+        if pending:
+            variants = [variant for key in pending for variant in phone_variants(key)]
+            rows = db.session.query(Caregiver.id, Caregiver.patient_id, Caregiver.phone).filter(
+                Caregiver.phone.in_(variants)
+            ).all()
+            found = {normalize_phone(row.phone): CaregiverIdentity(row.id, row.patient_id) for row in rows}
+            for key in pending:
+                identity = found.get(key)
+                if identity:
+                    self._cache.set(key, identity)
+                else:
+                    self._cache.set(key, None, ttl=self.negative_ttl)
+                identities[key] = identity
+
+        return {phone: identities[key] for phone, key in keys.items()}
+
+    def invalidate(self, phone):
+        """Descarta la entrada de un teléfono (todas sus variantes comparten la forma normalizada)"""
+        key = normalize_phone(phone)
+        if key:
+            self._cache.invalidate(key)
+
+    def clear(self):
+        """Vacía la caché"""
+        self._cache.clear()
+
+caregiver_resolver = CaregiverResolver(
+    ttl=float(os.getenv("CAREGIVER_CACHE_TTL", 300)),
+    negative_ttl=float(os.getenv("CAREGIVER_NEGATIVE_CACHE_TTL", 60)),
+    max_size=int(os.getenv("CAREGIVER_CACHE_SIZE", 10000))
+)
+
+def _changed_phones(target):
+    """Teléfonos actual y anterior de un cuidador modificado"""
+    phones = {target.phone}
+    history = inspect(target).attrs.phone.history
+    phones.update(history.deleted or ())
+    return [phone for phone in phones if phone]
+
+@event.listens_for(Caregiver, 'after_insert')
+@event.listens_for(Caregiver, 'after_update')
+@event.listens_for(Caregiver, 'after_delete')
+def _invalidate_caregiver(mapper, connection, target):
+    """Invalida la caché al crear, modificar o eliminar un cuidador"""
+    phones = _changed_phones(target)
+    for phone in phones:
+        caregiver_resolver.invalidate(phone)
+
+    # Se vuelve a invalidar tras el commit, por si otro hilo cacheó el estado anterior
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault('caregiver_phones_to_invalidate', set()).update(phones)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    for phone in session.info.pop('caregiver_phones_to_invalidate', ()):
+        caregiver_resolver.invalidate(phone)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_invalidations(session):
+    session.info.pop('caregiver_phones_to_invalidate', None)
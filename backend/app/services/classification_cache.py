@@ -0,0 +1,206 @@
+# backend/app/services/classification_cache.py
+import os
+import re
+import copy
+import json
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime
+from flask import has_app_context
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models.classification_cache_entry import ClassificationCacheEntry
+from app.services.llm_metrics import CACHE_LOOKUPS
+
+# Configuración de logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Entradas que se mantienen en memoria por proceso (0 desactiva la caché)
+CACHE_MAX_SIZE = int(os.getenv("CLASSIFICATION_CACHE_SIZE", 1000))
+
+# Aciertos en la tabla que se acumulan en memoria antes de actualizar sus contadores
+HIT_FLUSH_EVERY = int(os.getenv("CLASSIFICATION_CACHE_HIT_FLUSH", 100))
+
+# Símbolos (emoji incluidos), modificadores y caracteres de control de formato (ZWJ, selectores de variante)
+_DROPPED_CATEGORIES = {"So", "Sk", "Cf", "Cs", "Mn"}
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_message(text):
+    """
+    Normaliza un mensaje para la caché: minúsculas, sin tildes, sin emoji
+    y con los espacios colapsados. "Durmió bien 😴" y "durmio  bien" coinciden.
+    """
+    decomposed = unicodedata.normalize("NFKD", text or "").casefold()
+    kept = "".join(char for char in decomposed if unicodedata.category(char) not in _DROPPED_CATEGORIES)
+    return _WHITESPACE.sub(" ", kept).strip()
+
+def cache_key(text, prompt_version, model_name):
+    """SHA-256 del mensaje normalizado, la versión del prompt y el modelo"""
+    material = "\x00".join([prompt_version, model_name, normalize_message(text)])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+class ClassificationCache:
+    """
+    Caché de resultados de clasificación en dos niveles: un LRU acotado en memoria
+    y la tabla classification_cache, compartida entre procesos. El nivel de base de
+    datos solo se usa dentro de un contexto de aplicación y nunca confirma la
+    transacción del llamador: las entradas nuevas se guardan cuando él la confirma.
+    """
+
+    def __init__(self, max_size=CACHE_MAX_SIZE, use_db=True, hit_flush_every=HIT_FLUSH_EVERY):
+        """
+        Args:
+            max_size (int): Entradas en memoria; 0 desactiva la caché
+            use_db (bool): Si es False, solo se usa el nivel en memoria
+            hit_flush_every (int): Aciertos en la tabla acumulados antes de escribir los contadores
+        """
+        self.max_size = max_size
+        self.use_db = use_db
+        self.hit_flush_every = max(1, hit_flush_every)
+        self._entries = OrderedDict()
+        self._pending_hits = {}  # clave -> (aciertos, último acierto)
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "stores": 0}
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def get(self, text, prompt_version, model_name):
+        """
+        Busca el resultado de un mensaje
+
+        Returns:
+            dict: Copia del resultado guardado, o None si no está
+        """
+        if not self.enabled:
+            return None
+        key = cache_key(text, prompt_version, model_name)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                CACHE_LOOKUPS.labels("memory_hit").inc()
+                return copy.deepcopy(result)
+
+        result = self._get_from_db(key)
+        with self._lock:
+            if result is None:
+                self._stats["misses"] += 1
+                CACHE_LOOKUPS.labels("miss").inc()
+                return None
+            self._stats["db_hits"] += 1
+            CACHE_LOOKUPS.labels("db_hit").inc()
+        self._remember(key, result)
+        return copy.deepcopy(result)
+
+    def set(self, text, prompt_version, model_name, result):
+        """Guarda un resultado válido (los resultados con error no se guardan)"""
+        if not self.enabled or "error" in result:
+            return
+        key = cache_key(text, prompt_version, model_name)
+        result = {"categorias": result.get("categorias", []), "resumen": result.get("resumen", "")}
+        self._remember(key, copy.deepcopy(result))
+        with self._lock:
+            self._stats["stores"] += 1
+        self._store_in_db(key, prompt_version, model_name, result)
+
+    def stats(self):
+        """Contadores de aciertos y fallos por nivel"""
+        with self._lock:
+            lookups = self._stats["memory_hits"] + self._stats["db_hits"] + self._stats["misses"]
+            hits = lookups - self._stats["misses"]
+            return {
+                **self._stats,
+                "size": len(self._entries),
+                "hit_rate": hits / lookups if lookups else 0.0
+            }
+
+    def clear(self):
+        """Vacía el nivel en memoria y los contadores (la tabla se conserva)"""
+        with self._lock:
+            self._entries.clear()
+            self._stats = dict.fromkeys(self._stats, 0)
+
+    def _remember(self, key, result):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _db_available(self):
+        return self.use_db and has_app_context()
+
+    def flush_hits(self):
+        """
+        Escribe los contadores de aciertos acumulados. Como el resto del nivel de
+        base de datos, usa un SAVEPOINT en la sesión del llamador y no confirma:
+        los contadores se guardan con la transacción del llamador.
+        """
+        if not self._db_available():
+            return
+        with self._lock:
+            pending, self._pending_hits = self._pending_hits, {}
+        if not pending:
+            return
+        try:
+            with db.session.begin_nested():
+                for key, (hits, last_hit_at) in pending.items():
+                    db.session.execute(
+                        update(ClassificationCacheEntry).where(ClassificationCacheEntry.key == key).values(
+                            hits=ClassificationCacheEntry.hits + hits, last_hit_at=last_hit_at
+                        )
+                    )
+        except Exception as e:
+            logger.warning(f"No se pudieron actualizar los aciertos de la caché de clasificación: {e}")
+
+    def _get_from_db(self, key):
+        if not self._db_available():
+            return None
+        try:
+            with db.session.begin_nested():
+                entry = ClassificationCacheEntry.query.filter_by(key=key).first()
+                result = json.loads(entry.result) if entry is not None else None
+        except Exception as e:
+            logger.warning(f"No se pudo leer la caché de clasificación: {e}")
+            return None
+        if result is not None:
+            # Sin escritura por lectura: los aciertos se acumulan y se escriben por tandas
+            with self._lock:
+                hits, _ = self._pending_hits.get(key, (0, None))
+                self._pending_hits[key] = (hits + 1, datetime.utcnow())
+                flush = sum(hits for hits, _ in self._pending_hits.values()) >= self.hit_flush_every
+            if flush:
+                self.flush_hits()
+        return result
+
+    def _store_in_db(self, key, prompt_version, model_name, result):
+        """
+        Agrega la entrada en un SAVEPOINT de la sesión del llamador, sin confirmar
+        su transacción: queda guardada cuando el llamador confirma sus cambios
+        """
+        if not self._db_available():
+            return
+        try:
+            with db.session.begin_nested():
+                db.session.add(ClassificationCacheEntry(
+                    key=key,
+                    prompt_version=prompt_version,
+                    model_name=model_name,
+                    result=json.dumps(result, ensure_ascii=False)
+                ))
+        except IntegrityError:
+            # Otro proceso guardó el mismo mensaje primero
+            pass
+        except Exception as e:
+            logger.warning(f"No se pudo guardar en la caché de clasificación: {e}")
+
+classification_cache = ClassificationCache()
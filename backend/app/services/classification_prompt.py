@@ -0,0 +1,169 @@
+# backend/app/services/classification_prompt.py
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from flask import has_app_context
+from app.models.category import Category
+from app.models.subcategory import Subcategory
+from app.utils.db_init import DEFAULT_TAXONOMY
+
+# Configuración de logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Segundos durante los que se reutiliza la taxonomía leída de la base de datos
+TAXONOMY_TTL = float(os.getenv("GEMINI_TAXONOMY_TTL", 60))
+
+HEADER = """Clasifica mensajes de cuidadores de personas mayores o con condiciones neurodegenerativas.
+Categorías y subcategorías posibles:
+{taxonomy}
+Responde SOLO con JSON, sin explicaciones. Incluye únicamente las categorías y subcategorías \
+detectadas, con los nombres exactos de la lista; omite las que no aparecen en el mensaje.
+"""
+
+SINGLE_FORMAT = """Formato: {"categorias":[{"nombre":"<categoría>","subcategorias":[{"nombre":"<subcategoría>",\
+"valor":"<texto extraído>","confianza":<0 a 1>}]}],"resumen":"<estado del paciente en una frase>"}
+Mensaje del cuidador:
+"""
+
+BATCH_FORMAT = """Clasifica cada mensaje por separado, sin mezclar información entre mensajes.
+Formato: {"resultados":[{"id":"<id del mensaje>","categorias":[{"nombre":"<categoría>","subcategorias":\
+[{"nombre":"<subcategoría>","valor":"<texto extraído>","confianza":<0 a 1>}]}],"resumen":"<una frase>"}]}
+Mensajes (id y texto):
+"""
+
+class CompiledPrompt:
+    """Plantillas de prompt ya resueltas para una taxonomía concreta"""
+
+    def __init__(self, taxonomy):
+        """
+        Args:
+            taxonomy (list): [(categoría, [(subcategoría, descripción)])]
+        """
+        self.taxonomy = taxonomy
+        lines = []
+        for category_name, subcategories in taxonomy:
+            items = [f"{name} ({description})" if description else name for name, description in subcategories]
+            lines.append(f"- {category_name}: {'; '.join(items)}")
+        header = HEADER.format(taxonomy="\n".join(lines))
+        self.single_prefix = header + SINGLE_FORMAT
+        self.batch_prefix = header + BATCH_FORMAT
+        self.single_schema = self._result_schema(taxonomy)
+        self.batch_schema = {
+            "type": "object",
+            "properties": {
+                "resultados": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {"id": {"type": "string"}, **self.single_schema["properties"]},
+                        "required": ["id", "categorias", "resumen"]
+                    }
+                }
+            },
+            "required": ["resultados"]
+        }
+        material = self.single_prefix + self.batch_prefix + json.dumps(self.batch_schema, sort_keys=True)
+        self.version = hashlib.sha256(material.encode("utf-8")).hexdigest()[:16]
+
+    def _result_schema(self, taxonomy):
+        """Esquema de respuesta (subconjunto de OpenAPI que acepta Gemini) con los nombres de la taxonomía"""
+        subcategory_names = sorted({name for _, subcategories in taxonomy for name, _ in subcategories})
+        return {
+            "type": "object",
+            "properties": {
+                "categorias": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "nombre": {"type": "string", "enum": [name for name, _ in taxonomy]},
+                            "subcategorias": {
+                                "type": "array",
+                                "items": {
+                                    "type": "object",
+                                    "properties": {
+                                        "nombre": {"type": "string", "enum": subcategory_names},
+                                        "valor": {"type": "string"},
+                                        "confianza": {"type": "number"}
+                                    },
+                                    "required": ["nombre", "valor", "confianza"]
+                                }
+                            }
+                        },
+                        "required": ["nombre", "subcategorias"]
+                    }
+                },
+                "resumen": {"type": "string"}
+            },
+            "required": ["categorias", "resumen"]
+        }
+
+    def single(self, message_text):
+        return f'{self.single_prefix}"{message_text}"'
+
+    def batch(self, messages):
+        batch = json.dumps(
+            [{"id": f"m{i + 1}", "texto": text} for i, text in enumerate(messages)],
+            ensure_ascii=False,
+            separators=(",", ":")
+        )
+        return self.batch_prefix + batch
+
+class ClassificationPrompt:
+    """
+    Construye los prompts de clasificación a partir de las categorías y subcategorías
+    activas. La plantilla se compila una vez y se reutiliza durante `ttl` segundos;
+    fuera de un contexto de aplicación se usa la taxonomía por defecto.
+    """
+
+    def __init__(self, ttl=TAXONOMY_TTL):
+        self.ttl = ttl
+        self._compiled = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def compiled(self):
+        """Plantilla vigente; se recompila solo si la taxonomía cambió"""
+        with self._lock:
+            if self._compiled is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return self._compiled
+            taxonomy = self._load_taxonomy()
+            if self._compiled is None or taxonomy != self._compiled.taxonomy:
+                self._compiled = CompiledPrompt(taxonomy)
+                logger.info(f"Prompt de clasificación compilado (versión {self._compiled.version}, "
+                            f"{len(taxonomy)} categorías)")
+            self._loaded_at = time.monotonic()
+            return self._compiled
+
+    def invalidate(self):
+        """Fuerza a releer la taxonomía en el próximo uso"""
+        with self._lock:
+            self._loaded_at = 0.0
+
+    def _load_taxonomy(self):
+        default = [
+            (category_name, list(subcategories)) for category_name, subcategories in DEFAULT_TAXONOMY
+        ]
+        if not has_app_context():
+            return default
+        try:
+            subcategories = {}
+            for subcategory in Subcategory.get_all_active():
+                subcategories.setdefault(subcategory.category_id, []).append(
+                    (subcategory.name, subcategory.description or "")
+                )
+            taxonomy = [
+                (category.name, subcategories.get(category.id, []))
+                for category in Category.get_all_active()
+            ]
+        except Exception as e:
+            logger.warning(f"No se pudo leer la taxonomía, se usa la predeterminada: {e}")
+            return default
+        return [entry for entry in taxonomy if entry[1]] or default
+
+classification_prompt = ClassificationPrompt()
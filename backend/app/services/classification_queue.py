@@ -0,0 +1,347 @@
+# backend/app/services/classification_queue.py
+import random
+import logging
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import and_, or_, exists, insert, update
+from sqlalchemy.orm import aliased
+from app.extensions import db
+from app.models.classification_job import ClassificationJob
+from app.models.dead_letter import DeadLetter
+
+# Configuración de logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class ClassificationQueue:
+    """
+    Cola persistente de clasificaciones almacenada en la base de datos.
+    El webhook encola trabajos y los workers los reclaman, procesan y confirman.
+
+    Los trabajos se reparten por cuidador (o paciente, según CLASSIFICATION_SHARD_BY):
+    los de un mismo cuidador se procesan estrictamente en orden de llegada y los de
+    cuidadores distintos en paralelo, en cualquier número de hilos o procesos.
+
+    Con CLASSIFICATION_COALESCE_WINDOW, cada mensaje nuevo de un cuidador posterga a
+    los suyos que siguen esperando, y la ráfaga completa se reclama y clasifica junta.
+    """
+
+    def shard_key(self, message):
+        """Clave de orden de un mensaje: su cuidador o su paciente"""
+        if current_app.config['CLASSIFICATION_SHARD_BY'] == 'patient':
+            return message.patient_id
+        return message.caregiver_id
+
+    def enqueue(self, message, commit=True, deferred=False):
+        """
+        Encola la clasificación de un mensaje ya guardado
+
+        Args:
+            message (Message): Mensaje a clasificar (ya con ID)
+            commit (bool): Si es False, el trabajo queda en la sesión para que
+                el llamador lo confirme junto con el mensaje
+            deferred (bool): Si es True, el trabajo espera a que los workers
+                estén libres (ver promote_deferred)
+
+        Returns:
+            ClassificationJob: Trabajo creado
+        """
+        now = datetime.utcnow()
+        shard_key = self.shard_key(message)
+        job = ClassificationJob(
+            message_id=message.id,
+            shard_key=shard_key,
+            status=ClassificationJob.STATUS_DEFERRED if deferred else ClassificationJob.STATUS_PENDING,
+            max_attempts=current_app.config['CLASSIFICATION_MAX_ATTEMPTS'],
+            next_attempt_at=self._debounce([shard_key], now) if not deferred else now
+        )
+        db.session.add(job)
+        if commit:
+            db.session.commit()
+        return job
+
+    def enqueue_many(self, messages, commit=True, deferred=False):
+        """
+        Encola la clasificación de varios mensajes con una sola sentencia INSERT
+
+        Args:
+            messages (list): Mensajes o filas con id, caregiver_id y patient_id
+            commit (bool): Si es False, el llamador confirma la transacción
+            deferred (bool): Si es True, los trabajos quedan diferidos
+        """
+        if not messages:
+            return
+        now = datetime.utcnow()
+        max_attempts = current_app.config['CLASSIFICATION_MAX_ATTEMPTS']
+        status = ClassificationJob.STATUS_DEFERRED if deferred else ClassificationJob.STATUS_PENDING
+        shard_keys = [self.shard_key(message) for message in messages]
+        ready_at = self._debounce(set(shard_keys), now) if not deferred else now
+        db.session.execute(insert(ClassificationJob), [
+            {
+                'message_id': message.id,
+                'shard_key': shard_key,
+                'status': status,
+                'max_attempts': max_attempts,
+                'next_attempt_at': ready_at
+            }
+            for message, shard_key in zip(messages, shard_keys)
+        ])
+        if commit:
+            db.session.commit()
+
+    def claim(self, worker_id, limit=1, burst_limit=0):
+        """
+        Reclama hasta `limit` trabajos listos para procesar.
+        También recupera trabajos cuyo worker dejó de responder (bloqueo vencido).
+        De cada cuidador solo se reclaman trabajos consecutivos desde el más
+        antiguo sin terminar, así el lote se procesa en orden de llegada.
+
+        Args:
+            worker_id (str): Identificador del worker que reclama
+            limit (int): Número máximo de trabajos a reclamar
+            burst_limit (int): Si es mayor que 0, se agregan los demás trabajos listos
+                de cada cuidador reclamado, hasta este número por cuidador
+
+        Returns:
+            list: Trabajos reclamados, en orden de llegada
+        """
+        now = datetime.utcnow()
+
+        # En PostgreSQL SKIP LOCKED evita que dos workers compitan por las mismas filas.
+        # Un trabajo es candidato si los anteriores de su cuidador también están listos.
+        candidates = db.session.query(ClassificationJob.id, ClassificationJob.shard_key).filter(
+            self._claimable_filter(now)
+        ).order_by(ClassificationJob.id).limit(limit).with_for_update(skip_locked=True).all()
+        candidate_ids = [row.id for row in candidates]
+
+        if burst_limit:
+            # Completar la ráfaga de cada cuidador para clasificarla en la misma llamada
+            for shard_key in {row.shard_key for row in candidates if row.shard_key is not None}:
+                taken = sum(1 for row in candidates if row.shard_key == shard_key)
+                if taken >= burst_limit:
+                    continue
+                candidate_ids.extend(row.id for row in db.session.query(ClassificationJob.id).filter(
+                    ClassificationJob.shard_key == shard_key,
+                    ClassificationJob.id.notin_(candidate_ids),
+                    self._claimable_filter(now)
+                ).order_by(ClassificationJob.id).limit(burst_limit - taken).with_for_update(skip_locked=True))
+            candidate_ids.sort()
+
+        # Al reclamar, los anteriores deben estar terminados o reclamados en esta misma llamada
+        claimable = self._claimable_filter(now, worker_id)
+
+        claimed_ids = []
+        for job_id in candidate_ids:
+            # La actualización condicional garantiza que solo un worker gane cada trabajo
+            result = db.session.execute(
+                update(ClassificationJob).where(
+                    ClassificationJob.id == job_id,
+                    claimable
+                ).values(
+                    status=ClassificationJob.STATUS_PROCESSING,
+                    locked_at=now,
+                    locked_by=worker_id,
+                    attempts=ClassificationJob.attempts + 1
+                )
+            )
+            if result.rowcount == 1:
+                claimed_ids.append(job_id)
+        db.session.commit()
+
+        if not claimed_ids:
+            return []
+        return ClassificationJob.query.filter(
+            ClassificationJob.id.in_(claimed_ids)
+        ).order_by(ClassificationJob.id).all()
+
+    def promote_deferred(self, limit):
+        """
+        Pasa a pendientes los trabajos diferidos más antiguos. Los workers lo
+        llaman cuando no tienen otra cosa que hacer.
+
+        Args:
+            limit (int): Número máximo de trabajos a promover
+
+        Returns:
+            int: Trabajos promovidos
+        """
+        deferred_ids = db.session.query(ClassificationJob.id).filter(
+            ClassificationJob.status == ClassificationJob.STATUS_DEFERRED
+        ).order_by(ClassificationJob.id).limit(limit).scalar_subquery()
+        result = db.session.execute(
+            update(ClassificationJob).where(
+                ClassificationJob.id.in_(deferred_ids),
+                ClassificationJob.status == ClassificationJob.STATUS_DEFERRED
+            ).values(
+                status=ClassificationJob.STATUS_PENDING,
+                next_attempt_at=datetime.utcnow()
+            ).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        if result.rowcount:
+            logger.info(f"{result.rowcount} trabajos diferidos pasaron a la cola")
+        return result.rowcount
+
+    def complete(self, job, commit=True, origin=None):
+        """
+        Marca un trabajo como terminado
+
+        Args:
+            origin (str, optional): Quién clasificó el mensaje (ClassifiedValue.ORIGIN_*)
+        """
+        job.status = ClassificationJob.STATUS_DONE
+        job.origin = origin
+        job.locked_at = None
+        job.locked_by = None
+        job.last_error = None
+        if commit:
+            db.session.commit()
+
+    def fail(self, job, error, models=None):
+        """
+        Registra un fallo. Reprograma el trabajo con backoff exponencial o, si agotó
+        sus intentos, lo marca como fallido y lo guarda en la tabla de dead letters.
+
+        Args:
+            job (ClassificationJob): Trabajo que falló
+            error (str): Descripción del error
+            models (list, optional): Modelos probados en el último intento
+
+        Returns:
+            bool: True si el trabajo se reprogramó, False si quedó como fallido
+        """
+        job.last_error = str(error)
+        job.locked_at = None
+        job.locked_by = None
+
+        retried = job.attempts < job.max_attempts
+        if retried:
+            delay = self._compute_backoff(job.attempts)
+            job.status = ClassificationJob.STATUS_PENDING
+            job.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+            logger.warning(
+                f"Trabajo {job.id} falló (intento {job.attempts}/{job.max_attempts}), "
+                f"reintento en {delay:.1f}s: {error}"
+            )
+        else:
+            job.status = ClassificationJob.STATUS_FAILED
+            self._dead_letter(job, error, models)
+            logger.error(f"Trabajo {job.id} agotó sus {job.max_attempts} intentos: {error}")
+
+        db.session.commit()
+        return retried
+
+    def _dead_letter(self, job, error, models):
+        """Crea (o reabre, si ya se había reprocesado) el dead letter de un trabajo"""
+        dead_letter = DeadLetter.query.filter_by(job_id=job.id).first()
+        if dead_letter is None:
+            dead_letter = DeadLetter(job_id=job.id, message_id=job.message_id)
+            db.session.add(dead_letter)
+        dead_letter.status = DeadLetter.STATUS_OPEN
+        dead_letter.error = str(error)
+        dead_letter.attempts = job.attempts
+        dead_letter.model_name = ", ".join(models or []) or None
+        dead_letter.resolved_at = None
+
+    def backlog_depth(self):
+        """Número de trabajos pendientes o en proceso"""
+        return ClassificationJob.query.filter(ClassificationJob.status.in_([
+            ClassificationJob.STATUS_PENDING,
+            ClassificationJob.STATUS_PROCESSING
+        ])).count()
+
+    def count_by_status(self):
+        """Número de trabajos en cada estado"""
+        rows = db.session.query(
+            ClassificationJob.status, db.func.count(ClassificationJob.id)
+        ).group_by(ClassificationJob.status).all()
+        return {status: count for status, count in rows}
+
+    def _debounce(self, shard_keys, now):
+        """
+        Abre o extiende la ventana de ráfaga de los cuidadores indicados: sus trabajos
+        que aún esperan pasan a estar listos al final de la ventana, salvo los que ya
+        esperaron CLASSIFICATION_COALESCE_MAX_WAIT
+
+        Returns:
+            datetime: Momento en que el trabajo nuevo debe quedar listo
+        """
+        window = current_app.config['CLASSIFICATION_COALESCE_WINDOW']
+        if window <= 0:
+            return now
+        ready_at = now + timedelta(seconds=window)
+        max_wait = timedelta(seconds=current_app.config['CLASSIFICATION_COALESCE_MAX_WAIT'])
+        db.session.execute(
+            update(ClassificationJob).where(
+                ClassificationJob.shard_key.in_([key for key in shard_keys if key is not None]),
+                ClassificationJob.status == ClassificationJob.STATUS_PENDING,
+                ClassificationJob.attempts == 0,
+                ClassificationJob.next_attempt_at > now,
+                ClassificationJob.created_at >= ready_at - max_wait
+            ).values(next_attempt_at=ready_at).execution_options(synchronize_session=False)
+        )
+        return ready_at
+
+    def release(self, job):
+        """
+        Devuelve a la cola un trabajo reclamado que no se llegó a procesar
+        (por ejemplo, porque falló uno anterior del mismo cuidador), sin
+        contarlo como intento
+        """
+        job.status = ClassificationJob.STATUS_PENDING
+        job.attempts = max(job.attempts - 1, 0)
+        job.locked_at = None
+        job.locked_by = None
+        db.session.commit()
+
+    def _claimable_filter(self, now, worker_id=None):
+        """
+        Condición SQL de los trabajos que un worker puede reclamar
+
+        Args:
+            now (datetime): Momento de la reclamación
+            worker_id (str, optional): Si se indica, los trabajos anteriores del mismo
+                cuidador solo dejan de bloquear si este worker los reclamó en `now`;
+                si no, basta con que también estén listos para reclamar
+        """
+        earlier = aliased(ClassificationJob)
+        if worker_id is None:
+            blocking = ~self._ready_filter(earlier, now)
+        else:
+            # Comparaciones con NULL no dan TRUE: un anterior sin reclamar debe bloquear explícitamente
+            blocking = or_(
+                earlier.locked_by.is_(None),
+                earlier.locked_at.is_(None),
+                earlier.locked_by != worker_id,
+                earlier.locked_at != now
+            )
+        # Un trabajo espera mientras quede uno anterior sin terminar del mismo cuidador
+        in_order = ~exists().where(
+            earlier.shard_key == ClassificationJob.shard_key,
+            earlier.id < ClassificationJob.id,
+            earlier.status.in_(ClassificationJob.UNFINISHED_STATUSES),
+            blocking
+        )
+        return and_(self._ready_filter(ClassificationJob, now), in_order)
+
+    def _ready_filter(self, job, now):
+        """Trabajos pendientes cuyo turno llegó, o en proceso con el bloqueo vencido"""
+        stale_before = now - timedelta(seconds=current_app.config['CLASSIFICATION_LOCK_TIMEOUT'])
+        return or_(
+            and_(
+                job.status == ClassificationJob.STATUS_PENDING,
+                job.next_attempt_at <= now
+            ),
+            and_(
+                job.status == ClassificationJob.STATUS_PROCESSING,
+                job.locked_at < stale_before
+            )
+        )
+
+    def _compute_backoff(self, attempts):
+        """Calcula la espera antes del próximo intento (exponencial con jitter)"""
+        base = current_app.config['CLASSIFICATION_BACKOFF_BASE']
+        maximum = current_app.config['CLASSIFICATION_BACKOFF_MAX']
+        delay = min(base * (2 ** max(attempts - 1, 0)), maximum)
+        return delay * random.uniform(0.8, 1.2)
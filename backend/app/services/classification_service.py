@@ -2,29 +2,53 @@
 import logging
 import json
 from datetime import datetime
+from flask import current_app
 from app.extensions import db
 from app.models.message import Message
 from app.models.category import Category
 from app.models.subcategory import Subcategory
 from app.models.classified_value import ClassifiedValue
 from app.services.gemini_service import GeminiService
+from app.services.llm_metrics import attribute_to_patients
+from app.services.local_classifier import local_classifier
+from app.services.rule_classifier import rule_classifier
+from app.utils.deadline import Deadline
 
 # Configuración de logging
 logging.basicConfig(level=logging.INFO, 
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def result_origin(classification_result):
+    """Quién produjo un resultado: las reglas y el clasificador local lo indican en `origen`"""
+    return classification_result.get('origen', ClassifiedValue.ORIGIN_MODEL)
+
+class ClassificationError(RuntimeError):
+    """Error devuelto por el modelo al clasificar un mensaje"""
+
+    def __init__(self, message, models=None):
+        super().__init__(message)
+        self.models = models or []  # Modelos probados antes de fallar
+
 class ClassificationService:
     """
     Servicio para gestionar la clasificación de mensajes y 
     almacenamiento de datos clasificados usando la estructura normalizada
     """
     
-    def __init__(self):
-        """Inicializa el servicio de clasificación"""
+    def __init__(self, use_rules=True, use_local_model=True):
+        """
+        Inicializa el servicio de clasificación
+        
+        Args:
+            use_rules (bool): Si es False, todos los mensajes se envían al modelo
+            use_local_model (bool): Si es False, no se usa el clasificador local
+        """
         self.gemini_service = GeminiService()
+        self.rule_classifier = rule_classifier if use_rules else None
+        self.local_classifier = local_classifier if use_local_model else None
     
-    def process_message(self, message_text, phone_number, patient_id=None):
+    def process_message(self, message_text, phone_number, patient_id=None, deadline=None):
         """
         Procesa un mensaje recibido: lo guarda, clasifica y almacena resultados
         
@@ -32,6 +56,8 @@ class ClassificationService:
             message_text (str): Texto del mensaje
             phone_number (str): Número de teléfono del remitente
             patient_id (int, optional): ID del paciente asociado
+            deadline (Deadline, optional): Plazo de la clasificación (por defecto,
+                CLASSIFICATION_INLINE_DEADLINE)
             
         Returns:
             dict: Datos procesados y resultados de la clasificación
@@ -48,7 +74,9 @@ class ClassificationService:
             logger.info(f"Mensaje guardado con ID: {message.id}")
             
             # 2. Clasificar mensaje
-            classification_result = self.gemini_service.classify_message(message_text)
+            if deadline is None:
+                deadline = Deadline.from_timeout(current_app.config['CLASSIFICATION_INLINE_DEADLINE'])
+            classification_result = self.classify_stored_messages([message], deadline)[0]
             logger.info(f"Mensaje clasificado: {len(classification_result.get('categorias', []))} categorías detectadas")
             
             # 3. Guardar datos clasificados en estructura normalizada
@@ -71,7 +99,82 @@ class ClassificationService:
                 "status": "error"
             }
     
-    def _save_normalized_classification(self, message_id, classification_data, patient_id):
+    def classify_stored_message(self, message, commit=True, deadline=None):
+        """
+        Clasifica un mensaje ya guardado y almacena sus valores clasificados
+        
+        Args:
+            message (Message): Mensaje persistido a clasificar
+            commit (bool): Si es False, los valores quedan en la sesión sin confirmar
+            
+        Returns:
+            int: Número de valores guardados
+            
+        Raises:
+            ClassificationError: Si el modelo no pudo clasificar el mensaje
+        """
+        classification_result = self.classify_stored_messages([message], deadline)[0]
+        return self.save_classification(message, classification_result, commit=commit)
+    
+    def classify_stored_messages(self, messages, deadline=None):
+        """
+        Clasifica varios mensajes guardados, agrupándolos en una sola llamada al modelo
+        
+        Args:
+            messages (list): Mensajes persistidos a clasificar
+            deadline (Deadline, optional): Plazo para todas las llamadas al modelo
+            
+        Returns:
+            list: Un resultado de clasificación por mensaje, en el mismo orden
+        """
+        texts = [message.content for message in messages]
+        results = [self._classify_with_rules(text) or self._classify_locally(text) for text in texts]
+        
+        # Solo se consulta al modelo por los mensajes que no resuelven las reglas ni el clasificador local
+        pending = [i for i, result in enumerate(results) if result is None]
+        with attribute_to_patients(messages[i].patient_id for i in pending):
+            if len(pending) == 1:
+                results[pending[0]] = self.gemini_service.classify_message(texts[pending[0]], deadline=deadline)
+            elif pending:
+                model_results = self.gemini_service.classify_messages([texts[i] for i in pending], deadline=deadline)
+                for index, result in zip(pending, model_results):
+                    results[index] = result
+        return results
+    
+    def _classify_with_rules(self, text):
+        """Resultado de las reglas si cubren el mensaje completo, o None"""
+        if self.rule_classifier is None:
+            return None
+        result, covered = self.rule_classifier.classify(text)
+        if not covered:
+            return None
+        logger.info(f"Mensaje clasificado por reglas, sin consultar al modelo: {result['resumen']}")
+        return result
+    
+    def _classify_locally(self, text):
+        """Resultado del clasificador local si supera su umbral de confianza, o None"""
+        if self.local_classifier is None:
+            return None
+        result = self.local_classifier.classify(text)
+        if result is not None:
+            logger.info(f"Mensaje clasificado localmente, sin consultar al modelo: {result['resumen']}")
+        return result
+    
+    def save_classification(self, message, classification_result, commit=True):
+        """
+        Guarda el resultado de clasificación de un mensaje
+        
+        Raises:
+            ClassificationError: Si el resultado contiene un error del modelo
+        """
+        if "error" in classification_result:
+            raise ClassificationError(classification_result["error"], classification_result.get("modelos"))
+        
+        return self._save_normalized_classification(
+            message.id, classification_result, message.patient_id, commit=commit
+        )
+    
+    def _save_normalized_classification(self, message_id, classification_data, patient_id, commit=True):
         """
         Guarda los datos clasificados en la estructura normalizada
         
@@ -79,6 +182,7 @@ class ClassificationService:
             message_id (int): ID del mensaje original
             classification_data (dict): Datos clasificados
             patient_id (int): ID del paciente
+            commit (bool): Si es False, el llamador confirma la transacción
             
         Returns:
             int: Número de valores guardados
@@ -129,14 +233,16 @@ class ClassificationService:
                             message_id=message_id,
                             subcategory_id=subcategory.id,
                             value=valor,
-                            confidence=subcategoria.get('confianza', 0.0)
+                            confidence=subcategoria.get('confianza', 0.0),
+                            origin=result_origin(classification_data)
                         )
                         db.session.add(classified_value)
                         saved_count += 1
                         logger.info(f"Valor clasificado guardado: {category_name} > {subcategory_name}: {valor}")
             
             # Confirmar cambios
-            db.session.commit()
+            if commit:
+                db.session.commit()
             logger.info(f"Total de valores clasificados guardados: {saved_count}")
             
             return saved_count
@@ -0,0 +1,154 @@
+# backend/app/services/classification_worker.py
+import os
+import socket
+import logging
+import threading
+from app.extensions import db
+from app.services.classification_queue import ClassificationQueue
+from app.services.classification_service import ClassificationService, result_origin
+from app.utils.deadline import Deadline
+
+# Configuración de logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class ClassificationWorker:
+    """
+    Pool de hilos que drena la cola de clasificaciones: reclama trabajos,
+    llama a Gemini y guarda los valores clasificados con reintentos y backoff.
+    Cada hilo toma los mensajes de cuidadores distintos en paralelo; los de un
+    mismo cuidador se guardan en orden (ver ClassificationQueue.claim).
+    """
+
+    def __init__(self, app, concurrency=1, batch_size=1, poll_interval=None, classification_service=None):
+        """
+        Inicializa el pool de workers
+
+        Args:
+            app (Flask): Aplicación para crear contextos en cada hilo
+            concurrency (int): Número de hilos de trabajo
+            batch_size (int): Trabajos reclamados por iteración y clasificados en una sola llamada
+            poll_interval (float, optional): Espera cuando la cola está vacía
+            classification_service (ClassificationService, optional): Servicio a usar
+        """
+        self.app = app
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.poll_interval = poll_interval if poll_interval is not None else app.config['CLASSIFICATION_POLL_INTERVAL']
+        self.classification_service = classification_service or ClassificationService()
+        self.queue = ClassificationQueue()
+        # Con la ventana de ráfagas activa, cada cuidador reclamado trae sus mensajes seguidos
+        self.burst_limit = (
+            app.config['CLASSIFICATION_COALESCE_MAX_MESSAGES']
+            if app.config['CLASSIFICATION_COALESCE_WINDOW'] > 0 else 0
+        )
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+    def start(self):
+        """Arranca los hilos de trabajo"""
+        self._stop_event.clear()
+        for index in range(self.concurrency):
+            thread = threading.Thread(
+                target=self._run_loop,
+                args=(f"{self._worker_prefix}:{index}",),
+                name=f"classify-worker-{index}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Workers de clasificación iniciados: {self.concurrency} hilos")
+
+    def stop(self, timeout=None):
+        """Detiene los hilos al terminar el trabajo en curso"""
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        logger.info("Workers de clasificación detenidos")
+
+    def wait(self, timeout=None):
+        """Bloquea hasta que se solicite la detención"""
+        return self._stop_event.wait(timeout)
+
+    def drain(self):
+        """
+        Procesa la cola en el hilo actual hasta que no queden trabajos listos
+
+        Returns:
+            int: Número de trabajos procesados
+        """
+        total = 0
+        worker_id = f"{self._worker_prefix}:drain"
+        while True:
+            processed = self.process_batch(worker_id)
+            if not processed:
+                return total
+            total += processed
+
+    def process_batch(self, worker_id):
+        """
+        Reclama y procesa un lote de trabajos
+
+        Returns:
+            int: Número de trabajos procesados
+        """
+        with self.app.app_context():
+            jobs = self.queue.claim(worker_id, limit=self.batch_size, burst_limit=self.burst_limit)
+            # Con la cola vacía se recuperan los mensajes que el webhook guardó sin encolar
+            if not jobs and self.queue.promote_deferred(self.app.config['CLASSIFICATION_PROMOTE_BATCH']):
+                jobs = self.queue.claim(worker_id, limit=self.batch_size, burst_limit=self.burst_limit)
+            if jobs:
+                self._process_jobs(jobs)
+            return len(jobs)
+
+    def _run_loop(self, worker_id):
+        """Bucle principal de cada hilo"""
+        while not self._stop_event.is_set():
+            try:
+                processed = self.process_batch(worker_id)
+            except Exception as e:
+                logger.error(f"Error en worker {worker_id}: {e}")
+                processed = 0
+            if not processed:
+                self._stop_event.wait(self.poll_interval)
+
+    def _process_jobs(self, jobs):
+        """Clasifica los mensajes de un lote de trabajos y confirma cada resultado"""
+        try:
+            # El plazo cubre todo el lote, para que un modelo colgado no retenga el trabajo reclamado
+            deadline = Deadline.from_timeout(self.app.config['CLASSIFICATION_DEADLINE'])
+            results = self.classification_service.classify_stored_messages([job.message for job in jobs], deadline)
+        except Exception as e:
+            db.session.rollback()
+            for job in jobs:
+                self.queue.fail(job, e, self._models_tried(e))
+            return
+
+        failed_shards = set()
+        for job, classification_result in zip(jobs, results):
+            # Si falló un mensaje, los siguientes del mismo cuidador esperan a su reintento
+            if job.shard_key is not None and job.shard_key in failed_shards:
+                self.queue.release(job)
+                continue
+            try:
+                saved = self.classification_service.save_classification(
+                    job.message, classification_result, commit=False
+                )
+                # Los valores clasificados y el cierre del trabajo se confirman juntos
+                self.queue.complete(job, origin=result_origin(classification_result))
+                logger.info(f"Trabajo {job.id} completado: {saved} valores para mensaje {job.message_id}")
+            except Exception as e:
+                db.session.rollback()
+                self.queue.fail(job, e, self._models_tried(e))
+                failed_shards.add(job.shard_key)
+
+    def _models_tried(self, error):
+        """Modelos probados antes del error, o el modelo actual si el error no los informa"""
+        models = getattr(error, 'models', None)
+        if models:
+            return models
+        model_name = getattr(self.classification_service.gemini_service, 'model_name', None)
+        return [model_name] if isinstance(model_name, str) else []
@@ -0,0 +1,88 @@
+# backend/app/services/dead_letter_replay.py
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from app.extensions import db
+from app.models.dead_letter import DeadLetter
+from app.services.classification_queue import ClassificationQueue
+from app.services.classification_service import ClassificationService, result_origin
+from app.utils.deadline import Deadline
+from app.utils.rate_limit import TokenBucket
+
+# Configuración de logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class DeadLetterReplayer:
+    """
+    Reprocesa en paralelo las clasificaciones que agotaron sus reintentos,
+    limitando la tasa de llamadas al modelo.
+    """
+
+    def __init__(self, app, concurrency=4, rate=2.0, classification_service=None):
+        """
+        Args:
+            app (Flask): Aplicación para crear contextos en cada hilo
+            concurrency (int): Clasificaciones simultáneas
+            rate (float): Llamadas al modelo por segundo
+            classification_service (ClassificationService, optional): Servicio a usar
+        """
+        self.app = app
+        self.concurrency = max(1, concurrency)
+        self.rate_limiter = TokenBucket(rate, capacity=self.concurrency)
+        self.classification_service = classification_service or ClassificationService()
+        self.queue = ClassificationQueue()
+
+    def replay(self, dead_letter_ids, on_progress=None):
+        """
+        Reprocesa los dead letters indicados
+
+        Args:
+            dead_letter_ids (list): IDs a reprocesar
+            on_progress (callable, optional): Se llama con (id, resuelto) al terminar cada uno
+
+        Returns:
+            dict: Número de resueltos y de fallidos
+        """
+        summary = {"resolved": 0, "failed": 0}
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='replay') as executor:
+            futures = {executor.submit(self._replay_one, dead_letter_id): dead_letter_id
+                       for dead_letter_id in dead_letter_ids}
+            for future in as_completed(futures):
+                resolved = future.result()
+                summary["resolved" if resolved else "failed"] += 1
+                if on_progress:
+                    on_progress(futures[future], resolved)
+        return summary
+
+    def _replay_one(self, dead_letter_id):
+        """Clasifica de nuevo el mensaje de un dead letter y cierra su trabajo"""
+        with self.app.app_context():
+            try:
+                dead_letter = db.session.get(DeadLetter, dead_letter_id)
+                if dead_letter is None or dead_letter.status != DeadLetter.STATUS_OPEN:
+                    return False
+
+                self.rate_limiter.acquire()
+                try:
+                    message = dead_letter.message
+                    deadline = Deadline.from_timeout(self.app.config['CLASSIFICATION_DEADLINE'])
+                    result = self.classification_service.classify_stored_messages([message], deadline)[0]
+                    saved = self.classification_service.save_classification(message, result, commit=False)
+                    self.queue.complete(dead_letter.job, commit=False, origin=result_origin(result))
+                    dead_letter.status = DeadLetter.STATUS_RESOLVED
+                    dead_letter.resolved_at = datetime.utcnow()
+                    dead_letter.replay_attempts += 1
+                    db.session.commit()
+                    logger.info(f"Dead letter {dead_letter_id} resuelto: {saved} valores para mensaje {message.id}")
+                    return True
+                except Exception as e:
+                    db.session.rollback()
+                    dead_letter.replay_attempts += 1
+                    dead_letter.error = str(e)
+                    db.session.commit()
+                    logger.warning(f"Dead letter {dead_letter_id} volvió a fallar: {e}")
+                    return False
+            finally:
+                db.session.remove()
@@ -0,0 +1,258 @@
+# backend/app/services/fake_gemini_backend.py
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import threading
+from google.api_core.exceptions import ServiceUnavailable, DeadlineExceeded as RPCDeadlineExceeded
+from app.services.classification_prompt import classification_prompt
+
+# Configuración de logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Backend simulado cuando GEMINI_BACKEND=fake (ver FakeGeminiBackend.from_env)
+FAKE_LATENCY = os.getenv("GEMINI_FAKE_LATENCY", "lognormal:300:0.4")
+FAKE_ERROR_RATE = float(os.getenv("GEMINI_FAKE_ERROR_RATE", 0))
+FAKE_MALFORMED_RATE = float(os.getenv("GEMINI_FAKE_MALFORMED_RATE", 0))
+FAKE_REPLAY_PATH = os.getenv("GEMINI_FAKE_REPLAY")
+FAKE_SEED = os.getenv("GEMINI_FAKE_SEED")
+
+MALFORMED_KINDS = ("truncated", "fenced", "trailing_comma", "prose")
+
+def prompt_hash(prompt):
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+def parse_latency(spec):
+    """
+    Distribución de latencia a partir de un texto, en milisegundos:
+    "constant:50", "uniform:100:500" o "lognormal:<mediana>:<sigma>"
+
+    Returns:
+        callable: Recibe un random.Random y devuelve segundos
+    """
+    kind, *params = spec.split(":")
+    values = [float(param) for param in params]
+    if kind == "constant" and len(values) == 1:
+        return lambda rng: values[0] / 1000
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(*values) / 1000
+    if kind == "lognormal" and len(values) == 2:
+        median, sigma = values
+        return lambda rng: median * rng.lognormvariate(0, sigma) / 1000
+    raise ValueError(f"Distribución de latencia no válida: {spec}")
+
+class FakeResponse:
+    """Respuesta con la interfaz que usa GeminiService (texto, sin usage_metadata)"""
+
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = None
+
+class FakeModel:
+    def __init__(self, backend, model_name):
+        self.backend = backend
+        self.model_name = model_name
+
+    def generate_content(self, prompt, request_options=None, **kwargs):
+        delay, text = self.backend.respond(self.model_name, prompt)
+        # Como gRPC: con timeout, la llamada lenta se corta al vencer en lugar de seguir esperando
+        timeout = (request_options or {}).get("timeout")
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise RPCDeadlineExceeded(f"Timeout simulado de {self.model_name} ({timeout:g} s)")
+        time.sleep(delay)
+        return self.backend.finish(text)
+
+    async def generate_content_async(self, prompt, **kwargs):
+        delay, text = self.backend.respond(self.model_name, prompt)
+        await asyncio.sleep(delay)
+        return self.backend.finish(text)
+
+class FakeGeminiBackend:
+    """
+    Backend de modelos local, sin red ni clave de API, para pruebas y benchmarks.
+    Tiene la interfaz de ModelRegistry (configure y get) y responde JSON válido
+    según la taxonomía del prompt. Permite configurar la distribución de latencia,
+    inyectar errores 503 y respuestas malformadas, y reproducir respuestas reales
+    grabadas con RecordingBackend.
+
+    El contenido de cada respuesta depende solo del mensaje; latencia, errores y
+    defectos salen de un generador aleatorio con semilla opcional.
+    """
+
+    requires_api_key = False
+
+    def __init__(self, latency=0.0, error_rate=0.0, malformed_rate=0.0, replay_path=None,
+                 seed=None, prompts=None):
+        """
+        Args:
+            latency (float | str | callable): Segundos fijos, una especificación para
+                parse_latency o una función que recibe un random.Random
+            error_rate (float): Fracción de llamadas que fallan con ServiceUnavailable
+            malformed_rate (float): Fracción de respuestas con JSON defectuoso
+            replay_path (str, optional): JSONL de RecordingBackend con respuestas reales
+            seed (int, optional): Semilla para que una corrida sea reproducible
+            prompts (ClassificationPrompt, optional): Fuente de la taxonomía y las plantillas
+        """
+        if isinstance(latency, str):
+            latency = parse_latency(latency)
+        elif not callable(latency):
+            latency = (lambda seconds: lambda rng: seconds)(float(latency))
+        self.latency = latency
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.prompts = prompts or classification_prompt
+        self.replies = self._load_replay(replay_path) if replay_path else {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "errors": 0, "malformed": 0, "replayed": 0}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            latency=FAKE_LATENCY,
+            error_rate=FAKE_ERROR_RATE,
+            malformed_rate=FAKE_MALFORMED_RATE,
+            replay_path=FAKE_REPLAY_PATH,
+            seed=int(FAKE_SEED) if FAKE_SEED else None
+        )
+
+    def configure(self, api_key):
+        pass
+
+    def get(self, model_name):
+        return FakeModel(self, model_name)
+
+    def respond(self, model_name, prompt):
+        """
+        Decide la latencia y el texto de una llamada
+
+        Returns:
+            tuple: (segundos de latencia, texto o None si la llamada falla)
+        """
+        with self._lock:
+            self._stats["calls"] += 1
+            delay = max(0.0, self.latency(self._rng))
+            if self._rng.random() < self.error_rate:
+                self._stats["errors"] += 1
+                return delay, None
+            malformed = self._rng.choice(MALFORMED_KINDS) if self._rng.random() < self.malformed_rate else None
+            if malformed:
+                self._stats["malformed"] += 1
+            replayed = self.replies.get(prompt_hash(prompt))
+            if replayed is not None:
+                self._stats["replayed"] += 1
+
+        text = replayed if replayed is not None else json.dumps(self._classify(prompt), ensure_ascii=False)
+        return delay, self._malform(text, malformed) if malformed else text
+
+    def finish(self, text):
+        if text is None:
+            raise ServiceUnavailable("Error simulado del backend de Gemini")
+        return FakeResponse(text)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def _classify(self, prompt):
+        """Resultado con la estructura del prompt (individual o por lote)"""
+        compiled = self.prompts.compiled()
+        if prompt.startswith(compiled.batch_prefix):
+            try:
+                messages = json.loads(prompt[len(compiled.batch_prefix):])
+            except ValueError:
+                messages = []
+            return {"resultados": [
+                {"id": message["id"], **self._classify_text(message["texto"], compiled.taxonomy)}
+                for message in messages
+            ]}
+        if prompt.startswith(compiled.single_prefix):
+            text = prompt[len(compiled.single_prefix):]
+            text = text[1:-1] if len(text) >= 2 and text[0] == text[-1] == '"' else text
+            return self._classify_text(text, compiled.taxonomy)
+        return {"categorias": [], "resumen": "Sin información para clasificar"}
+
+    def _classify_text(self, text, taxonomy):
+        """Entre cero y dos subcategorías de la taxonomía, elegidas a partir del texto"""
+        rng = random.Random(prompt_hash(text))
+        choices = [(category, name) for category, subcategories in taxonomy for name, _ in subcategories]
+        categories = {}
+        for category, subcategory in rng.sample(choices, min(len(choices), rng.randint(0, 2))):
+            categories.setdefault(category, []).append({
+                "nombre": subcategory,
+                "valor": text[:60],
+                "confianza": round(rng.uniform(0.6, 0.99), 2)
+            })
+        return {
+            "categorias": [{"nombre": name, "subcategorias": items} for name, items in categories.items()],
+            "resumen": text[:80]
+        }
+
+    def _malform(self, text, kind):
+        if kind == "truncated":
+            return text[:max(1, len(text) * 2 // 3)]
+        if kind == "fenced":
+            return f"Aquí está la clasificación:\n```json\n{text}\n```"
+        if kind == "trailing_comma":
+            return text[:-1] + ",}"
+        return "Lo siento, no puedo clasificar este mensaje."
+
+    def _load_replay(self, path):
+        replies = {}
+        with open(path, encoding="utf-8") as replay_file:
+            for line in replay_file:
+                if line.strip():
+                    entry = json.loads(line)
+                    replies[entry["prompt_hash"]] = entry["text"]
+        logger.info(f"Backend simulado: {len(replies)} respuestas grabadas cargadas de {path}")
+        return replies
+
+class RecordingModel:
+    def __init__(self, recorder, model_name, model):
+        self.recorder = recorder
+        self.model_name = model_name
+        self.model = model
+
+    def generate_content(self, prompt, **kwargs):
+        response = self.model.generate_content(prompt, **kwargs)
+        self.recorder.record(self.model_name, prompt, response)
+        return response
+
+    async def generate_content_async(self, prompt, **kwargs):
+        response = await self.model.generate_content_async(prompt, **kwargs)
+        self.recorder.record(self.model_name, prompt, response)
+        return response
+
+class RecordingBackend:
+    """
+    Envuelve un backend real y agrega cada respuesta a un archivo JSONL que
+    FakeGeminiBackend puede reproducir después sin red (replay_path)
+    """
+
+    def __init__(self, backend, path):
+        self.backend = backend
+        self.path = path
+        self.requires_api_key = getattr(backend, "requires_api_key", True)
+        self._lock = threading.Lock()
+
+    def configure(self, api_key):
+        self.backend.configure(api_key)
+
+    def get(self, model_name):
+        return RecordingModel(self, model_name, self.backend.get(model_name))
+
+    def record(self, model_name, prompt, response):
+        try:
+            text = response.text
+        except Exception:
+            return  # Respuesta sin texto (bloqueada por seguridad): no hay nada que reproducir
+        entry = {"prompt_hash": prompt_hash(prompt), "model": model_name, "text": text}
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as record_file:
+                record_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
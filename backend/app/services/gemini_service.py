@@ -1,9 +1,23 @@
 import os
-import json
+import time
+import inspect
 import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, TimeoutError as FutureTimeout
 from dotenv import load_dotenv
 import google.generativeai as genai
-from google.api_core.exceptions import InvalidArgument
+from google.generativeai import client as genai_client
+from google.generativeai.types import generation_types
+from google.ai import generativelanguage as glm
+from google.api_core.exceptions import InvalidArgument, DeadlineExceeded as RPCDeadlineExceeded
+from app.services.classification_cache import classification_cache
+from app.services.classification_prompt import classification_prompt
+from app.services.fake_gemini_backend import FakeGeminiBackend, RecordingBackend
+from app.services import llm_metrics
+from app.services.model_health import model_health
+from app.utils.deadline import DeadlineExceeded
+from app.utils.json_repair import parse_json
 
 # Configuración de logging
 logging.basicConfig(level=logging.INFO, 
@@ -22,167 +36,575 @@ FALLBACK_MODELS = [
     "models/gemini-1.5-pro"
 ]
 
+# Máximo de mensajes enviados en una misma llamada de clasificación por lote
+MAX_BATCH_SIZE = int(os.getenv("GEMINI_MAX_BATCH_SIZE", 10))
+
+# Petición de respaldo al siguiente modelo si el primero no respondió en su p95
+HEDGING_ENABLED = os.getenv("GEMINI_HEDGING", "false").lower() == "true"
+
+# Hilos para las llamadas con plazo o cubiertas con un modelo de respaldo
+CALL_WORKERS = int(os.getenv("GEMINI_CALL_WORKERS", 32))
+
+# Backend de modelos: "google" (la API real) o "fake" (simulado, sin red ni clave)
+GEMINI_BACKEND = os.getenv("GEMINI_BACKEND", "google").lower()
+
+# Archivo JSONL donde grabar las respuestas reales para reproducirlas con el backend simulado
+GEMINI_RECORD_PATH = os.getenv("GEMINI_RECORD_PATH")
+
+# Configuración de generación fija para todos los modelos: la clasificación debe ser estable
+GENERATION_CONFIG = {
+    "temperature": float(os.getenv("GEMINI_TEMPERATURE", 0.1)),
+    "candidate_count": 1
+}
+
+# Timeout por llamada (request_options): con él, gRPC cancela la petición al vencer el plazo.
+# El SDK fijado (0.3.x) no lo acepta; TimedModel lo pasa igual al cliente gRPC.
+REQUEST_TIMEOUTS = "request_options" in inspect.signature(genai.GenerativeModel.generate_content).parameters
+
+# Clase real del SDK, para distinguir sus modelos de los que no hablan gRPC
+_GenerativeModel = genai.GenerativeModel
+
+class TimedModel:
+    """
+    Envuelve un GenerativeModel para aceptar `request_options={"timeout": ...}` en las
+    versiones del SDK que no lo soportan. El timeout llega al cliente gRPC, que cancela
+    la petición al vencer el plazo: la llamada abandonada no queda ocupando un hilo del pool.
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def generate_content(self, contents, *, request_options=None, **kwargs):
+        model = self.model
+        timeout = (request_options or {}).get("timeout")
+        if timeout is None or kwargs.get("stream") or not isinstance(model, _GenerativeModel):
+            return model.generate_content(contents, **kwargs)
+        request = model._prepare_request(contents=contents, **kwargs)
+        if model._client is None:
+            model._client = genai_client.get_default_generative_client()
+        response = model._client.generate_content(request, timeout=timeout)
+        return generation_types.GenerateContentResponse.from_response(response)
+
+class ModelRegistry:
+    """
+    Clientes de modelo compartidos por el proceso: un GenerativeModel por nombre,
+    creado una sola vez con GENERATION_CONFIG. Como genai.configure descarta los
+    clientes (y sus canales) ya abiertos, la API se configura una única vez por clave
+    y todas las llamadas reutilizan el mismo canal.
+
+    Es también la interfaz de backend que usa GeminiService: `configure(api_key)`,
+    `get(model_name)` con un objeto que ofrece generate_content (con
+    `request_options={"timeout": ...}`) y generate_content_async, y
+    `requires_api_key` (ver FakeGeminiBackend).
+    """
+
+    requires_api_key = True
+
+    def __init__(self, generation_config=None):
+        self.generation_config = generation_config or GENERATION_CONFIG
+        self._models = {}
+        self._api_key = None
+        self._lock = threading.Lock()
+
+    def configure(self, api_key):
+        """Configura genai si la clave cambió; si no, conserva los clientes abiertos"""
+        with self._lock:
+            if api_key == self._api_key:
+                return
+            genai.configure(api_key=api_key)
+            self._api_key = api_key
+            self._models.clear()
+
+    def get(self, model_name):
+        """GenerativeModel del nombre indicado, creado en el primer uso"""
+        model = self._models.get(model_name)
+        if model is None:
+            with self._lock:
+                model = self._models.get(model_name)
+                if model is None:
+                    model = genai.GenerativeModel(model_name, generation_config=self.generation_config)
+                    if not REQUEST_TIMEOUTS:
+                        model = TimedModel(model)
+                    self._models[model_name] = model
+        return model
+
+    def clear(self):
+        """Descarta los clientes; la próxima configuración vuelve a crearlos"""
+        with self._lock:
+            self._models.clear()
+            self._api_key = None
+
+model_registry = ModelRegistry()
+
+def _default_backend():
+    """Backend del proceso según GEMINI_BACKEND y GEMINI_RECORD_PATH"""
+    if GEMINI_BACKEND == "fake":
+        logger.info("Usando el backend simulado de Gemini (sin red)")
+        return FakeGeminiBackend.from_env()
+    if GEMINI_RECORD_PATH:
+        return RecordingBackend(model_registry, GEMINI_RECORD_PATH)
+    return model_registry
+
+default_backend = _default_backend()
+
+# Salida JSON restringida por esquema (response_schema): solo en versiones del SDK que la soportan.
+# Con las anteriores, el formato se pide en el prompt y el parser tolerante repara la respuesta.
+STRUCTURED_OUTPUT = "response_schema" in glm.GenerationConfig.meta.fields
+
+# Caracteres por token para estimar el consumo cuando la respuesta no lo informa
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text):
+    """Tokens aproximados de un texto, redondeando hacia arriba"""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+class TokenUsage:
+    """
+    Tokens de prompt y de respuesta y latencia de cada llamada al modelo,
+    acumulados por modelo para seguir el costo y el tamaño de los prompts.
+    """
+
+    def __init__(self):
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def record(self, model_name, prompt_tokens, response_tokens, latency, estimated=False):
+        with self._lock:
+            totals = self._models.setdefault(model_name, {
+                "calls": 0, "prompt_tokens": 0, "response_tokens": 0, "latency": 0.0, "estimated_calls": 0
+            })
+            totals["calls"] += 1
+            totals["prompt_tokens"] += prompt_tokens
+            totals["response_tokens"] += response_tokens
+            totals["latency"] += latency
+            totals["estimated_calls"] += int(estimated)
+
+    def stats(self):
+        """Totales y promedios por llamada de cada modelo"""
+        with self._lock:
+            return {
+                model_name: {
+                    "calls": totals["calls"],
+                    "prompt_tokens": totals["prompt_tokens"],
+                    "response_tokens": totals["response_tokens"],
+                    "estimated_calls": totals["estimated_calls"],
+                    "avg_prompt_tokens": totals["prompt_tokens"] / totals["calls"],
+                    "avg_response_tokens": totals["response_tokens"] / totals["calls"],
+                    "avg_latency_ms": totals["latency"] / totals["calls"] * 1000
+                }
+                for model_name, totals in self._models.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._models.clear()
+
+token_usage = TokenUsage()
+
+class ParseStats:
+    """Respuestas decodificadas sin cambios, reparadas o descartadas"""
+
+    def __init__(self):
+        self._counts = {"clean": 0, "repaired": 0, "failed": 0}
+        self._lock = threading.Lock()
+
+    def record(self, outcome):
+        with self._lock:
+            self._counts[outcome] += 1
+        llm_metrics.PARSE_RESULTS.labels(outcome).inc()
+
+    def stats(self):
+        with self._lock:
+            total = sum(self._counts.values())
+            return {**self._counts, "failure_rate": self._counts["failed"] / total if total else 0.0}
+
+    def reset(self):
+        with self._lock:
+            self._counts = dict.fromkeys(self._counts, 0)
+
+parse_stats = ParseStats()
+
+class ModelTimeout(DeadlineExceeded):
+    """Un modelo no respondió dentro del plazo de la llamada"""
+
+    def __init__(self, model_name, message):
+        super().__init__(f"Timeout de {model_name}: {message}")
+        self.model_name = model_name
+
+_call_pool = None
+_call_pool_lock = threading.Lock()
+
+def _executor():
+    """Pool de hilos del proceso para las llamadas con plazo o cubiertas con un modelo de respaldo"""
+    global _call_pool
+    with _call_pool_lock:
+        if _call_pool is None:
+            _call_pool = ThreadPoolExecutor(max_workers=CALL_WORKERS, thread_name_prefix='gemini')
+        return _call_pool
+
 class GeminiService:
     """Servicio para interactuar con la API de Gemini AI"""
     
-    def __init__(self):
-        """Inicializa el servicio y configura el cliente de Gemini"""
+    def __init__(self, health=None, registry=None, cache=None, prompts=None, usage=None, parsing=None,
+                 hedging=None):
+        """
+        Inicializa el servicio y configura el cliente de Gemini.
+        No hace llamadas de red: el modelo se elige en la primera clasificación.
+        
+        Args:
+            registry (ModelRegistry, optional): Backend de modelos (por defecto, según GEMINI_BACKEND)
+            hedging (bool, optional): Consultar un modelo de respaldo si el primero tarda
+                más que su p95 (GEMINI_HEDGING)
+        """
+        self.registry = registry or default_backend
         self.api_key = os.getenv("GOOGLE_API_KEY")
-        if not self.api_key:
+        if not self.api_key and self.registry.requires_api_key:
             logger.error("No se encontró la clave API de Google en las variables de entorno")
             raise ValueError("API key de Google no configurada")
         
-        genai.configure(api_key=self.api_key)
+        self.registry.configure(self.api_key)
         self.model_name = PRIMARY_MODEL
-        self._verify_model_availability()
+        self.health = health or model_health
+        self.cache = cache or classification_cache
+        self.prompts = prompts or classification_prompt
+        self.usage = usage or token_usage
+        self.parsing = parsing or parse_stats
+        self.hedging = HEDGING_ENABLED if hedging is None else hedging
     
     def _verify_model_availability(self):
-        """Verifica que el modelo preferido esté disponible"""
-        try:
-            logger.info(f"Verificando disponibilidad del modelo: {self.model_name}")
-            model = genai.GenerativeModel(self.model_name)
-            # Prueba una generación simple para verificar si el modelo funciona
-            response = model.generate_content("Prueba de conexión", stream=False)
-            if response:
-                logger.info(f"Modelo verificado exitosamente: {self.model_name}")
-                return True
-        except Exception as e:
-            logger.warning(f"No se pudo usar el modelo primario {self.model_name}: {str(e)}")
-            # Intentar con modelos alternativos
-            for alt_model in FALLBACK_MODELS:
-                try:
-                    logger.info(f"Probando modelo alternativo: {alt_model}")
-                    model = genai.GenerativeModel(alt_model)
-                    response = model.generate_content("Prueba de conexión", stream=False)
-                    if response:
-                        logger.info(f"Usando modelo alternativo: {alt_model}")
-                        self.model_name = alt_model
-                        return True
-                except Exception as alt_e:
-                    logger.warning(f"No se pudo usar el modelo alternativo {alt_model}: {str(alt_e)}")
-                    continue
-            
-            logger.error("No se encontró ningún modelo disponible")
-            raise RuntimeError("No se pudo conectar a ningún modelo de Gemini AI")
+        """
+        Prueba los modelos en orden de preferencia con una generación real y
+        actualiza su estado de salud. Solo se usa en diagnósticos (test_connection).
+        """
+        for candidate in [self.model_name] + [m for m in FALLBACK_MODELS if m != self.model_name]:
+            try:
+                logger.info(f"Verificando disponibilidad del modelo: {candidate}")
+                model = self.registry.get(candidate)
+                response = model.generate_content("Prueba de conexión", stream=False)
+                if response:
+                    self.health.mark_success(candidate)
+                    logger.info(f"Modelo verificado exitosamente: {candidate}")
+                    return candidate
+            except Exception as e:
+                self.health.mark_failure(candidate, e)
+                logger.warning(f"No se pudo usar el modelo {candidate}: {str(e)}")
+        
+        logger.error("No se encontró ningún modelo disponible")
+        raise RuntimeError("No se pudo conectar a ningún modelo de Gemini AI")
     
-    def classify_message(self, message_text):
+    def classify_message(self, message_text, deadline=None):
         """
         Clasifica un mensaje utilizando Gemini para extraer información estructurada.
         
         Args:
             message_text (str): El mensaje original del cuidador
+            deadline (Deadline, optional): Plazo para todos los intentos, alternativos incluidos
             
         Returns:
             dict: Datos clasificados en categorías estructuradas
         """
+        started = time.monotonic()
+        prompt_version = self.prompt_version()
+        result = self.cache.get(message_text, prompt_version, self.model_name)
+        cached = result is not None
+        if not cached:
+            result = self._classify_single(message_text, prompt_version, deadline)
+        self._observe_classification("message", started, [result], cached)
+        return result
+    
+    def _classify_single(self, message_text, prompt_version, deadline=None):
+        """Clasifica un mensaje con el modelo, sin consultar la caché, y guarda el resultado"""
         # Definir el prompt para clasificación
         prompt = self._create_classification_prompt(message_text)
+        models = self._candidate_models()
         
         try:
-            # Llamar a Gemini AI
-            model = genai.GenerativeModel(self.model_name)
-            response = model.generate_content(prompt)
+            # Llamar a Gemini AI (con modelos alternativos si falla el principal)
+            response, answered_by = self._generate_content(
+                prompt, self.prompts.compiled().single_schema, models, deadline
+            )
             
             # Procesar y limpiar la respuesta para obtener JSON válido
-            return self._process_response(response)
+            result = self._complete_single(self._process_response(response))
+            # Con la clave del modelo que respondió: lo de un alternativo no se sirve como del principal
+            self.cache.set(message_text, prompt_version, answered_by, result)
+            return result
             
         except Exception as e:
-            logger.error(f"Error al clasificar mensaje: {str(e)}")
-            # Intentar con modelos alternativos si falla el principal
-            for alt_model in FALLBACK_MODELS:
-                if alt_model != self.model_name:
-                    try:
-                        logger.info(f"Intentando clasificación con modelo alternativo: {alt_model}")
-                        model = genai.GenerativeModel(alt_model)
-                        response = model.generate_content(prompt)
-                        result = self._process_response(response)
-                        # Actualizar el modelo preferido si funciona bien
-                        self.model_name = alt_model
-                        logger.info(f"Clasificación exitosa con modelo alternativo: {alt_model}")
-                        return result
-                    except Exception as alt_e:
-                        logger.warning(f"Error con modelo alternativo {alt_model}: {str(alt_e)}")
-                        continue
-            
             # Si ningún modelo funciona, devolver respuesta de error
             return {
                 "categorias": [],
                 "resumen": "Error en clasificación",
-                "error": str(e)
+                "error": str(e),
+                "modelos": models
             }
     
-    def _create_classification_prompt(self, message_text):
-        """Crea el prompt para la clasificación basado en el mensaje recibido"""
-        return f"""
-        Actúa como un sistema de clasificación de mensajes para cuidadores de personas mayores o con condiciones neurodegenerativas.
-        
-        Analiza el siguiente mensaje y extrae información estructurada según estas categorías:
-        
-        1. Salud Física:
-           - Movilidad (pasos, distancia)
-           - Alimentación (comidas, apetito)
-           - Sueño (horas, calidad)
-           - Síntomas (dolor, malestar)
+    def classify_messages(self, messages, deadline=None):
+        """
+        Clasifica varios mensajes agrupándolos en una sola llamada al modelo,
+        de modo que las instrucciones de la taxonomía se envían una vez por lote.
         
-        2. Salud Cognitiva:
-           - Memoria (olvidos, reconocimiento)
-           - Orientación (tiempo, lugar)
-           - Comunicación (claridad, coherencia)
+        Args:
+            messages (list): Textos de los mensajes a clasificar
+            deadline (Deadline, optional): Plazo para todos los lotes y sus reintentos
+            
+        Returns:
+            list: Un resultado por mensaje, en el mismo orden que la entrada
+        """
+        # Solo se envían al modelo los mensajes que no están en la caché
+        started = time.monotonic()
+        prompt_version = self.prompt_version()
+        results = [self.cache.get(text, prompt_version, self.model_name) for text in messages]
+        missing = [i for i, result in enumerate(results) if result is None]
+        for start in range(0, len(missing), MAX_BATCH_SIZE):
+            indexes = missing[start:start + MAX_BATCH_SIZE]
+            batch_results = self._classify_batch([messages[i] for i in indexes], prompt_version, deadline)
+            for index, result in zip(indexes, batch_results):
+                results[index] = result
+        self._observe_classification("messages", started, results, not missing)
+        return results
+    
+    def _classify_batch(self, messages, prompt_version, deadline=None):
+        """Clasifica un lote y recurre a llamadas individuales para lo que falle"""
+        if len(messages) == 1:
+            return [self._classify_single(messages[0], prompt_version, deadline)]
         
-        3. Estado Emocional:
-           - Humor (alegría, tristeza, irritabilidad)
-           - Sociabilidad (interacción, aislamiento)
-           - Agitación (inquietud, ansiedad)
+        results = [None] * len(messages)
+        try:
+            response, answered_by = self._generate_content(
+                self._create_batch_classification_prompt(messages), self.prompts.compiled().batch_schema,
+                deadline=deadline
+            )
+            batch_data = self._process_response(response)
+            if "error" in batch_data:
+                raise ValueError(batch_data["error"])
+            
+            for item in batch_data.get("resultados", []):
+                index = self._batch_index(item.get("id"), len(messages))
+                # Sin "resumen" (el último campo) el resultado quedó truncado y se pide aparte
+                if index is not None and "resumen" in item:
+                    results[index] = {
+                        "categorias": item.get("categorias", []),
+                        "resumen": item.get("resumen", "")
+                    }
+                    self.cache.set(messages[index], prompt_version, answered_by, results[index])
+        except Exception as e:
+            logger.warning(f"Error en clasificación por lote de {len(messages)} mensajes: {str(e)}")
         
-        4. Medicación:
-           - Adherencia (toma, rechazo)
-           - Efectos (reacciones, eficacia)
+        # Los mensajes sin resultado en el lote se clasifican uno por uno
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            logger.info(f"Clasificando individualmente {len(missing)} de {len(messages)} mensajes del lote")
+        for index in missing:
+            results[index] = self._classify_single(messages[index], prompt_version, deadline)
+        return results
+    
+    def _observe_classification(self, operation, started, results, cached):
+        """Registra la duración de una clasificación para /metrics"""
+        outcome = "cached" if cached else (
+            "error" if any("error" in result for result in results) else "success"
+        )
+        llm_metrics.CLASSIFY_DURATION.labels(operation, outcome).observe(time.monotonic() - started)
+    
+    def _batch_index(self, message_id, batch_size):
+        """Convierte un ID de lote ('m3') en su posición dentro del lote"""
+        try:
+            index = int(str(message_id).lstrip("m")) - 1
+        except ValueError:
+            return None
+        return index if 0 <= index < batch_size else None
+    
+    def _candidate_models(self):
+        """Modelos que se prueban en una llamada: por preferencia, con los que fallaron hace poco al final"""
+        preferred = [self.model_name] + [model for model in FALLBACK_MODELS if model != self.model_name]
+        return self.health.order(preferred)
+    
+    def _generate_content(self, prompt, schema=None, candidates=None, deadline=None):
+        """
+        Envía el prompt al modelo preferido y, si falla, a los alternativos.
+        Con `schema`, y si el SDK lo soporta, la respuesta queda restringida a JSON válido.
         
-        5. Gastos:
-           - Medicamentos (costos)
-           - Servicios (costos)
-           - Otros (detallar)
+        Args:
+            candidates (list, optional): Modelos en orden, si el llamador ya los eligió
+            deadline (Deadline, optional): Plazo compartido por todos los intentos; cada
+                modelo espera solo lo que queda y el que no responde a tiempo cuenta un timeout
         
-        Mensaje del cuidador:
-        "{message_text}"
+        Returns:
+            tuple: (respuesta del primer modelo que responde, nombre de ese modelo)
+            
+        Raises:
+            Exception: El error del modelo preferido si ningún modelo responde
+            DeadlineExceeded: Si el plazo venció antes de la primera respuesta válida
+        """
+        candidates = candidates or self._candidate_models()
+        first_error = None
+        index = 0
+        attempts = 0
+        try:
+            while index < len(candidates):
+                candidate = candidates[index]
+                if deadline is not None and deadline.expired:
+                    first_error = first_error or DeadlineExceeded(
+                        f"Plazo de {deadline.timeout:g} s agotado antes de probar {candidate}"
+                    )
+                    break
+                if first_error is not None:
+                    logger.info(f"Intentando clasificación con modelo alternativo: {candidate}")
+                
+                backup = candidates[index + 1] if index + 1 < len(candidates) else None
+                delay = self.health.hedge_delay(candidate) if self.hedging and backup else None
+                if delay is None and deadline is None:
+                    attempts += 1
+                    try:
+                        return self._call_model(candidate, prompt, schema), candidate
+                    except Exception as e:
+                        first_error = first_error or e
+                        index += 1
+                        continue
+                
+                # Con plazo o cobertura la llamada corre en el pool y aquí solo se espera
+                futures = {self._submit(candidate, prompt, schema, deadline): candidate}
+                if delay is not None:
+                    hedge_wait = delay if deadline is None else min(delay, deadline.remaining())
+                    if not wait(futures, timeout=hedge_wait).done and not (deadline and deadline.expired):
+                        # El modelo no respondió en su p95: se lanza el respaldo y gana la primera respuesta válida
+                        logger.info(f"{candidate} superó su p95 ({delay * 1000:.0f} ms), consultando también {backup}")
+                        futures[self._submit(backup, prompt, schema, deadline)] = backup
+                attempts += len(futures)
+                try:
+                    for future in as_completed(futures, timeout=deadline.remaining() if deadline else None):
+                        try:
+                            return future.result(), futures[future]
+                        except ModelTimeout as e:
+                            self._record_timeout(e.model_name, deadline)
+                            first_error = first_error or e
+                        except Exception as e:
+                            first_error = first_error or e
+                except FutureTimeout:
+                    # La llamada en curso se abandona: el resultado tardío no cuenta para la salud del modelo
+                    for future, model_name in futures.items():
+                        if not future.done() and not future.cancel():
+                            self._record_timeout(model_name, deadline)
+                    first_error = first_error or DeadlineExceeded(
+                        f"Plazo de {deadline.timeout:g} s agotado esperando a {', '.join(futures.values())}"
+                    )
+                    break
+                index += len(futures)
+            raise first_error
+        finally:
+            if attempts:
+                llm_metrics.ATTEMPTS.observe(attempts)
+    
+    def _submit(self, model_name, prompt, schema, deadline):
+        """Lanza una llamada en el pool, con el contexto actual (paciente al que se atribuyen los tokens)"""
+        context = contextvars.copy_context()
+        return _executor().submit(context.run, self._call_model, model_name, prompt, schema, deadline)
+    
+    def _call_model(self, model_name, prompt, schema=None, deadline=None):
+        """
+        Una llamada a un modelo, con su latencia y resultado registrados en el estado de salud.
+        Si el plazo venció mientras tanto, quien esperaba ya registró el timeout y el
+        resultado tardío no se cuenta.
+        """
+        if deadline is not None:
+            deadline.check(f"llamar a {model_name}")
+        started = time.monotonic()
+        try:
+            model = self.registry.get(model_name)
+            response = model.generate_content(prompt, **self._request_options(schema, deadline))
+            latency = time.monotonic() - started
+            self._record_usage(model_name, prompt, response, latency)
+            llm_metrics.record_call(model_name, "success", latency)
+            if deadline is None or not deadline.expired:
+                self.health.mark_success(model_name, latency)
+            return response
+        except RPCDeadlineExceeded as e:
+            raise ModelTimeout(model_name, str(e)) from e
+        except Exception as e:
+            llm_metrics.record_call(model_name, "error", time.monotonic() - started)
+            if deadline is None or not deadline.expired:
+                self.health.mark_failure(model_name, e)
+            logger.warning(f"Error al clasificar con el modelo {model_name}: {str(e)}")
+            raise
+    
+    def _record_timeout(self, model_name, deadline):
+        self.health.mark_timeout(model_name)
+        llm_metrics.record_call(model_name, "timeout")
+        logger.warning(f"Timeout del modelo {model_name} (plazo de {deadline.timeout:g} s)")
+    
+    def _request_options(self, schema, deadline=None):
+        """
+        Argumentos de generate_content: salida restringida al esquema, si el SDK la
+        soporta, y timeout de transporte con lo que queda del plazo
+        """
+        options = {}
+        if STRUCTURED_OUTPUT and schema:
+            options["generation_config"] = {"response_mime_type": "application/json", "response_schema": schema}
+        if deadline is not None:
+            options["request_options"] = {"timeout": max(deadline.remaining(), 0.001)}
+        return options
+    
+    def prompt_version(self):
+        """
+        Huella de los prompts de clasificación (instrucciones y taxonomía incluidas).
+        Forma parte de la clave de la caché, así que cambiar cualquiera de los dos la invalida.
+        """
+        return self.prompts.compiled().version
+    
+    def _record_usage(self, model_name, prompt, response, latency):
+        """
+        Registra los tokens de la llamada (estimados si la respuesta no trae usage_metadata)
         
-        Devuelve SOLO un objeto JSON con esta estructura, sin explicaciones adicionales:
-        {{
-            "categorias": [
-                {{
-                    "nombre": "Salud Física",
-                    "detectada": true/false,
-                    "subcategorias": [
-                        {{
-                            "nombre": "Movilidad",
-                            "detectada": true/false,
-                            "valor": "texto extraído",
-                            "confianza": 0.9 // número entre 0 y 1
-                        }},
-                        // Otras subcategorías...
-                    ]
-                }},
-                // Otras categorías...
-            ],
-            "resumen": "Breve resumen del estado general del paciente basado en el mensaje"
-        }}
+        Returns:
+            tuple: (tokens del prompt, tokens de la respuesta)
         """
+        usage = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(usage, "prompt_token_count", None)
+        response_tokens = getattr(usage, "candidates_token_count", None)
+        estimated = not (isinstance(prompt_tokens, int) and isinstance(response_tokens, int))
+        if estimated:
+            try:
+                response_text = response.text
+            except Exception:
+                response_text = ""
+            prompt_tokens = estimate_tokens(prompt)
+            response_tokens = estimate_tokens(response_text) if isinstance(response_text, str) else 0
+        self.usage.record(model_name, prompt_tokens, response_tokens, latency, estimated)
+        llm_metrics.record_tokens(model_name, prompt_tokens, response_tokens)
+        logger.info(f"Llamada a {model_name}: {prompt_tokens} tokens de prompt, {response_tokens} de respuesta"
+                    f"{' (estimados)' if estimated else ''}, {latency * 1000:.0f} ms")
+        return prompt_tokens, response_tokens
+    
+    def _create_classification_prompt(self, message_text):
+        """Crea el prompt para clasificar un mensaje a partir de la taxonomía activa"""
+        return self.prompts.compiled().single(message_text)
+    
+    def _create_batch_classification_prompt(self, messages):
+        """Crea un prompt que clasifica varios mensajes independientes a la vez"""
+        return self.prompts.compiled().batch(messages)
     
     def _process_response(self, response):
-        """Procesa la respuesta del modelo para extraer el JSON válido"""
+        """
+        Procesa la respuesta del modelo para extraer el JSON. Las respuestas con defectos
+        menores (bloques de código, comentarios, final truncado) se reparan en lugar de
+        descartarse, para no repetir la llamada.
+        """
         try:
-            response_text = response.text
-            # Si la respuesta contiene bloques de código, extraer solo el JSON
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0].strip()
-                
-            # Convertir respuesta a diccionario
-            classified_data = json.loads(response_text)
+            classified_data, repaired = parse_json(response.text)
+            if not isinstance(classified_data, dict):
+                raise ValueError("La respuesta no es un objeto JSON")
+            for result in [classified_data] + classified_data.get("resultados", []):
+                self._mark_detected(result)
+            if repaired:
+                logger.warning("Respuesta del modelo reparada antes de decodificarla")
+            self.parsing.record("repaired" if repaired else "clean")
             return classified_data
             
         except Exception as e:
+            self.parsing.record("failed")
             logger.error(f"Error procesando respuesta: {e}")
             # Respuesta de fallback si hay error
             return {
@@ -191,10 +613,30 @@ class GeminiService:
                 "error": str(e)
             }
     
+    def _complete_single(self, result):
+        """
+        Como en los lotes, un resultado sin `resumen` (el último campo) viene de una
+        respuesta truncada: se trata como error para que no se guarde ni se cachee
+        una clasificación parcial y el trabajo se reintente
+        """
+        if "error" not in result and "resumen" not in result:
+            raise ValueError("Respuesta incompleta del modelo: falta el resumen")
+        return result
+    
+    def _mark_detected(self, result):
+        """
+        El prompt pide una salida dispersa, solo con lo detectado: se completa
+        `detectada` para conservar la estructura que esperan los consumidores.
+        """
+        for category in result.get("categorias", []):
+            category.setdefault("detectada", True)
+            for subcategory in category.get("subcategorias", []):
+                subcategory.setdefault("detectada", True)
+    
     def test_connection(self):
         """Prueba la conexión con el servicio de Gemini"""
         try:
-            self._verify_model_availability()
-            return True, f"Conexión exitosa con el modelo {self.model_name}"
+            model_name = self._verify_model_availability()
+            return True, f"Conexión exitosa con el modelo {model_name}"
         except Exception as e:
             return False, f"No se pudo establecer conexión: {str(e)}"
\ No newline at end of file
@@ -0,0 +1,152 @@
+# backend/app/services/llm_metrics.py
+import os
+import contextvars
+from contextlib import contextmanager
+from prometheus_client import (
+    Counter, Histogram, CollectorRegistry, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, multiprocess,
+    start_http_server
+)
+
+# Con PROMETHEUS_MULTIPROC_DIR (ver gunicorn.conf.py) cada worker escribe sus métricas
+# en ese directorio y /metrics las suma: el resultado es el del servicio completo.
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Las llamadas al modelo, las reglas y el clasificador local corren en `flask classify-worker`,
+# no en gunicorn: el worker expone sus propias métricas en este puerto (0 las desactiva)
+WORKER_METRICS_PORT = int(os.getenv("CLASSIFY_WORKER_METRICS_PORT", 9100))
+
+# Precio en USD por millón de tokens (prompt, respuesta), para estimar el costo por modelo
+MODEL_PRICES = {
+    "models/gemini-2.0-flash-lite": (0.075, 0.30),
+    "models/gemini-2.0-flash": (0.10, 0.40),
+    "models/gemini-1.5-flash": (0.075, 0.30),
+    "models/gemini-1.5-pro": (1.25, 5.00),
+}
+
+# Latencias de un modelo de lenguaje: desde respuestas en caché hasta el plazo máximo
+LATENCY_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+
+CLASSIFY_DURATION = Histogram(
+    "gemini_classify_duration_seconds",
+    "Duración de classify_message y classify_messages, caché incluida",
+    ["operation", "outcome"], buckets=LATENCY_BUCKETS
+)
+CALL_DURATION = Histogram(
+    "gemini_call_duration_seconds",
+    "Duración de cada llamada a un modelo",
+    ["model", "outcome"], buckets=LATENCY_BUCKETS
+)
+CALL_TIMEOUTS = Counter(
+    "gemini_call_timeouts_total",
+    "Llamadas que no respondieron dentro del plazo",
+    ["model"]
+)
+ATTEMPTS = Histogram(
+    "gemini_attempts",
+    "Modelos probados por petición al modelo (1 = respondió el primero)",
+    buckets=(1, 2, 3, 4)
+)
+TOKENS = Counter(
+    "gemini_tokens_total",
+    "Tokens consumidos por modelo (estimados si la respuesta no los informa)",
+    ["model", "kind"]
+)
+PATIENT_TOKENS = Counter(
+    "gemini_patient_tokens_total",
+    "Tokens consumidos por paciente",
+    ["patient"]
+)
+COST = Counter(
+    "gemini_cost_usd_total",
+    "Costo estimado en USD por modelo",
+    ["model"]
+)
+PARSE_RESULTS = Counter(
+    "gemini_parse_results_total",
+    "Respuestas del modelo según el resultado del parser",
+    ["outcome"]
+)
+CACHE_LOOKUPS = Counter(
+    "classification_cache_lookups_total",
+    "Búsquedas en la caché de clasificaciones por resultado",
+    ["result"]
+)
+# Las reglas y el clasificador local corren en classify-worker: se leen en WORKER_METRICS_PORT
+RULE_EVALUATED = Counter(
+    "rule_evaluated",
+    "Mensajes evaluados por el clasificador de reglas"
+)
+RULE_BYPASS = Counter(
+    "rule_bypass",
+    "Mensajes resueltos por las reglas sin consultar al modelo"
+)
+LOCAL_EVALUATED = Counter(
+    "local_classifier_evaluated",
+    "Mensajes evaluados por el clasificador local"
+)
+LOCAL_ACCEPTED = Counter(
+    "local_classifier_accepted",
+    "Mensajes resueltos por el clasificador local sin consultar al modelo"
+)
+
+# Paciente al que se atribuyen los tokens de las llamadas en curso
+_patient = contextvars.ContextVar("gemini_patient", default="unknown")
+
+@contextmanager
+def attribute_to_patients(patient_ids):
+    """
+    Atribuye los tokens de las llamadas hechas dentro del bloque a un paciente;
+    un lote con mensajes de varios pacientes queda como "multiple"
+    """
+    patients = {str(patient_id) for patient_id in patient_ids if patient_id is not None}
+    token = _patient.set(patients.pop() if len(patients) == 1 else ("multiple" if patients else "unknown"))
+    try:
+        yield
+    finally:
+        _patient.reset(token)
+
+def record_call(model_name, outcome, latency=None):
+    """outcome: success, error o timeout"""
+    if outcome == "timeout":
+        CALL_TIMEOUTS.labels(model_name).inc()
+    elif latency is not None:
+        CALL_DURATION.labels(model_name, outcome).observe(latency)
+
+def record_tokens(model_name, prompt_tokens, response_tokens):
+    TOKENS.labels(model_name, "prompt").inc(prompt_tokens)
+    TOKENS.labels(model_name, "response").inc(response_tokens)
+    PATIENT_TOKENS.labels(_patient.get()).inc(prompt_tokens + response_tokens)
+    prompt_price, response_price = MODEL_PRICES.get(model_name, (0.0, 0.0))
+    COST.labels(model_name).inc((prompt_tokens * prompt_price + response_tokens * response_price) / 1e6)
+
+def _registry():
+    """Registro a exportar: el del proceso, o la suma de los procesos en modo multiproceso"""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=MULTIPROC_DIR)
+        return registry
+    return REGISTRY
+
+def render_metrics():
+    """
+    Métricas en formato de texto de Prometheus, sumadas entre los workers si
+    está configurado el modo multiproceso
+
+    Returns:
+        tuple: (contenido, content type)
+    """
+    return generate_latest(_registry()), CONTENT_TYPE_LATEST
+
+def start_metrics_server(port, addr="0.0.0.0"):
+    """
+    Expone las métricas por HTTP desde un proceso sin servidor web (los workers de la CLI)
+
+    Args:
+        port (int): Puerto a escuchar (0 elige uno libre)
+        addr (str): Dirección a escuchar
+
+    Returns:
+        WSGIServer: Servidor en un hilo daemon; `server_port` tiene el puerto real
+    """
+    server, _ = start_http_server(port, addr=addr, registry=_registry())
+    return server
@@ -0,0 +1,366 @@
+# backend/app/services/local_classifier.py
+import os
+import re
+import json
+import zlib
+import logging
+import threading
+import numpy as np
+from app.services.classification_cache import normalize_message
+from app.services.rule_classifier import rule_classifier, fold_text
+from app.services.llm_metrics import LOCAL_EVALUATED, LOCAL_ACCEPTED
+
+# Configuración de logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Modelo entrenado con `flask train-local-classifier`; sin él, todo va a Gemini
+LOCAL_CLASSIFIER_PATH = os.getenv("LOCAL_CLASSIFIER_PATH")
+
+# Confianza mínima en cada subcategoría (presente o ausente) para no consultar al modelo
+LOCAL_MIN_CONFIDENCE = float(os.getenv("LOCAL_CLASSIFIER_MIN_CONFIDENCE", 0.95))
+
+# Dimensión del espacio de n-gramas y ejemplos positivos mínimos para aprender una subcategoría
+HASH_FEATURES = 2 ** 15
+MIN_POSITIVES = 5
+
+FORMAT_VERSION = 1
+
+# Subcategorías cuyo valor se lee como número (montos en financial_data y patient_data;
+# temperatura, presión, oxígeno y horas de sueño en health_data). Para ellas el texto del
+# mensaje no sirve como valor: se extrae la medición o el mensaje va a Gemini.
+NUMERIC_CATEGORIES = {"Gastos"}
+NUMERIC_SUBCATEGORIES = {("Salud Física", "Síntomas"), ("Salud Física", "Sueño")}
+SLEEP = ("Salud Física", "Sueño")
+SLEEP_HOURS = re.compile(r"(\d+(?:[.,]\d+)?)\s*(?:horas|hs)\b")
+_DIGIT = re.compile(r"\d")
+
+class HashedNgramVectorizer:
+    """
+    Representa un mensaje como n-gramas de caracteres (3 a 5) y de palabras (1 y 2)
+    sobre el texto normalizado, proyectados con CRC32 a un vector de dimensión fija.
+    No guarda vocabulario: el mismo texto da el mismo vector en cualquier proceso.
+    """
+
+    def __init__(self, n_features=HASH_FEATURES, char_ngrams=(3, 5)):
+        self.n_features = n_features
+        self.char_ngrams = char_ngrams
+
+    def ngrams(self, text):
+        normalized = normalize_message(text)
+        words = normalized.split()
+        padded = f" {normalized} "
+        low, high = self.char_ngrams
+        grams = [padded[i:i + n] for n in range(low, high + 1) for i in range(len(padded) - n + 1)]
+        grams.extend(f"w:{word}" for word in words)
+        grams.extend(f"w:{first} {second}" for first, second in zip(words, words[1:]))
+        return grams
+
+    def transform_one(self, text):
+        """
+        Returns:
+            tuple: (índices ordenados, pesos) del vector disperso con norma L2 1
+        """
+        grams = self.ngrams(text)
+        if not grams:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        hashed = np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.int64,
+                             count=len(grams)) % self.n_features
+        indices, counts = np.unique(hashed, return_counts=True)
+        values = np.log1p(counts).astype(np.float32)
+        return indices, values / np.linalg.norm(values)
+
+    def transform(self, texts):
+        """Matriz densa (len(texts), n_features); usar por tandas"""
+        matrix = np.zeros((len(texts), self.n_features), dtype=np.float32)
+        for row, text in enumerate(texts):
+            indices, values = self.transform_one(text)
+            matrix[row, indices] = values
+        return matrix
+
+class LocalModel:
+    """
+    Una regresión logística por subcategoría sobre el vector de n-gramas. Un mensaje
+    puede tener varias subcategorías, así que cada una decide por separado.
+    """
+
+    def __init__(self, labels, weights, bias, vectorizer=None):
+        """
+        Args:
+            labels (list): Pares (categoría, subcategoría), uno por columna de `weights`
+            weights (ndarray): Pesos (n_features, len(labels))
+            bias (ndarray): Sesgo por subcategoría
+        """
+        self.labels = [tuple(label) for label in labels]
+        self.weights = weights.astype(np.float32)
+        self.bias = bias.astype(np.float32)
+        self.vectorizer = vectorizer or HashedNgramVectorizer(n_features=weights.shape[0])
+
+    @classmethod
+    def train(cls, texts, label_sets, n_features=HASH_FEATURES, epochs=8, batch_size=256,
+              learning_rate=0.5, l2=1e-5, min_positives=MIN_POSITIVES, seed=0):
+        """
+        Entrena con descenso por gradiente en minilotes (AdaGrad)
+
+        Args:
+            texts (list): Mensajes
+            label_sets (list): Por mensaje, el conjunto de (categoría, subcategoría) que
+                asignó Gemini; vacío si el mensaje no tenía nada que clasificar
+            min_positives (int): Las subcategorías con menos ejemplos no se aprenden
+
+        Returns:
+            LocalModel
+        """
+        counts = {}
+        for label_set in label_sets:
+            for label in label_set:
+                counts[label] = counts.get(label, 0) + 1
+        labels = sorted(label for label, count in counts.items() if count >= min_positives)
+        column = {label: i for i, label in enumerate(labels)}
+
+        targets = np.zeros((len(texts), len(labels)), dtype=np.float32)
+        for row, label_set in enumerate(label_sets):
+            for label in label_set:
+                if label in column:
+                    targets[row, column[label]] = 1.0
+
+        vectorizer = HashedNgramVectorizer(n_features=n_features)
+        weights = np.zeros((n_features, len(labels)), dtype=np.float32)
+        # El sesgo arranca en la frecuencia de cada subcategoría
+        prior = np.clip(targets.mean(axis=0), 1e-3, 1 - 1e-3) if len(texts) else np.full(len(labels), 0.5)
+        bias = np.log(prior / (1 - prior)).astype(np.float32)
+        weight_history = np.full_like(weights, 1e-8)
+        bias_history = np.full_like(bias, 1e-8)
+
+        rng = np.random.default_rng(seed)
+        for _ in range(epochs if labels else 0):
+            order = rng.permutation(len(texts))
+            for start in range(0, len(texts), batch_size):
+                rows = order[start:start + batch_size]
+                features = vectorizer.transform([texts[row] for row in rows])
+                error = _sigmoid(features @ weights + bias) - targets[rows]
+                weight_grad = features.T @ error / len(rows) + l2 * weights
+                bias_grad = error.mean(axis=0)
+                weight_history += weight_grad ** 2
+                bias_history += bias_grad ** 2
+                weights -= learning_rate * weight_grad / np.sqrt(weight_history)
+                bias -= learning_rate * bias_grad / np.sqrt(bias_history)
+
+        return cls(labels, weights, bias, vectorizer)
+
+    def predict_proba(self, text):
+        """Probabilidad de cada subcategoría de `labels` para un mensaje"""
+        indices, values = self.vectorizer.transform_one(text)
+        return _sigmoid(values @ self.weights[indices] + self.bias)
+
+    def save(self, path):
+        meta = {"version": FORMAT_VERSION, "labels": self.labels, "n_features": self.vectorizer.n_features}
+        with open(path, "wb") as model_file:
+            np.savez_compressed(model_file, weights=self.weights, bias=self.bias,
+                                meta=np.array(json.dumps(meta, ensure_ascii=False)))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("version") != FORMAT_VERSION:
+                raise ValueError(f"Versión de modelo local no soportada: {meta.get('version')}")
+            return cls(meta["labels"], data["weights"], data["bias"],
+                       HashedNgramVectorizer(n_features=meta["n_features"]))
+
+def is_numeric(label):
+    """True si el valor de la subcategoría (categoría, subcategoría) se lee como número"""
+    return label[0] in NUMERIC_CATEGORIES or label in NUMERIC_SUBCATEGORIES
+
+def _sigmoid(scores):
+    return 1.0 / (1.0 + np.exp(-np.clip(scores, -30, 30)))
+
+class LocalClassifier:
+    """
+    Clasificador local, sin red, entrenado con los ClassifiedValue que ya produjo
+    Gemini. Responde en microsegundos y solo se usa si está seguro de todas las
+    subcategorías que conoce y puede extraer sus valores; el resto de los mensajes
+    siguen yendo al modelo.
+    """
+
+    def __init__(self, model=None, min_confidence=LOCAL_MIN_CONFIDENCE, rules=rule_classifier):
+        self.model = model
+        self.min_confidence = min_confidence
+        self.rules = rules
+        self._lock = threading.Lock()
+        self._evaluated = 0
+        self._accepted = 0
+
+    @classmethod
+    def from_env(cls):
+        classifier = cls()
+        if LOCAL_CLASSIFIER_PATH:
+            try:
+                classifier.load(LOCAL_CLASSIFIER_PATH)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"No se pudo cargar el clasificador local de {LOCAL_CLASSIFIER_PATH}: {str(e)}")
+        return classifier
+
+    @property
+    def enabled(self):
+        return self.model is not None
+
+    def load(self, path):
+        self.model = LocalModel.load(path)
+        logger.info(f"Clasificador local cargado de {path}: {len(self.model.labels)} subcategorías")
+
+    def predict(self, message_text):
+        """
+        Returns:
+            tuple: (resultado con la estructura de GeminiService, confianza). La
+                confianza es la de la subcategoría más dudosa, presente o ausente. El
+                resultado es None si no se pueden extraer los valores de alguna
+                subcategoría numérica.
+        """
+        model = self.model
+        probabilities = model.predict_proba(message_text)
+        confidence = float(np.min(np.maximum(probabilities, 1 - probabilities))) if len(probabilities) else 0.0
+        detected = {label: float(probability) for label, probability in zip(model.labels, probabilities)
+                    if probability >= 0.5}
+        values = self._values(message_text, detected)
+        if values is None:
+            return None, confidence
+
+        categories = {}
+        for (category, subcategory), entries in values.items():
+            for value, value_confidence in entries:
+                categories.setdefault(category, []).append({
+                    "nombre": subcategory,
+                    "detectada": True,
+                    "valor": value,
+                    "confianza": round(value_confidence, 3)
+                })
+        result = {
+            "categorias": [
+                {"nombre": name, "detectada": True, "subcategorias": subcategories}
+                for name, subcategories in categories.items()
+            ],
+            "resumen": " ".join((message_text or "").split())[:200],
+            "origen": "local"
+        }
+        return result, confidence
+
+    def _values(self, message_text, detected):
+        """
+        Valores por subcategoría detectada: el texto del mensaje para las descriptivas y
+        la medición extraída para las numéricas. None si alguna no se puede extraer.
+        """
+        measured = self.rules.extract(message_text) if self.rules is not None else {}
+        # Una medición que reconocen las reglas y el modelo no predijo: decide Gemini
+        if any(label not in detected for label in measured):
+            return None
+
+        description = " ".join((message_text or "").split())
+        has_digits = _DIGIT.search(description) is not None
+        values = {}
+        for label, probability in detected.items():
+            if not is_numeric(label) or not has_digits:
+                values[label] = [(description, probability)]
+            elif label in measured:
+                if any(confidence < self.rules.min_confidence for _, confidence in measured[label]):
+                    return None
+                values[label] = [(value, min(probability, confidence)) for value, confidence in measured[label]]
+            elif label == SLEEP:
+                hours = SLEEP_HOURS.findall(fold_text(description))
+                if len(hours) != 1:
+                    return None
+                values[label] = [(f"{hours[0]} horas", probability)]
+            else:
+                return None
+        return values
+
+    def classify(self, message_text):
+        """
+        Returns:
+            dict: Resultado si la confianza alcanza min_confidence y se extrajeron
+                los valores; None si el mensaje debe ir a Gemini o no hay modelo cargado
+        """
+        if self.model is None or not (message_text or "").strip():
+            return None
+        result, confidence = self.predict(message_text)
+        accepted = result is not None and confidence >= self.min_confidence
+        with self._lock:
+            self._evaluated += 1
+            if accepted:
+                self._accepted += 1
+        LOCAL_EVALUATED.inc()
+        if accepted:
+            LOCAL_ACCEPTED.inc()
+        return result if accepted else None
+
+    def stats(self):
+        """Mensajes evaluados, resueltos sin Gemini y tasa de aceptación"""
+        with self._lock:
+            return {
+                "evaluated": self._evaluated,
+                "accepted": self._accepted,
+                "accept_rate": self._accepted / self._evaluated if self._evaluated else 0.0
+            }
+
+    def reset(self):
+        with self._lock:
+            self._evaluated = 0
+            self._accepted = 0
+
+def load_training_data(limit=None, include_unlabeled=False):
+    """
+    Mensajes clasificados por Gemini y sus subcategorías, del más antiguo al más nuevo.
+    Un mensaje cuenta si tiene valores de Gemini o si su trabajo lo cerró Gemini sin
+    valores (no encontró nada que clasificar). Lo resuelto por las reglas o por el
+    propio clasificador local queda afuera. Requiere contexto de aplicación.
+
+    Args:
+        limit (int, optional): Máximo de mensajes
+        include_unlabeled (bool): Incluye también los valores y trabajos sin origen
+            registrado (guardados antes de registrarlo; pueden venir de las reglas)
+
+    Returns:
+        tuple: (textos, conjuntos de (categoría, subcategoría))
+    """
+    from app.extensions import db
+    from app.models.message import Message
+    from app.models.category import Category
+    from app.models.subcategory import Subcategory
+    from app.models.classified_value import ClassifiedValue
+    from app.models.classification_job import ClassificationJob
+
+    def from_gemini(origin):
+        if include_unlabeled:
+            return db.or_(origin == ClassifiedValue.ORIGIN_MODEL, origin.is_(None))
+        return origin == ClassifiedValue.ORIGIN_MODEL
+
+    has_values = db.session.query(ClassifiedValue.id).filter(ClassifiedValue.message_id == Message.id)
+    finished_empty = db.session.query(ClassificationJob.id).filter(
+        ClassificationJob.message_id == Message.id,
+        ClassificationJob.status == ClassificationJob.STATUS_DONE,
+        from_gemini(ClassificationJob.origin)
+    ).exists()
+    query = Message.query.with_entities(Message.id, Message.content).filter(db.or_(
+        has_values.filter(from_gemini(ClassifiedValue.origin)).exists(),
+        db.and_(finished_empty, ~has_values.exists())
+    )).order_by(Message.created_at, Message.id)
+    if limit:
+        query = query.limit(limit)
+    messages = query.all()
+
+    labels = {message.id: set() for message in messages}
+    rows = db.session.query(ClassifiedValue.message_id, Category.name, Subcategory.name).join(
+        Subcategory, ClassifiedValue.subcategory_id == Subcategory.id
+    ).join(
+        Category, Subcategory.category_id == Category.id
+    ).filter(from_gemini(ClassifiedValue.origin))
+    if limit:
+        rows = rows.filter(ClassifiedValue.message_id.in_(list(labels)))
+    for message_id, category_name, subcategory_name in rows:
+        if message_id in labels:
+            labels[message_id].add((category_name, subcategory_name))
+
+    return [message.content for message in messages], [labels[message.id] for message in messages]
+
+local_classifier = LocalClassifier.from_env()
@@ -0,0 +1,213 @@
+# backend/app/services/media_downloader.py
+import os
+import hashlib
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models.media_attachment import MediaAttachment
+from app.models.media_blob import MediaBlob
+
+# Configuración de logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class MediaDownloadError(RuntimeError):
+    """Error al descargar o guardar un adjunto"""
+
+class MediaDownloader:
+    """
+    Descarga los adjuntos de los mensajes con un pool de hilos acotado.
+
+    Cada archivo se escribe a disco por partes (sin cargarlo entero en memoria)
+    mientras se calcula su SHA-256, y se guarda como blob direccionado por contenido:
+    los archivos repetidos ocupan espacio una sola vez.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._slots = None
+        self._futures = set()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def submit(self, app, attachment_ids):
+        """
+        Programa la descarga de adjuntos sin bloquear al llamador. Si el pool está
+        lleno, los adjuntos restantes quedan pendientes para `flask download-media`.
+
+        Args:
+            app (Flask): Aplicación para crear el contexto de cada descarga
+            attachment_ids (list): IDs de MediaAttachment a descargar
+
+        Returns:
+            int: Descargas programadas
+        """
+        self._ensure_pool(app)
+        scheduled = 0
+        for attachment_id in attachment_ids:
+            if not self._slots.acquire(blocking=False):
+                logger.warning(
+                    f"Pool de descargas lleno, {len(attachment_ids) - scheduled} adjuntos quedan pendientes"
+                )
+                break
+            future = self._executor.submit(self._run, app, attachment_id)
+            with self._lock:
+                self._futures.add(future)
+            future.add_done_callback(self._finished)
+            scheduled += 1
+        return scheduled
+
+    def wait(self, timeout=None):
+        """Espera a que terminen las descargas en curso"""
+        with self._lock:
+            futures = list(self._futures)
+        for future in futures:
+            future.exception(timeout)
+
+    def shutdown(self):
+        """Detiene el pool esperando las descargas en curso"""
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def download(self, attachment_id):
+        """
+        Descarga un adjunto y lo enlaza con su blob (requiere contexto de aplicación)
+
+        Returns:
+            MediaAttachment: Adjunto actualizado, o None si no existe
+        """
+        attachment = db.session.get(MediaAttachment, attachment_id)
+        if attachment is None or attachment.status == MediaAttachment.STATUS_DOWNLOADED:
+            return attachment
+
+        attempts = attachment.attempts + 1
+        attachment.attempts = attempts
+        try:
+            sha256, size, content_type, tmp_path = self._stream_to_disk(attachment.url)
+            blob = self._store_blob(sha256, size, content_type or attachment.content_type, tmp_path)
+            attachment.blob_id = blob.id
+            attachment.content_type = attachment.content_type or blob.content_type
+            attachment.status = MediaAttachment.STATUS_DOWNLOADED
+            attachment.last_error = None
+            db.session.commit()
+            logger.info(f"Adjunto {attachment.id} descargado: {blob.sha256[:12]} ({blob.size} bytes)")
+        except Exception as e:
+            db.session.rollback()
+            attachment.attempts = attempts
+            attachment.status = MediaAttachment.STATUS_FAILED
+            attachment.last_error = str(e)
+            db.session.commit()
+            logger.error(f"Error descargando adjunto {attachment.id}: {e}")
+        return attachment
+
+    def blob_path(self, blob):
+        """Ruta absoluta del archivo de un blob"""
+        return Path(current_app.config['MEDIA_STORAGE_DIR']) / blob.path
+
+    def _ensure_pool(self, app):
+        with self._lock:
+            if self._executor is None:
+                workers = app.config['MEDIA_DOWNLOAD_WORKERS']
+                self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='media-download')
+                self._slots = threading.BoundedSemaphore(workers + app.config['MEDIA_DOWNLOAD_QUEUE_SIZE'])
+
+    def _run(self, app, attachment_id):
+        with app.app_context():
+            try:
+                self.download(attachment_id)
+            finally:
+                db.session.remove()
+
+    def _finished(self, future):
+        with self._lock:
+            self._futures.discard(future)
+        self._slots.release()
+
+    def _session(self):
+        """Sesión HTTP por hilo para reutilizar conexiones"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _check_url(self, url):
+        """Solo se descargan URLs HTTP(S) de los hosts permitidos"""
+        parsed = urlparse(url)
+        allowed = [host.strip() for host in current_app.config['MEDIA_ALLOWED_HOSTS'].split(',') if host.strip()]
+        if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+            raise MediaDownloadError(f"URL de adjunto no válida: {url}")
+        if allowed and parsed.hostname not in allowed:
+            raise MediaDownloadError(f"Host de adjunto no permitido: {parsed.hostname}")
+        return parsed.hostname
+
+    def _auth(self, hostname):
+        """Credenciales de Twilio, solo para sus propios hosts"""
+        config = current_app.config
+        if hostname.endswith('twilio.com') and config['TWILIO_ACCOUNT_SID'] and config['TWILIO_AUTH_TOKEN']:
+            return (config['TWILIO_ACCOUNT_SID'], config['TWILIO_AUTH_TOKEN'])
+        return None
+
+    def _stream_to_disk(self, url):
+        """
+        Descarga la URL a un archivo temporal por partes, calculando su hash
+
+        Returns:
+            tuple: (sha256, tamaño, content_type, ruta temporal)
+        """
+        config = current_app.config
+        hostname = self._check_url(url)
+        tmp_dir = Path(config['MEDIA_STORAGE_DIR']) / 'tmp'
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as output:
+                with self._session().get(url, stream=True, auth=self._auth(hostname),
+                                         timeout=config['MEDIA_DOWNLOAD_TIMEOUT']) as response:
+                    response.raise_for_status()
+                    content_type = response.headers.get('Content-Type')
+                    for chunk in response.iter_content(chunk_size=config['MEDIA_CHUNK_SIZE']):
+                        size += len(chunk)
+                        if size > config['MEDIA_MAX_BYTES']:
+                            raise MediaDownloadError(f"Adjunto supera {config['MEDIA_MAX_BYTES']} bytes")
+                        digest.update(chunk)
+                        output.write(chunk)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        return digest.hexdigest(), size, content_type, tmp_path
+
+    def _store_blob(self, sha256, size, content_type, tmp_path):
+        """Mueve el archivo a su ruta por contenido y obtiene (o crea) su blob"""
+        relative_path = f"{sha256[:2]}/{sha256[2:4]}/{sha256}"
+        final_path = Path(current_app.config['MEDIA_STORAGE_DIR']) / relative_path
+        if final_path.exists():
+            os.unlink(tmp_path)  # Mismo contenido ya guardado
+        else:
+            final_path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_path, final_path)
+
+        blob = MediaBlob.query.filter_by(sha256=sha256).first()
+        if blob:
+            return blob
+        try:
+            # Otra descarga del mismo archivo puede crear el blob en paralelo
+            with db.session.begin_nested():
+                blob = MediaBlob(sha256=sha256, size=size, content_type=content_type, path=relative_path)
+                db.session.add(blob)
+            return blob
+        except IntegrityError:
+            return MediaBlob.query.filter_by(sha256=sha256).one()
+
+media_downloader = MediaDownloader()
@@ -0,0 +1,78 @@
+# backend/app/services/message_dedup.py
+import logging
+from app.extensions import db
+from app.models.message import Message
+from app.utils.cache import LRUCache
+
+# Configuración de logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class MessageDeduplicator:
+    """
+    Detecta reenvíos del mismo webhook (mismo MessageSid) antes de tocar la base de datos.
+    Un conjunto en memoria de SIDs recientes responde al instante y, si no está ahí,
+    se consulta el índice único de Message.whatsapp_message_id.
+    """
+
+    def __init__(self, max_size=10000):
+        """
+        Args:
+            max_size (int): Número de SIDs recientes mantenidos en memoria
+        """
+        self._recent = LRUCache(max_size=max_size)
+
+    def is_duplicate(self, message_sid):
+        """
+        Indica si el mensaje ya fue recibido
+
+        Args:
+            message_sid (str): ID del mensaje del proveedor
+
+        Returns:
+            bool: True si el mensaje ya está registrado
+        """
+        if not message_sid:
+            return False
+
+        if message_sid in self._recent:
+            return True
+
+        exists = db.session.query(Message.id).filter_by(
+            whatsapp_message_id=message_sid
+        ).first() is not None
+        if exists:
+            self._recent.set(message_sid, True)
+        return exists
+
+    def find_duplicates(self, message_sids):
+        """
+        Versión por lote de is_duplicate: una sola consulta para todos los SIDs
+        que no están en memoria
+
+        Args:
+            message_sids (list): IDs de mensajes del proveedor
+
+        Returns:
+            set: SIDs que ya están registrados
+        """
+        duplicates = {sid for sid in message_sids if sid and sid in self._recent}
+        unknown = {sid for sid in message_sids if sid and sid not in duplicates}
+        if unknown:
+            rows = db.session.query(Message.whatsapp_message_id).filter(
+                Message.whatsapp_message_id.in_(unknown)
+            ).all()
+            for (sid,) in rows:
+                duplicates.add(sid)
+                self._recent.set(sid, True)
+        return duplicates
+
+    def mark_seen(self, message_sid):
+        """Registra un SID recién guardado"""
+        if message_sid:
+            self._recent.set(message_sid, True)
+
+    def clear(self):
+        """Olvida los SIDs recientes"""
+        self._recent.clear()
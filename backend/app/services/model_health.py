@@ -0,0 +1,202 @@
+# backend/app/services/model_health.py
+import os
+import time
+import threading
+from collections import deque
+
+# Segundos que un circuito abierto deja sin tráfico a un modelo antes de volver a probarlo
+MODEL_HEALTH_TTL = float(os.getenv("GEMINI_MODEL_HEALTH_TTL", 300))
+
+# Fallos consecutivos que abren el circuito de un modelo
+CIRCUIT_FAILURES = int(os.getenv("GEMINI_CIRCUIT_FAILURES", 3))
+
+# Tasa de error (promedio móvil) que abre el circuito, a partir de CIRCUIT_MIN_CALLS llamadas
+CIRCUIT_ERROR_RATE = float(os.getenv("GEMINI_CIRCUIT_ERROR_RATE", 0.5))
+CIRCUIT_MIN_CALLS = 10
+
+# Peso de la última observación en los promedios móviles exponenciales (EWMA)
+EWMA_ALPHA = 0.2
+
+# Latencias recientes conservadas por modelo para estimar el p95
+LATENCY_WINDOW = 200
+P95_MIN_SAMPLES = 20
+
+# Segundos tras los que se libera la prueba de un circuito semiabierto que nunca informó resultado
+PROBE_TIMEOUT = 60
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+class _ModelStats:
+    """Estado de enrutamiento de un modelo"""
+
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.consecutive_failures = 0
+        self.latency_ewma = None
+        self.error_rate = 0.0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.opened_at = None
+        self.probe_started_at = None
+        self.last_error = None
+
+class ModelHealth:
+    """
+    Estado de salud de cada modelo, compartido por todos los hilos del proceso y
+    alimentado con el resultado de las llamadas reales (sin sondear la API).
+
+    Por modelo lleva la latencia (EWMA y p95) y la tasa de error, y un circuito:
+    tras CIRCUIT_FAILURES fallos seguidos, o con una tasa de error alta, el circuito
+    se abre y el modelo pasa al final de la lista durante `ttl` segundos. Después
+    queda semiabierto: una sola petición lo prueba y, según el resultado, el
+    circuito se cierra o vuelve a abrirse.
+    """
+
+    def __init__(self, ttl=MODEL_HEALTH_TTL, failure_threshold=CIRCUIT_FAILURES,
+                 error_rate_threshold=CIRCUIT_ERROR_RATE):
+        self.ttl = ttl
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def mark_success(self, model_name, latency=None):
+        """Registra una respuesta correcta y, si el circuito estaba semiabierto, lo cierra"""
+        with self._lock:
+            stats = self._stats(model_name)
+            stats.calls += 1
+            stats.consecutive_failures = 0
+            stats.error_rate *= 1 - EWMA_ALPHA
+            if latency is not None:
+                stats.latencies.append(latency)
+                stats.latency_ewma = latency if stats.latency_ewma is None else (
+                    EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * stats.latency_ewma
+                )
+            stats.opened_at = None
+            stats.probe_started_at = None
+
+    def mark_failure(self, model_name, error):
+        """Registra un fallo y abre el circuito si se superó algún umbral"""
+        with self._lock:
+            self._record_failure(self._stats(model_name), error)
+
+    def mark_timeout(self, model_name):
+        """Registra una llamada que no respondió dentro del plazo; cuenta como fallo"""
+        with self._lock:
+            stats = self._stats(model_name)
+            stats.timeouts += 1
+            self._record_failure(stats, "timeout")
+
+    def is_available(self, model_name):
+        """True si el circuito del modelo no está abierto"""
+        with self._lock:
+            stats = self._models.get(model_name)
+            return stats is None or self._state(stats, time.monotonic()) != STATE_OPEN
+
+    def order(self, model_names):
+        """
+        Ordena los modelos para una petición: por preferencia, con los de circuito
+        abierto al final. Un modelo semiabierto recupera su lugar solo para la
+        petición que se queda con la prueba; las demás lo siguen viendo abierto.
+        """
+        with self._lock:
+            now = time.monotonic()
+            ready, blocked = [], []
+            for model_name in model_names:
+                stats = self._models.get(model_name)
+                state = STATE_CLOSED if stats is None else self._state(stats, now)
+                if state == STATE_HALF_OPEN:
+                    probing = stats.probe_started_at is not None and now - stats.probe_started_at < PROBE_TIMEOUT
+                    if not probing:
+                        stats.probe_started_at = now
+                        ready.append(model_name)
+                        continue
+                (ready if state == STATE_CLOSED else blocked).append(model_name)
+            return ready + blocked
+
+    def hedge_delay(self, model_name):
+        """
+        p95 de la latencia del modelo (segundos): si no respondió en ese tiempo,
+        conviene lanzar la petición de respaldo. None si aún no hay muestras suficientes.
+        """
+        with self._lock:
+            stats = self._models.get(model_name)
+            if stats is None or len(stats.latencies) < P95_MIN_SAMPLES:
+                return None
+            return self._percentile(stats.latencies, 95)
+
+    def snapshot(self):
+        """Modelos con el circuito abierto o semiabierto y su último error"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                model_name: {
+                    "state": self._state(stats, now),
+                    "error": stats.last_error,
+                    "retry_in": max(0.0, self.ttl - (now - stats.opened_at))
+                }
+                for model_name, stats in self._models.items()
+                if stats.opened_at is not None
+            }
+
+    def stats(self):
+        """Métricas de enrutamiento por modelo"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                model_name: {
+                    "state": self._state(stats, now),
+                    "calls": stats.calls,
+                    "failures": stats.failures,
+                    "timeouts": stats.timeouts,
+                    "error_rate": stats.error_rate,
+                    "latency_ewma_ms": stats.latency_ewma * 1000 if stats.latency_ewma is not None else None,
+                    "p95_ms": self._percentile(stats.latencies, 95) * 1000 if stats.latencies else None
+                }
+                for model_name, stats in self._models.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._models.clear()
+
+    def _record_failure(self, stats, error):
+        """Actualiza los contadores de un fallo; se llama con el lock tomado"""
+        now = time.monotonic()
+        state = self._state(stats, now)
+        stats.calls += 1
+        stats.failures += 1
+        stats.consecutive_failures += 1
+        stats.error_rate = EWMA_ALPHA + (1 - EWMA_ALPHA) * stats.error_rate
+        stats.last_error = str(error)
+        stats.probe_started_at = None
+        tripped = (
+            state == STATE_HALF_OPEN
+            or stats.consecutive_failures >= self.failure_threshold
+            or (stats.calls >= CIRCUIT_MIN_CALLS and stats.error_rate >= self.error_rate_threshold)
+        )
+        if tripped:
+            stats.opened_at = now
+
+    def _stats(self, model_name):
+        stats = self._models.get(model_name)
+        if stats is None:
+            stats = self._models[model_name] = _ModelStats()
+        return stats
+
+    def _state(self, stats, now):
+        if stats.opened_at is None:
+            return STATE_CLOSED
+        if now - stats.opened_at < self.ttl:
+            return STATE_OPEN
+        return STATE_HALF_OPEN
+
+    def _percentile(self, values, pct):
+        ordered = sorted(values)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+model_health = ModelHealth()
@@ -0,0 +1,279 @@
+# backend/app/services/outbound_queue.py
+import time
+import random
+import logging
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from sqlalchemy import and_, or_, update
+from app.extensions import db
+from app.models.outbound_message import OutboundMessage
+from app.services.twilio_client import TwilioMessagesClient, TwilioAPIError
+from app.utils.formatters import normalize_phone
+from app.utils.rate_limit import TokenBucket
+
+# Configuración de logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class OutboundQueue:
+    """Cola persistente de mensajes de WhatsApp salientes"""
+
+    def enqueue(self, to_number, body, caregiver_id=None, commit=True):
+        """
+        Encola un mensaje para enviar
+
+        Args:
+            to_number (str): Número del destinatario en cualquier formato
+            body (str): Texto del mensaje
+            caregiver_id (int, optional): Cuidador destinatario
+            commit (bool): Si es False, el llamador confirma la transacción
+
+        Returns:
+            OutboundMessage: Mensaje encolado
+        """
+        message = OutboundMessage(
+            to_number=normalize_phone(to_number),
+            body=body,
+            caregiver_id=caregiver_id,
+            status=OutboundMessage.STATUS_QUEUED,
+            next_attempt_at=datetime.utcnow()
+        )
+        db.session.add(message)
+        if commit:
+            db.session.commit()
+        return message
+
+    def claim(self, limit):
+        """
+        Reclama hasta `limit` mensajes listos para enviar (o cuyo envío quedó colgado)
+
+        Returns:
+            list: IDs reclamados, en orden de llegada
+        """
+        now = datetime.utcnow()
+        stale_before = now - timedelta(seconds=current_app.config['OUTBOUND_LOCK_TIMEOUT'])
+        claimable = or_(
+            and_(OutboundMessage.status == OutboundMessage.STATUS_QUEUED, OutboundMessage.next_attempt_at <= now),
+            and_(OutboundMessage.status == OutboundMessage.STATUS_SENDING, OutboundMessage.locked_at < stale_before)
+        )
+        candidate_ids = [row.id for row in db.session.query(OutboundMessage.id).filter(
+            claimable
+        ).order_by(OutboundMessage.id).limit(limit).with_for_update(skip_locked=True).all()]
+
+        claimed_ids = []
+        for message_id in candidate_ids:
+            result = db.session.execute(
+                update(OutboundMessage).where(OutboundMessage.id == message_id, claimable).values(
+                    status=OutboundMessage.STATUS_SENDING,
+                    locked_at=now,
+                    attempts=OutboundMessage.attempts + 1
+                )
+            )
+            if result.rowcount == 1:
+                claimed_ids.append(message_id)
+        db.session.commit()
+        return claimed_ids
+
+    def mark_sent(self, message, resource):
+        """Registra la aceptación de Twilio (SID y estado inicial de entrega)"""
+        message.status = OutboundMessage.STATUS_SENT
+        message.twilio_sid = resource.get("sid")
+        message.twilio_status = resource.get("status")
+        message.sent_at = datetime.utcnow()
+        message.locked_at = None
+        message.last_error = None
+        db.session.commit()
+
+    def record_sent(self, message_id, resource, attempts=3):
+        """
+        Registra la aceptación de Twilio con un UPDATE propio cuando mark_sent falló.
+        El mensaje ya salió: si quedara en 'sending', al vencer el bloqueo se
+        reclamaría y el cuidador lo recibiría dos veces.
+
+        Returns:
+            bool: True si el envío quedó registrado
+        """
+        for attempt in range(1, attempts + 1):
+            try:
+                db.session.execute(update(OutboundMessage).where(OutboundMessage.id == message_id).values(
+                    status=OutboundMessage.STATUS_SENT,
+                    twilio_sid=resource.get("sid"),
+                    twilio_status=resource.get("status"),
+                    sent_at=datetime.utcnow(),
+                    locked_at=None,
+                    last_error=None
+                ))
+                db.session.commit()
+                return True
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"No se pudo registrar el envío {message_id} a Twilio (intento {attempt}): {e}")
+                time.sleep(0.1 * attempt)
+        logger.critical(f"Envío {message_id} aceptado por Twilio ({resource.get('sid')}) pero sin registrar: "
+                        f"puede reenviarse al vencer el bloqueo")
+        return False
+
+    def mark_failed(self, message, error):
+        """
+        Registra un error de envío: reprograma los reintentables (429, 5xx, red)
+        con backoff y descarta el resto
+
+        Returns:
+            bool: True si el mensaje se reprogramó
+        """
+        message.last_error = str(error)
+        message.error_code = str(error.code) if getattr(error, 'code', None) else None
+        message.locked_at = None
+        retryable = getattr(error, 'retryable', True)
+        retried = retryable and message.attempts < current_app.config['OUTBOUND_MAX_ATTEMPTS']
+        if retried:
+            delay = getattr(error, 'retry_after', None) or self._compute_backoff(message.attempts)
+            message.status = OutboundMessage.STATUS_QUEUED
+            message.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+            logger.warning(f"Envío {message.id} falló (intento {message.attempts}), reintento en {delay:.1f}s: {error}")
+        else:
+            message.status = OutboundMessage.STATUS_FAILED
+            logger.error(f"Envío {message.id} descartado tras {message.attempts} intentos: {error}")
+        db.session.commit()
+        return retried
+
+    def update_delivery_status(self, twilio_sid, status, error_code=None):
+        """
+        Actualiza el estado de entrega informado por el StatusCallback de Twilio
+
+        Returns:
+            bool: True si el mensaje existe
+        """
+        message = OutboundMessage.query.filter_by(twilio_sid=twilio_sid).first()
+        if message is None:
+            return False
+        message.twilio_status = status
+        if error_code:
+            message.error_code = str(error_code)
+        db.session.commit()
+        return True
+
+    def _compute_backoff(self, attempts):
+        base = current_app.config['OUTBOUND_BACKOFF_BASE']
+        return base * (2 ** max(attempts - 1, 0)) * random.uniform(0.8, 1.2)
+
+class OutboundDispatcher:
+    """
+    Envía la cola de mensajes salientes en paralelo, con una única sesión HTTP
+    hacia Twilio y un límite de tasa (cubeta de tokens) por cuenta.
+    """
+
+    def __init__(self, app, concurrency=None, client=None, poll_interval=1.0):
+        """
+        Args:
+            app (Flask): Aplicación para crear contextos en cada hilo
+            concurrency (int, optional): Envíos simultáneos (OUTBOUND_CONCURRENCY)
+            client (TwilioMessagesClient, optional): Cliente a usar
+            poll_interval (float): Espera cuando la cola está vacía
+        """
+        config = app.config
+        self.app = app
+        self.concurrency = max(1, concurrency or config['OUTBOUND_CONCURRENCY'])
+        self.poll_interval = poll_interval
+        self.client = client or TwilioMessagesClient(
+            config['TWILIO_ACCOUNT_SID'],
+            config['TWILIO_AUTH_TOKEN'],
+            api_base=config['TWILIO_API_BASE'],
+            pool_size=self.concurrency,
+            timeout=config['OUTBOUND_TIMEOUT']
+        )
+        self.queue = OutboundQueue()
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='outbound')
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def dispatch_batch(self):
+        """
+        Reclama y envía un lote de mensajes
+
+        Returns:
+            int: Mensajes procesados
+        """
+        with self.app.app_context():
+            message_ids = self.queue.claim(limit=self.concurrency * 2)
+        list(self._executor.map(self._send, message_ids))
+        return len(message_ids)
+
+    def drain(self):
+        """Envía hasta que no queden mensajes listos"""
+        total = 0
+        while True:
+            processed = self.dispatch_batch()
+            if not processed:
+                return total
+            total += processed
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run_loop, name='outbound-dispatcher', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._executor.shutdown(wait=True)
+        self.client.close()
+
+    def wait(self, timeout=None):
+        return self._stop_event.wait(timeout)
+
+    def _run_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                processed = self.dispatch_batch()
+            except Exception as e:
+                logger.error(f"Error en el dispatcher de mensajes salientes: {e}")
+                processed = 0
+            if not processed:
+                self._stop_event.wait(self.poll_interval)
+
+    def _bucket(self, account_sid):
+        """Cubeta de tokens de una cuenta de Twilio"""
+        with self._buckets_lock:
+            bucket = self._buckets.get(account_sid)
+            if bucket is None:
+                config = self.app.config
+                bucket = TokenBucket(config['OUTBOUND_RATE_PER_ACCOUNT'], capacity=config['OUTBOUND_BURST'])
+                self._buckets[account_sid] = bucket
+            return bucket
+
+    def _send(self, message_id):
+        """Envía un mensaje reclamado y registra el resultado"""
+        with self.app.app_context():
+            try:
+                message = db.session.get(OutboundMessage, message_id)
+                config = self.app.config
+                self._bucket(self.client.account_sid).acquire()
+                try:
+                    resource = self.client.create_message(
+                        from_=f"whatsapp:{config['TWILIO_WHATSAPP_NUMBER']}",
+                        to=f"whatsapp:{message.to_number}",
+                        body=message.body,
+                        status_callback=config.get('OUTBOUND_STATUS_CALLBACK_URL')
+                    )
+                except TwilioAPIError as e:
+                    self.queue.mark_failed(message, e)
+                    return
+                try:
+                    self.queue.mark_sent(message, resource)
+                except Exception as e:
+                    # Twilio ya aceptó el mensaje: no debe volver a la cola
+                    logger.error(f"Error registrando el envío {message_id}: {e}")
+                    db.session.rollback()
+                    self.queue.record_sent(message_id, resource)
+            except Exception as e:
+                logger.error(f"Error enviando mensaje saliente {message_id}: {e}")
+                db.session.rollback()
+            finally:
+                db.session.remove()
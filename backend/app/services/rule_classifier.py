@@ -0,0 +1,185 @@
+# backend/app/services/rule_classifier.py
+import os
+import re
+import logging
+import threading
+import unicodedata
+from app.services.llm_metrics import RULE_EVALUATED, RULE_BYPASS
+
+# Configuración de logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Confianza mínima de todas las reglas aplicadas para no consultar al modelo
+BYPASS_MIN_CONFIDENCE = float(os.getenv("CLASSIFICATION_RULES_MIN_CONFIDENCE", 0.85))
+
+# Confianza por regla: alta si el valor está en un rango fisiológico razonable,
+# baja si no (probable error de tipeo o de unidad), en cuyo caso decide el modelo
+CONFIDENCE_PLAUSIBLE = 0.95
+CONFIDENCE_IMPLAUSIBLE = 0.5
+CONFIDENCE_EXPENSE = 0.9
+CONFIDENCE_EXPENSE_OTHER = 0.75
+
+# Los patrones trabajan sobre el texto en minúsculas y sin tildes
+_NUMBER = r"(\d{2,3}(?:[.,]\d{1,2})?)"
+TEMPERATURE = re.compile(
+    r"\b(?:temperatura|temp|fiebre)\s*(?:de|:|=)?\s*" + _NUMBER + r"\s*(?:°\s*c?|o\s*c|grados|c\b)?"
+)
+BLOOD_PRESSURE = re.compile(
+    r"\b(?:presion|tension)(?:\s+arterial)?\s*(?:de|:|=)?\s*(\d{2,3})\s*[/-]\s*(\d{2,3})\b"
+)
+OXYGEN = re.compile(
+    r"\b(?:oxigeno|oxigenacion|saturacion|saturo|spo2|sat)\s*(?:de|:|=)?\s*(\d{2,3})\s*(?:%|por\s*ciento)?"
+)
+EXPENSE = re.compile(
+    r"\b(?:gaste|gastamos|gasto|pague|pagamos|pago)\s+(?:\$\s*)?(\d[\d.,]*)\s*(?:pesos|\$)?\s+"
+    r"(?:en|de|por|al|a)\s+(?:(?:la|el|los|las|un|una)\s+)?([a-zñ]+)"
+)
+
+# Conceptos de gasto y su subcategoría; lo que no figura va a "Otros"
+EXPENSE_CONCEPTS = {
+    "Medicamentos": {"farmacia", "medicamento", "medicamentos", "remedio", "remedios", "pastillas", "medicacion"},
+    "Servicios": {"enfermera", "enfermero", "cuidadora", "cuidador", "consulta", "medico", "kinesiologo",
+                  "kinesiologia", "taxi", "remis", "ambulancia", "acompañante", "servicio"},
+}
+
+# Palabras que pueden rodear a las mediciones sin aportar información clasificable
+FILLER_WORDS = {
+    "y", "e", "a", "la", "las", "el", "los", "de", "del", "con", "le", "su", "mi", "es", "fue", "esta",
+    "este", "hoy", "ayer", "anoche", "mañana", "tarde", "noche", "tiene", "tenia", "tuvo", "dio", "marco",
+    "marca", "medi", "medimos", "tome", "tomamos", "tomo", "controle", "control", "ok",
+}
+_LEFTOVER_WORD = re.compile(r"[a-z0-9ñ]+")
+
+def fold_text(text):
+    """Minúsculas y sin tildes, conservando la 'ñ' y los símbolos"""
+    decomposed = unicodedata.normalize("NFD", (text or "").casefold())
+    folded = "".join(char for char in decomposed if unicodedata.category(char) != "Mn" or char == "\u0303")
+    return unicodedata.normalize("NFC", folded)
+
+class RuleClassifier:
+    """
+    Preclasificador determinista para los mensajes formulaicos (signos vitales y
+    gastos). Devuelve la misma estructura de `categorias` que GeminiService y
+    permite saltear el modelo cuando las reglas cubren el mensaje completo.
+    """
+
+    def __init__(self, min_confidence=BYPASS_MIN_CONFIDENCE):
+        self.min_confidence = min_confidence
+        self._lock = threading.Lock()
+        self._evaluated = 0
+        self._bypassed = 0
+
+    def classify(self, message_text):
+        """
+        Aplica las reglas a un mensaje
+
+        Returns:
+            tuple: (resultado, cubierto). El resultado es None si ninguna regla aplica;
+                cubierto es True si el resultado puede usarse sin consultar al modelo.
+        """
+        text = fold_text(message_text)
+        findings = self._find(text)
+        covered = bool(findings) and self._fully_covered(text, findings) and all(
+            finding[3] >= self.min_confidence for finding in findings
+        )
+        with self._lock:
+            self._evaluated += 1
+            if covered:
+                self._bypassed += 1
+        RULE_EVALUATED.inc()
+        if covered:
+            RULE_BYPASS.inc()
+        if not findings:
+            return None, False
+        return self._build_result(findings), covered
+
+    def extract(self, message_text):
+        """
+        Mediciones y gastos que reconocen las reglas, sin contar el mensaje en las estadísticas
+
+        Returns:
+            dict: (categoría, subcategoría) -> lista de (valor, confianza)
+        """
+        values = {}
+        for category, subcategory, value, confidence, _, _ in self._find(fold_text(message_text)):
+            values.setdefault((category, subcategory), []).append((value, confidence))
+        return values
+
+    def stats(self):
+        """Mensajes evaluados, resueltos sin el modelo y tasa de bypass"""
+        with self._lock:
+            return {
+                "evaluated": self._evaluated,
+                "bypassed": self._bypassed,
+                "bypass_rate": self._bypassed / self._evaluated if self._evaluated else 0.0
+            }
+
+    def reset(self):
+        with self._lock:
+            self._evaluated = 0
+            self._bypassed = 0
+
+    def _find(self, text):
+        findings = []  # (categoría, subcategoría, valor, confianza, inicio, fin)
+        for finder in (self._temperature, self._blood_pressure, self._oxygen, self._expenses):
+            findings.extend(finder(text))
+        return findings
+
+    def _temperature(self, text):
+        for match in TEMPERATURE.finditer(text):
+            value = float(match.group(1).replace(",", "."))
+            confidence = CONFIDENCE_PLAUSIBLE if 34.0 <= value <= 42.5 else CONFIDENCE_IMPLAUSIBLE
+            yield ("Salud Física", "Síntomas", f"temperatura {value:g}", confidence, *match.span())
+
+    def _blood_pressure(self, text):
+        for match in BLOOD_PRESSURE.finditer(text):
+            systolic, diastolic = int(match.group(1)), int(match.group(2))
+            plausible = 70 <= systolic <= 250 and 40 <= diastolic <= 150 and systolic > diastolic
+            confidence = CONFIDENCE_PLAUSIBLE if plausible else CONFIDENCE_IMPLAUSIBLE
+            yield ("Salud Física", "Síntomas", f"presión {systolic}/{diastolic}", confidence, *match.span())
+
+    def _oxygen(self, text):
+        for match in OXYGEN.finditer(text):
+            value = int(match.group(1))
+            confidence = CONFIDENCE_PLAUSIBLE if 70 <= value <= 100 else CONFIDENCE_IMPLAUSIBLE
+            yield ("Salud Física", "Síntomas", f"oxígeno {value}%", confidence, *match.span())
+
+    def _expenses(self, text):
+        for match in EXPENSE.finditer(text):
+            amount, concept = match.group(1).rstrip(".,"), match.group(2)
+            subcategory = next(
+                (name for name, concepts in EXPENSE_CONCEPTS.items() if concept in concepts), "Otros"
+            )
+            confidence = CONFIDENCE_EXPENSE if subcategory != "Otros" else CONFIDENCE_EXPENSE_OTHER
+            yield ("Gastos", subcategory, f"${amount} en {concept}", confidence, *match.span())
+
+    def _fully_covered(self, text, findings):
+        """True si, quitando lo reconocido, solo quedan palabras de relleno y puntuación"""
+        remaining = text
+        for *_, start, end in sorted(findings, key=lambda finding: finding[4], reverse=True):
+            remaining = remaining[:start] + " " + remaining[end:]
+        return all(word in FILLER_WORDS for word in _LEFTOVER_WORD.findall(remaining))
+
+    def _build_result(self, findings):
+        """Arma la estructura de categorías que devuelve GeminiService"""
+        categories = {}
+        for category, subcategory, value, confidence, _, _ in findings:
+            categories.setdefault(category, []).append({
+                "nombre": subcategory,
+                "detectada": True,
+                "valor": value,
+                "confianza": confidence
+            })
+        values = [finding[2] for finding in findings]
+        return {
+            "categorias": [
+                {"nombre": name, "detectada": True, "subcategorias": subcategories}
+                for name, subcategories in categories.items()
+            ],
+            "resumen": ", ".join(values).capitalize(),
+            "origen": "reglas"
+        }
+
+rule_classifier = RuleClassifier()
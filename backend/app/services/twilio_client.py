@@ -0,0 +1,89 @@
+# backend/app/services/twilio_client.py
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+
+# Configuración de logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class TwilioAPIError(RuntimeError):
+    """Error devuelto por la API de Twilio (o de red al llamarla)"""
+
+    def __init__(self, message, status_code=None, code=None, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code  # None si no hubo respuesta HTTP
+        self.code = code  # Código de error de Twilio (p. ej. 63016)
+        self.retry_after = retry_after  # Segundos sugeridos por Retry-After
+
+    @property
+    def retryable(self):
+        """Los errores de red, 429 y 5xx se reintentan; el resto de 4xx no"""
+        return self.status_code is None or self.status_code == 429 or self.status_code >= 500
+
+class TwilioMessagesClient:
+    """
+    Cliente mínimo de la API REST de mensajes de Twilio sobre una única sesión HTTP
+    persistente, con un pool de conexiones compartido por los hilos que envían.
+    """
+
+    def __init__(self, account_sid, auth_token, api_base='https://api.twilio.com', pool_size=10, timeout=10):
+        """
+        Args:
+            account_sid (str): SID de la cuenta de Twilio
+            auth_token (str): Token de autenticación
+            api_base (str): URL base de la API (configurable para pruebas)
+            pool_size (int): Conexiones mantenidas abiertas
+            timeout (float): Segundos máximos por petición
+        """
+        self.account_sid = account_sid
+        self.api_base = api_base.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.auth = (account_sid, auth_token)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def create_message(self, from_, to, body, status_callback=None):
+        """
+        Crea un mensaje (POST /Accounts/{sid}/Messages.json)
+
+        Returns:
+            dict: Recurso del mensaje creado (sid, status, ...)
+
+        Raises:
+            TwilioAPIError: Si la API responde con error o no responde
+        """
+        url = f"{self.api_base}/2010-04-01/Accounts/{self.account_sid}/Messages.json"
+        data = {"From": from_, "To": to, "Body": body}
+        if status_callback:
+            data["StatusCallback"] = status_callback
+
+        try:
+            response = self.session.post(url, data=data, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise TwilioAPIError(f"Error de conexión con Twilio: {e}")
+
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {}
+        if response.status_code >= 400:
+            raise TwilioAPIError(
+                payload.get("message") or f"HTTP {response.status_code}",
+                status_code=response.status_code,
+                code=payload.get("code"),
+                retry_after=self._retry_after(response)
+            )
+        return payload
+
+    def close(self):
+        self.session.close()
+
+    def _retry_after(self, response):
+        try:
+            return float(response.headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            return None
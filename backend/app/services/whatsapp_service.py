@@ -1,8 +1,11 @@
 # En app/services/whatsapp_service.py
 
 import os
+import logging
 from twilio.rest import Client
 
+logger = logging.getLogger(__name__)
+
 class WhatsAppService:
     def __init__(self, account_sid=None, auth_token=None, twilio_number=None):
         """
@@ -25,7 +28,7 @@ class WhatsAppService:
             message: Objeto mensaje de Twilio o None si hay error
         """
         if not self.client:
-            print("Cliente Twilio no inicializado. Verifica tus credenciales.")
+            logger.error("Cliente Twilio no inicializado. Verifica tus credenciales.")
             return None
             
         # Aseguramos formato correcto para WhatsApp
@@ -40,12 +43,28 @@ class WhatsAppService:
                 from_=from_number,
                 to=to_number
             )
-            print(f"Mensaje enviado con SID: {message.sid}")
+            logger.info(f"Mensaje enviado con SID: {message.sid}")
             return message
         except Exception as e:
-            print(f"Error enviando mensaje WhatsApp: {e}")
+            logger.error(f"Error enviando mensaje WhatsApp: {e}")
             return None
     
+    def queue_message(self, to_number, message_body, caregiver_id=None):
+        """
+        Encola un mensaje para que lo envíe el dispatcher (flask send-worker),
+        con límite de tasa y reintentos. Preferible a send_message para envíos masivos.
+        
+        Args:
+            to_number (str): Número de WhatsApp del destinatario
+            message_body (str): Contenido del mensaje
+            caregiver_id (int, optional): Cuidador destinatario
+            
+        Returns:
+            OutboundMessage: Mensaje encolado
+        """
+        from app.services.outbound_queue import OutboundQueue
+        return OutboundQueue().enqueue(to_number, message_body, caregiver_id=caregiver_id)
+    
     def parse_incoming_message(self, request_data):
         """
         Procesa los datos de un mensaje entrante desde Twilio
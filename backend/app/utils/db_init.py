@@ -5,9 +5,41 @@ from ..extensions import db
 from ..models.patient import Patient
 from ..models.caregiver import Caregiver
 from ..models.message import Message
+from ..models.category import Category
+from ..models.subcategory import Subcategory
 
 from ..config import Config
 
+# Taxonomía de clasificación por defecto: (categoría, [(subcategoría, descripción)])
+# Las descripciones orientan al modelo en el prompt de clasificación
+DEFAULT_TAXONOMY = [
+    ("Salud Física", [
+        ("Movilidad", "pasos, distancia"),
+        ("Alimentación", "comidas, apetito"),
+        ("Sueño", "horas, calidad"),
+        ("Síntomas", "dolor, malestar, temperatura, presión, oxígeno"),
+    ]),
+    ("Salud Cognitiva", [
+        ("Memoria", "olvidos, reconocimiento"),
+        ("Orientación", "tiempo, lugar"),
+        ("Comunicación", "claridad, coherencia"),
+    ]),
+    ("Estado Emocional", [
+        ("Humor", "alegría, tristeza, irritabilidad"),
+        ("Sociabilidad", "interacción, aislamiento"),
+        ("Agitación", "inquietud, ansiedad"),
+    ]),
+    ("Medicación", [
+        ("Adherencia", "toma, rechazo"),
+        ("Efectos", "reacciones, eficacia"),
+    ]),
+    ("Gastos", [
+        ("Medicamentos", "costos"),
+        ("Servicios", "costos"),
+        ("Otros", "detallar"),
+    ]),
+]
+
 def init_db():
     """Inicializar la base de datos con las tablas necesarias"""
     # Crear una mini aplicación para el contexto
@@ -27,6 +59,7 @@ def init_db():
         
         # Crear datos de prueba
         create_test_data(db)
+        create_default_taxonomy(db)
 
 def create_test_data(db):
     """Crear datos de prueba para desarrollo"""
@@ -61,5 +94,25 @@ def create_test_data(db):
     
     print("Datos de prueba creados: 1 paciente y 2 cuidadores")
 
+def create_default_taxonomy(db):
+    """Crear las categorías y subcategorías de clasificación si no existen"""
+    if Category.query.first() is not None:
+        return
+    
+    for category_order, (category_name, subcategories) in enumerate(DEFAULT_TAXONOMY, start=1):
+        category = Category(name=category_name, display_order=category_order)
+        db.session.add(category)
+        db.session.flush()  # Para obtener el ID
+        for subcategory_order, (subcategory_name, description) in enumerate(subcategories, start=1):
+            db.session.add(Subcategory(
+                name=subcategory_name,
+                description=description,
+                category_id=category.id,
+                display_order=subcategory_order
+            ))
+    
+    db.session.commit()
+    print(f"Taxonomía creada: {len(DEFAULT_TAXONOMY)} categorías")
+
 if __name__ == "__main__":
     init_db()
\ No newline at end of file
@@ -0,0 +1,40 @@
+# backend/app/utils/deadline.py
+import time
+
+class DeadlineExceeded(TimeoutError):
+    """Se agotó el tiempo disponible para una operación"""
+
+class Deadline:
+    """
+    Momento límite de una operación, compartido por todos sus pasos: cada
+    intento (reintentos y modelos alternativos incluidos) usa solo lo que queda.
+    """
+
+    def __init__(self, timeout):
+        """
+        Args:
+            timeout (float): Segundos disponibles desde ahora
+        """
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+
+    @classmethod
+    def from_timeout(cls, timeout):
+        """Deadline de `timeout` segundos, o None si no hay límite (None o 0)"""
+        return cls(timeout) if timeout else None
+
+    def remaining(self):
+        """Segundos que quedan (0 si ya venció)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def check(self, operation):
+        """
+        Raises:
+            DeadlineExceeded: Si el plazo ya venció antes de `operation`
+        """
+        if self.expired:
+            raise DeadlineExceeded(f"Plazo de {self.timeout:g} s agotado antes de {operation}")
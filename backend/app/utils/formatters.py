@@ -0,0 +1,54 @@
+# backend/app/utils/formatters.py
+import re
+
+def normalize_phone(phone):
+    """
+    Normaliza un número de teléfono a formato E.164 (+<código país><número>).
+    Elimina el prefijo 'whatsapp:', espacios y separadores, y agrega el 9 de
+    los móviles argentinos cuando falta (+54 11... -> +54 9 11...).
+    
+    Args:
+        phone (str): Número tal como llega del proveedor o del formulario
+        
+    Returns:
+        str: Número normalizado, o cadena vacía si no contiene dígitos
+    """
+    if not phone:
+        return ''
+    
+    phone = phone.strip()
+    if phone.lower().startswith('whatsapp:'):
+        phone = phone[9:].strip()
+    
+    digits = re.sub(r'\D', '', phone)
+    if phone.startswith('00'):
+        # Prefijo internacional marcado como 00 en lugar de +
+        digits = digits[2:]
+    if not digits:
+        return ''
+    
+    # Argentina: WhatsApp identifica a los móviles como +54 9 <área><número>
+    if digits.startswith('54') and not digits.startswith('549') and len(digits) == 12:
+        digits = '549' + digits[2:]
+    
+    return f'+{digits}'
+
+def phone_variants(phone):
+    """
+    Devuelve las formas en que un mismo número puede estar guardado en la base de datos.
+    
+    Args:
+        phone (str): Número en cualquier formato
+        
+    Returns:
+        list: Número normalizado y sus variantes equivalentes
+    """
+    canonical = normalize_phone(phone)
+    if not canonical:
+        return []
+    
+    variants = [canonical]
+    # Móviles argentinos guardados sin el 9
+    if canonical.startswith('+549') and len(canonical) == 14:
+        variants.append('+54' + canonical[4:])
+    return variants
@@ -0,0 +1,231 @@
+# backend/app/utils/json_repair.py
+import re
+import json
+
+_LITERAL = re.compile(r"-?\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|true|false|null")
+_WHITESPACE = " \t\r\n"
+
+class TolerantJSONParser:
+    """
+    Parser incremental de JSON que repara los defectos habituales en las respuestas
+    de un modelo en lugar de descartarlas:
+
+    - texto o bloques de código Markdown alrededor del objeto
+    - comentarios // y /* */
+    - comas sobrantes o faltantes entre elementos
+    - respuestas truncadas: se descarta el último elemento incompleto y se
+      cierran las llaves y corchetes abiertos
+
+    Uso: `feed()` con cada fragmento recibido y `close()` al final.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._out = []
+        self._stack = []  # [carácter de apertura, estado esperado, inicio del miembro actual]
+        self._safe = (0, [])  # Último punto de corte válido: (largo de la salida, contenedores abiertos)
+        self._started = False
+        self._done = False
+        self.repaired = False
+
+    def feed(self, chunk):
+        """Procesa un fragmento; lo que quede incompleto espera al siguiente"""
+        self._buffer += chunk
+        self._consume(final=False)
+
+    def close(self):
+        """
+        Termina el análisis
+
+        Returns:
+            dict | list: Valor decodificado (reparado si hizo falta)
+
+        Raises:
+            ValueError: Si la entrada no contiene ningún objeto o lista JSON
+        """
+        self._consume(final=True)
+        if not self._started:
+            raise ValueError("La respuesta no contiene JSON")
+        if not self._done:
+            # Respuesta truncada: volver al último elemento completo y cerrar lo abierto
+            length, open_containers = self._safe
+            del self._out[length:]
+            self._out.extend("}" if opener == "{" else "]" for opener in reversed(open_containers))
+            self.repaired = True
+        return json.loads("".join(self._out), strict=False)
+
+    def _consume(self, final):
+        buffer, pos, size = self._buffer, 0, len(self._buffer)
+        while pos < size and not self._done:
+            char = buffer[pos]
+            if not self._started:
+                # Todo lo anterior al primer objeto (texto, ```json) se ignora
+                if char in "{[":
+                    self._started = True
+                    continue
+                pos += 1
+            elif char in _WHITESPACE:
+                pos += 1
+            elif char == "/":
+                end = self._comment_end(buffer, pos, final)
+                if end is None:
+                    break
+                pos = end
+                self.repaired = True
+            elif char == '"':
+                end = self._string_end(buffer, pos)
+                if end is None:
+                    if final:
+                        pos = size  # Cadena truncada
+                    break
+                self._value(buffer[pos:end], is_string=True)
+                pos = end
+            elif char in "{[":
+                self._open(char)
+                pos += 1
+            elif char in "}]":
+                self._close_container(char)
+                pos += 1
+            elif char == ":":
+                top = self._stack[-1]
+                if top[0] == "{" and top[1] == "colon":
+                    self._out.append(":")
+                    top[1] = "value"
+                else:
+                    self.repaired = True
+                pos += 1
+            elif char == ",":
+                top = self._stack[-1]
+                if top[1] == "comma":
+                    self._out.append(",")
+                    top[1] = "key" if top[0] == "{" else "value"
+                else:
+                    self.repaired = True
+                pos += 1
+            else:
+                match = _LITERAL.match(buffer, pos)
+                if match and match.end() == size:
+                    if not final:
+                        break  # El literal puede seguir en el próximo fragmento
+                    # Literal cortado al final de la respuesta: no es confiable
+                    self.repaired = True
+                    pos = size
+                    break
+                if match:
+                    literal = match.group()
+                    if literal.endswith("."):
+                        literal = literal[:-1]  # "1." no es un número JSON válido
+                        self.repaired = True
+                    self._value(literal, is_string=False)
+                    pos = match.end()
+                else:
+                    self.repaired = True
+                    pos += 1
+        self._buffer = buffer[pos:] if not self._done else ""
+
+    def _comment_end(self, buffer, pos, final):
+        """Posición posterior a un comentario, o None si todavía no terminó"""
+        if pos + 1 >= len(buffer):
+            return len(buffer) if final else None
+        if buffer[pos + 1] == "/":
+            end = buffer.find("\n", pos)
+        elif buffer[pos + 1] == "*":
+            end = buffer.find("*/", pos + 2)
+            end = end + 2 if end != -1 else -1
+        else:
+            return pos + 1  # Barra suelta
+        if end == -1:
+            return len(buffer) if final else None
+        return end
+
+    def _string_end(self, buffer, pos):
+        """Posición posterior a la comilla de cierre, o None si la cadena no terminó"""
+        index = pos + 1
+        while index < len(buffer):
+            if buffer[index] == "\\":
+                index += 2
+            elif buffer[index] == '"':
+                return index + 1
+            else:
+                index += 1
+        return None
+
+    def _before_value(self):
+        """Agrega la coma si falta entre dos elementos"""
+        top = self._stack[-1]
+        if top[1] == "comma":
+            self._out.append(",")
+            top[1] = "key" if top[0] == "{" else "value"
+            self.repaired = True
+        return top
+
+    def _value(self, token, is_string):
+        top = self._before_value()
+        if top[0] == "{" and top[1] == "key":
+            if not is_string:
+                self.repaired = True
+                return
+            top[2] = len(self._out)
+            self._out.append(token)
+            top[1] = "colon"
+            return
+        if top[1] == "colon":
+            self._out.append(":")
+            self.repaired = True
+        self._out.append(token)
+        top[1] = "comma"
+        self._mark_safe()
+
+    def _open(self, char):
+        if self._stack:
+            top = self._before_value()
+            if top[1] == "colon":
+                self._out.append(":")
+                self.repaired = True
+            top[1] = "comma"
+        self._out.append(char)
+        self._stack.append([char, "key" if char == "{" else "value", len(self._out)])
+        if len(self._stack) == 1:
+            self._mark_safe()  # Los contenedores internos vacíos no son un buen punto de corte
+
+    def _close_container(self, closer):
+        opener, state, member_start = self._stack.pop()
+        if closer != ("}" if opener == "{" else "]"):
+            self.repaired = True  # Se cierra con el carácter que corresponde a la apertura
+        if opener == "{" and state in ("colon", "value"):
+            # Clave sin valor: se descarta el miembro
+            del self._out[member_start:]
+            self.repaired = True
+        if self._out and self._out[-1] == ",":
+            self._out.pop()
+            self.repaired = True
+        self._out.append("}" if opener == "{" else "]")
+        if self._stack:
+            self._mark_safe()
+        else:
+            self._done = True
+
+    def _mark_safe(self):
+        self._safe = (len(self._out), [entry[0] for entry in self._stack])
+
+def parse_json(text):
+    """
+    Decodifica la respuesta JSON de un modelo, reparándola si hace falta
+
+    Returns:
+        tuple: (valor, reparado)
+
+    Raises:
+        ValueError: Si no se encuentra ningún objeto o lista JSON
+    """
+    stripped = text.strip()
+    if stripped.startswith("```"):
+        stripped = stripped.split("\n", 1)[1] if "\n" in stripped else ""
+        stripped = stripped.rsplit("```", 1)[0] if stripped.rstrip().endswith("```") else stripped
+    try:
+        return json.loads(stripped), False
+    except ValueError:
+        pass
+    parser = TolerantJSONParser()
+    parser.feed(text)
+    return parser.close(), parser.repaired
@@ -0,0 +1,182 @@
+# backend/app/utils/message_parser.py
+"""
+Adaptadores de proveedores de WhatsApp para el webhook de entrada.
+
+El cuerpo de la petición se decodifica una sola vez (formulario o JSON) y el
+primer adaptador registrado que lo reclama lo convierte en registros InboundMessage.
+"""
+
+FORM_MIMETYPES = ('application/x-www-form-urlencoded', 'multipart/form-data')
+
+class InboundMessage:
+    """Mensaje entrante normalizado, independiente del proveedor"""
+    __slots__ = ('provider', 'message_id', 'sender', 'body', 'media', 'timestamp')
+
+    def __init__(self, provider, message_id, sender, body, media=(), timestamp=None):
+        self.provider = provider
+        self.message_id = message_id or None
+        self.sender = sender or ''
+        self.body = body or ''
+        self.media = tuple(media)  # Pares (url, content_type)
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return f"<InboundMessage {self.provider} id={self.message_id} from={self.sender}>"
+
+class InboundRequest:
+    """Cabeceras y cuerpo ya decodificado de una petición al webhook"""
+    __slots__ = ('headers', 'user_agent', 'payload')
+
+    def __init__(self, headers, payload):
+        self.headers = headers
+        self.user_agent = headers.get('User-Agent', '').lower()
+        self.payload = payload if isinstance(payload, dict) else {}
+
+    @classmethod
+    def from_flask(cls, request):
+        """Decodifica el cuerpo de la petición exactamente una vez"""
+        if request.mimetype in FORM_MIMETYPES:
+            payload = request.form.to_dict()
+        elif request.is_json:
+            payload = request.get_json(silent=True)
+        else:
+            payload = {}
+        return cls(request.headers, payload)
+
+class ProviderAdapter:
+    """
+    Interfaz de un adaptador de proveedor.
+
+    `claims` solo mira cabeceras y claves de primer nivel; `parse` convierte el
+    payload en una lista de InboundMessage y cuenta los mensajes no soportados.
+    Los adaptadores con `batch = True` pueden traer varios mensajes por petición.
+    """
+    name = None
+    batch = False
+
+    def claims(self, inbound):
+        raise NotImplementedError
+
+    def parse(self, payload):
+        """
+        Returns:
+            tuple: (lista de InboundMessage, número de mensajes ignorados)
+        """
+        raise NotImplementedError
+
+class TwilioAdapter(ProviderAdapter):
+    name = 'twilio'
+
+    def claims(self, inbound):
+        return (
+            'twilio' in inbound.user_agent
+            or 'X-Twilio-Signature' in inbound.headers
+            or 'MessageSid' in inbound.payload
+            or 'SmsMessageSid' in inbound.payload
+        )
+
+    def parse(self, payload):
+        media = []
+        for index in range(int(payload.get('NumMedia') or 0)):
+            url = payload.get(f'MediaUrl{index}')
+            if url:
+                media.append((url, payload.get(f'MediaContentType{index}')))
+        message = InboundMessage(
+            self.name,
+            payload.get('MessageSid') or payload.get('SmsMessageSid'),
+            payload.get('From'),
+            payload.get('Body'),
+            media=media,
+            timestamp=payload.get('DateCreated')
+        )
+        return [message], 0
+
+class WhatsAppCloudAdapter(ProviderAdapter):
+    name = 'whatsapp_cloud'
+    batch = True
+
+    def claims(self, inbound):
+        return (
+            'X-Hub-Signature-256' in inbound.headers
+            or inbound.payload.get('object') == 'whatsapp_business_account'
+        )
+
+    def parse(self, payload):
+        """Recorre entry[].changes[].value.messages[] y conserva los mensajes de texto"""
+        messages = []
+        ignored = 0
+        for entry in payload.get('entry') or []:
+            for change in entry.get('changes') or []:
+                for item in (change.get('value') or {}).get('messages') or []:
+                    body = (item.get('text') or {}).get('body', '')
+                    if item.get('type', 'text') != 'text' or not body or not item.get('id'):
+                        ignored += 1
+                        continue
+                    messages.append(InboundMessage(
+                        self.name, item['id'], item.get('from'), body, timestamp=item.get('timestamp')
+                    ))
+        return messages, ignored
+
+class MessageBirdAdapter(ProviderAdapter):
+    name = 'messagebird'
+
+    def claims(self, inbound):
+        message = inbound.payload.get('message')
+        return 'messagebird' in inbound.user_agent or (
+            isinstance(message, dict) and ('originator' in message or 'from' in message)
+        )
+
+    def parse(self, payload):
+        message = payload.get('message') or {}
+        content = message.get('content') or {}
+        body = content.get('text') if isinstance(content, dict) else None
+        return [InboundMessage(
+            self.name,
+            message.get('id'),
+            message.get('originator') or message.get('from'),
+            body or message.get('body'),
+            timestamp=message.get('createdDatetime')
+        )], 0
+
+class GenericAdapter(ProviderAdapter):
+    """Último recurso: busca los campos habituales en cualquier formato"""
+    name = 'generic'
+
+    def claims(self, inbound):
+        return True
+
+    def parse(self, payload):
+        sender = payload.get('From') or payload.get('from') or payload.get('sender')
+        body = payload.get('Body') or payload.get('body') or payload.get('text') or payload.get('content')
+        message_id = payload.get('id') or payload.get('message_id')
+        if not sender or not isinstance(body, str):
+            return [], 0
+        return [InboundMessage(self.name, message_id, sender, body)], 0
+
+class ProviderRegistry:
+    """Lista ordenada de adaptadores; gana el primero que reclama la petición"""
+
+    def __init__(self, adapters=()):
+        self._adapters = list(adapters)
+
+    def register(self, adapter, position=None):
+        """Agrega un adaptador (por defecto antes del genérico, que siempre va último)"""
+        if position is None:
+            position = len(self._adapters)
+            if self._adapters and isinstance(self._adapters[-1], GenericAdapter):
+                position -= 1
+        self._adapters.insert(position, adapter)
+
+    def resolve(self, inbound):
+        """Devuelve el adaptador que reclama la petición, o None"""
+        for adapter in self._adapters:
+            if adapter.claims(inbound):
+                return adapter
+        return None
+
+provider_registry = ProviderRegistry([
+    TwilioAdapter(),
+    WhatsAppCloudAdapter(),
+    MessageBirdAdapter(),
+    GenericAdapter()
+])
@@ -0,0 +1,104 @@
+# backend/app/utils/rate_limit.py
+import time
+import asyncio
+import threading
+
+class TokenBucket:
+    """
+    Limitador de tasa por cubeta de tokens, seguro entre hilos.
+    Se recargan `rate` tokens por segundo hasta un máximo de `capacity`.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        Args:
+            rate (float): Tokens por segundo
+            capacity (float, optional): Ráfaga máxima (por defecto, un segundo de tokens)
+        """
+        if rate <= 0:
+            raise ValueError("La tasa debe ser positiva")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated_at
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated_at = now
+
+    def try_acquire(self, tokens=1):
+        """Toma tokens si hay disponibles, sin esperar"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1, timeout=None):
+        """
+        Espera hasta poder tomar `tokens`
+
+        Returns:
+            bool: False si se agotó `timeout` sin conseguirlos
+        """
+        if tokens > self.capacity:
+            raise ValueError("No se pueden pedir más tokens que la capacidad de la cubeta")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None:
+                if now + wait > deadline:
+                    return False
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens=1):
+        """Como `acquire`, pero cede el bucle de eventos mientras espera"""
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            await asyncio.sleep(wait)
+
+    def debit(self, tokens):
+        """
+        Descuenta tokens ya consumidos sin esperar; el saldo puede quedar negativo
+        y las siguientes peticiones esperan a que se recupere
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= tokens
+
+class QuotaLimiter:
+    """
+    Cuota por minuto de una API con límite de peticiones (RPM) y de tokens (TPM):
+    una cubeta para cada límite, con una ráfaga máxima de `burst_seconds` de cuota.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute, burst_seconds=10):
+        request_rate = requests_per_minute / 60
+        token_rate = tokens_per_minute / 60
+        self.requests = TokenBucket(request_rate, capacity=max(1, request_rate * burst_seconds))
+        self.tokens = TokenBucket(token_rate, capacity=max(1, token_rate * burst_seconds))
+
+    async def acquire(self, tokens):
+        """Espera turno para una petición que usará aproximadamente `tokens` tokens"""
+        await self.requests.acquire_async(1)
+        await self.tokens.acquire_async(tokens)
+
+    def debit(self, tokens):
+        """Descuenta los tokens que la petición usó por encima de lo reservado"""
+        if tokens > 0:
+            self.tokens.debit(tokens)
@@ -0,0 +1,19 @@
+# backend/gunicorn.conf.py
+# Gunicorn lo carga automáticamente al iniciarse desde este directorio
+import os
+import shutil
+from prometheus_client import multiprocess
+
+# Cada worker escribe sus métricas en este directorio y /metrics las suma
+# (modo multiproceso de prometheus_client). Se define antes de crear los workers.
+# Las métricas de clasificación no pasan por aquí: las expone `flask classify-worker`.
+metrics_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/serena-metrics")
+
+def on_starting(server):
+    """Descarta las métricas de una ejecución anterior"""
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+def child_exit(server, worker):
+    """Los contadores del worker terminado se conservan; sus gauges en vivo se descartan"""
+    multiprocess.mark_process_dead(worker.pid)
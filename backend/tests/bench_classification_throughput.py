@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Throughput de ClassificationService.process_message sin red ni clave de API.
+
+Usa el backend simulado de Gemini (GEMINI_BACKEND=fake) con latencia, errores y
+respuestas malformadas configurables, de modo que se mide el camino completo:
+reglas, caché, prompt, llamada al modelo, parser tolerante y escritura de los
+valores clasificados. Con --replay se reproducen respuestas reales grabadas con
+GEMINI_RECORD_PATH.
+
+Uso:
+  python tests/bench_classification_throughput.py --messages 500 --threads 8 --latency lognormal:300:0.4
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+# Añadir el directorio raíz al path para importaciones relativas
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load_test_webhook import render_phrase, percentile
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Throughput de process_message con Gemini simulado")
+    parser.add_argument("--messages", type=int, default=300, help="Mensajes a procesar")
+    parser.add_argument("--threads", type=int, default=8, help="Hilos que llaman a process_message")
+    parser.add_argument("--latency", default="lognormal:300:0.4",
+                        help="Latencia del modelo en ms: constant:<ms>, uniform:<min>:<max> o lognormal:<mediana>:<sigma>")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fracción de llamadas con 503")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Fracción de respuestas con JSON defectuoso")
+    parser.add_argument("--replay", help="JSONL de respuestas grabadas a reproducir")
+    parser.add_argument("--no-cache", action="store_true", help="Desactiva la caché de clasificaciones")
+    parser.add_argument("--no-rules", action="store_true", help="Envía todos los mensajes al modelo")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla aleatoria")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    # El backend y la base deben configurarse antes de importar la aplicación
+    tmp_dir = tempfile.TemporaryDirectory()
+    os.environ["TEST_DATABASE_URL"] = f"sqlite:///{tmp_dir.name}/bench.db?timeout=30"
+    os.environ["GEMINI_BACKEND"] = "fake"
+    os.environ["GEMINI_FAKE_LATENCY"] = args.latency
+    os.environ["GEMINI_FAKE_ERROR_RATE"] = str(args.error_rate)
+    os.environ["GEMINI_FAKE_MALFORMED_RATE"] = str(args.malformed_rate)
+    os.environ["GEMINI_FAKE_SEED"] = str(args.seed)
+    if args.replay:
+        os.environ["GEMINI_FAKE_REPLAY"] = args.replay
+    if args.no_cache:
+        os.environ["CLASSIFICATION_CACHE_SIZE"] = "0"
+    os.environ.pop("GOOGLE_API_KEY", None)
+
+    from app import create_app
+    from app.extensions import db
+    from app.models import Patient, Caregiver, ClassifiedValue
+    from app.services.classification_cache import classification_cache
+    from app.services.classification_service import ClassificationService
+    from app.services.gemini_service import default_backend, parse_stats, token_usage
+    from app.utils.db_init import create_default_taxonomy
+
+    app = create_app('testing')
+    logging.getLogger('app').setLevel(logging.WARNING)
+    with app.app_context():
+        db.create_all()
+        create_default_taxonomy(db)
+        patient = Patient(name="Paciente de benchmark", age=80)
+        db.session.add(patient)
+        db.session.flush()
+        db.session.add(Caregiver(name="Cuidador de benchmark", phone="+5491100000000", patient_id=patient.id))
+        db.session.commit()
+        patient_id = patient.id
+
+    service = ClassificationService(use_rules=not args.no_rules)
+    rng = random.Random(args.seed)
+    texts = [render_phrase(rng) for _ in range(args.messages)]
+    latencies = []
+    statuses = Counter()
+    results_lock = threading.Lock()
+
+    def process(text):
+        with app.app_context():
+            start = time.perf_counter()
+            try:
+                status = service.process_message(text, "+5491100000000", patient_id)["status"]
+            except Exception:
+                status = "exception"
+            finally:
+                db.session.remove()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+        with results_lock:
+            latencies.append(elapsed_ms)
+            statuses[status] += 1
+
+    print("=== THROUGHPUT DE process_message (Gemini simulado) ===")
+    print(f"Mensajes: {args.messages} | Hilos: {args.threads} | Latencia: {args.latency} | "
+          f"Errores: {args.error_rate:.1%} | Malformadas: {args.malformed_rate:.1%}\n")
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        list(executor.map(process, texts))
+    elapsed = time.perf_counter() - started_at
+
+    with app.app_context():
+        classified_values = ClassifiedValue.query.count()
+
+    p50, p95, p99 = (percentile(latencies, pct) for pct in (50, 95, 99))
+    backend = default_backend.stats()
+    cache = classification_cache.stats()
+    parsing = parse_stats.stats()
+    print(f"Throughput: {args.messages / elapsed:.1f} mensajes/s ({elapsed:.2f} s)")
+    print(f"Latencia por mensaje (ms): p50={p50:.1f}  p95={p95:.1f}  p99={p99:.1f}")
+    print(f"Resultados: {dict(statuses)} | Valores clasificados: {classified_values}")
+    print(f"Backend simulado: {backend}")
+    print(f"Caché: {cache['hit_rate']:.1%} aciertos | Respuestas: {parsing}")
+    print(f"Tokens: {token_usage.stats()}")
+
+    report = {
+        "messages": args.messages, "threads": args.threads, "throughput_mps": args.messages / elapsed,
+        "p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "statuses": dict(statuses),
+        "backend": backend, "cache_hit_rate": cache["hit_rate"], "parsing": parsing
+    }
+    print(f"\nJSON: {json.dumps(report)}")
+
+    with app.app_context():
+        db.engine.dispose()
+    tmp_dir.cleanup()
+
+if __name__ == "__main__":
+    main()
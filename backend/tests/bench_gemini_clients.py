@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark del costo por llamada del cliente de Gemini, sin red.
+
+El backend se simula reemplazando el RPC GenerativeServiceClient.generate_content
+por una respuesta fija, así que se mide solo el trabajo del lado del cliente:
+creación de GenerativeModel, preparación de la petición y, en el peor caso,
+la creación de un canal nuevo tras genai.configure. Los tres casos hacen la misma
+llamada (generate_content del modelo) y solo cambia de dónde sale el modelo; el
+resto de GeminiService (orden por salud, métricas, logs) queda fuera.
+
+Compara:
+  - Antes: un GenerativeModel nuevo por llamada (como hacía classify_message)
+  - Antes + configure: además, un GeminiService nuevo por petición, que llamaba
+    a genai.configure y descartaba el canal abierto
+  - Ahora: el modelo del registro del proceso (model_registry.get)
+
+Uso: python tests/bench_gemini_clients.py [iteraciones]
+"""
+
+import os
+import sys
+import time
+
+# Añadir el directorio raíz al path para importaciones relativas
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import google.generativeai as genai
+from google.ai import generativelanguage as glm
+
+from app.services.gemini_service import ModelRegistry, PRIMARY_MODEL
+
+PROMPT = "Clasifica el siguiente mensaje: José durmió 6 horas y desayunó bien."
+RESPONSE = glm.GenerateContentResponse(candidates=[glm.Candidate(
+    content=glm.Content(parts=[glm.Part(text='{"categorias": [], "resumen": "Sin novedades"}')], role="model"),
+    finish_reason=glm.Candidate.FinishReason.STOP
+)])
+
+def fake_generate_content(self, request=None, **kwargs):
+    """Backend simulado: responde al instante sin salir del proceso"""
+    return RESPONSE
+
+def legacy_call(api_key):
+    """Modelo nuevo en cada llamada"""
+    return genai.GenerativeModel(PRIMARY_MODEL).generate_content(PROMPT)
+
+def legacy_configure_call(api_key):
+    """Servicio nuevo por petición: configure descarta el cliente y su canal"""
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(PRIMARY_MODEL).generate_content(PROMPT)
+
+def registry_call(registry):
+    """Modelo compartido del registro, creado una sola vez"""
+    return registry.get(PRIMARY_MODEL).generate_content(PROMPT)
+
+def run(call, arg, iterations, repeats=5):
+    """Mejor tiempo medio por llamada (µs) entre varias repeticiones, para reducir el ruido"""
+    call(arg)  # Calentamiento: crea el cliente y el canal
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            call(arg)
+        best = min(best, (time.perf_counter() - start) / iterations * 1e6)
+    return best
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    api_key = os.environ.setdefault("GOOGLE_API_KEY", "clave-de-prueba")
+    glm.GenerativeServiceClient.generate_content = fake_generate_content
+
+    registry = ModelRegistry()
+    registry.configure(api_key)
+    cases = [
+        ("Antes (modelo nuevo por llamada)", legacy_call, api_key),
+        ("Antes + configure por petición", legacy_configure_call, api_key),
+        ("Ahora (registro de modelos)", registry_call, registry),
+    ]
+
+    print(f"=== CLIENTE DE GEMINI ({iterations} iteraciones, µs por llamada) ===\n")
+    print(f"{'Caso':<40}{'µs':>10}{'vs. ahora':>12}")
+    results = [(name, run(call, arg, iterations)) for name, call, arg in cases]
+    after = results[-1][1]
+    for name, elapsed in results:
+        print(f"{name:<40}{elapsed:>10.1f}{elapsed / after:>11.1f}x")
+    print("\n(Backend simulado: el tiempo es solo sobrecarga del cliente)")
+
+if __name__ == "__main__":
+    main()
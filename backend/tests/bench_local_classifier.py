@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Evaluación del clasificador local contra las clasificaciones de Gemini.
+
+Entrena con los mensajes más antiguos ya clasificados y evalúa con los más nuevos
+(partición temporal, como se usaría en producción). Para cada umbral de confianza
+informa qué fracción de los mensajes resolvería el clasificador local (cobertura),
+cuánto coincide con Gemini en esos mensajes y la latencia ahorrada por mensaje
+frente a la latencia típica de Gemini.
+
+Por defecto lee la base configurada (DATABASE_URL); con --synthetic usa frases
+de cuidadores generadas y etiquetadas por palabras clave, sin base ni red.
+
+Uso:
+  python tests/bench_local_classifier.py --config production --test-fraction 0.2
+  python tests/bench_local_classifier.py --synthetic 5000 --gemini-latency-ms 1500
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+
+# Añadir el directorio raíz al path para importaciones relativas
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load_test_webhook import render_phrase, fake_classification, percentile
+
+THRESHOLDS = (0.5, 0.8, 0.9, 0.95, 0.98, 0.99)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Coincidencia con Gemini y latencia ahorrada del clasificador local")
+    parser.add_argument("--config", default="default", help="Configuración de la aplicación para leer la base")
+    parser.add_argument("--synthetic", type=int, default=0, help="Mensajes sintéticos en lugar de la base")
+    parser.add_argument("--limit", type=int, default=None, help="Máximo de mensajes clasificados a leer")
+    parser.add_argument("--include-unlabeled", action="store_true",
+                        help="Usa también los valores sin origen registrado (anteriores a registrarlo)")
+    parser.add_argument("--test-fraction", type=float, default=0.2, help="Fracción más reciente usada para evaluar")
+    parser.add_argument("--epochs", type=int, default=8, help="Pasadas de entrenamiento")
+    parser.add_argument("--gemini-latency-ms", type=float, default=1500,
+                        help="Latencia típica de una clasificación con Gemini (ver gemini_classify_duration_seconds)")
+    parser.add_argument("--output", help="Guarda el modelo entrenado en este archivo .npz")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla de los mensajes sintéticos")
+    return parser.parse_args()
+
+def synthetic_data(count, seed):
+    rng = random.Random(seed)
+    texts = [render_phrase(rng) for _ in range(count)]
+    label_sets = [
+        {(category["nombre"], subcategory["nombre"])
+         for category in fake_classification(text)["categorias"] for subcategory in category["subcategorias"]}
+        for text in texts
+    ]
+    return texts, label_sets
+
+def database_data(config_name, limit, include_unlabeled):
+    from app import create_app
+    from app.services.local_classifier import load_training_data
+
+    app = create_app(config_name)
+    with app.app_context():
+        return load_training_data(limit, include_unlabeled=include_unlabeled)
+
+def main():
+    args = parse_args()
+    logging.getLogger('app').setLevel(logging.WARNING)
+
+    from app.services.local_classifier import LocalModel, LocalClassifier
+
+    if args.synthetic:
+        texts, label_sets = synthetic_data(args.synthetic, args.seed)
+    else:
+        texts, label_sets = database_data(args.config, args.limit, args.include_unlabeled)
+    split = int(len(texts) * (1 - args.test_fraction))
+    if split == 0 or split == len(texts):
+        print(f"Datos insuficientes para entrenar y evaluar: {len(texts)} mensajes clasificados")
+        sys.exit(1)
+
+    print("=== CLASIFICADOR LOCAL vs GEMINI ===")
+    print(f"Mensajes: {len(texts)} | Entrenamiento: {split} | Evaluación: {len(texts) - split} | "
+          f"Origen: {'sintético' if args.synthetic else args.config}\n")
+
+    started = time.perf_counter()
+    model = LocalModel.train(texts[:split], label_sets[:split], epochs=args.epochs)
+    training_seconds = time.perf_counter() - started
+    print(f"Entrenamiento: {training_seconds:.1f} s | Subcategorías aprendidas: {len(model.labels)}")
+    if args.output:
+        model.save(args.output)
+        print(f"Modelo guardado en {args.output}")
+
+    classifier = LocalClassifier(model)
+    # (subcategorías predichas o None si faltan valores numéricos, confianza, subcategorías de Gemini)
+    predictions = []
+    latencies_us = []
+    for text, expected in zip(texts[split:], label_sets[split:]):
+        start = time.perf_counter()
+        result, confidence = classifier.predict(text)
+        latencies_us.append((time.perf_counter() - start) * 1e6)
+        found = None if result is None else {
+            (category["nombre"], subcategory["nombre"])
+            for category in result["categorias"] for subcategory in category["subcategorias"]
+        }
+        predictions.append((found, confidence, expected))
+
+    local_ms = sum(latencies_us) / len(latencies_us) / 1000
+    p50, p99 = (percentile(latencies_us, pct) for pct in (50, 99))
+    print(f"Latencia local por mensaje (µs): p50={p50:.0f}  p99={p99:.0f} | "
+          f"Gemini de referencia: {args.gemini_latency_ms:.0f} ms\n")
+
+    print(f"{'umbral':>7} {'cobertura':>10} {'coincide':>9} {'precisión':>10} {'recall':>7} {'ahorro ms/msg':>14}")
+    rows = []
+    for threshold in THRESHOLDS:
+        accepted = [(found, expected) for found, confidence, expected in predictions
+                    if found is not None and confidence >= threshold]
+        coverage = len(accepted) / len(predictions)
+        agreement = sum(found == expected for found, expected in accepted) / len(accepted) if accepted else 0.0
+        true_positives = sum(len(found & expected) for found, expected in accepted)
+        predicted = sum(len(found) for found, _ in accepted)
+        actual = sum(len(expected) for _, expected in accepted)
+        precision = true_positives / predicted if predicted else 1.0
+        recall = true_positives / actual if actual else 1.0
+        # Todos los mensajes pagan la inferencia local; los aceptados se ahorran Gemini
+        saved_ms = coverage * args.gemini_latency_ms - local_ms
+        rows.append({
+            "threshold": threshold, "coverage": coverage, "agreement": agreement,
+            "precision": precision, "recall": recall, "saved_ms_per_message": saved_ms
+        })
+        print(f"{threshold:>7.2f} {coverage:>10.1%} {agreement:>9.1%} {precision:>10.1%} {recall:>7.1%} "
+              f"{saved_ms:>14.1f}")
+
+    report = {
+        "messages": len(texts), "train": split, "test": len(texts) - split, "labels": len(model.labels),
+        "training_seconds": training_seconds, "local_p50_us": p50, "local_p99_us": p99,
+        "gemini_latency_ms": args.gemini_latency_ms, "thresholds": rows
+    }
+    print(f"\nJSON: {json.dumps(report)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark del parseo de peticiones al webhook de WhatsApp.
+
+Compara la detección anterior (detect_provider + ramas if/elif que llamaban
+varias veces a request.get_json y request.form.to_dict) con el registro de
+adaptadores, que decodifica el cuerpo una sola vez.
+
+Uso: python tests/bench_webhook_parsing.py [iteraciones]
+"""
+
+import os
+import sys
+import json
+import time
+
+# Añadir el directorio raíz al path para importaciones relativas
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from app.utils.message_parser import InboundRequest, provider_registry
+
+TWILIO_FORM = {
+    "SmsMessageSid": "SMabcdef123456789",
+    "NumMedia": "0",
+    "SmsSid": "SMabcdef123456789",
+    "SmsStatus": "received",
+    "Body": "José no pudo dormir bien anoche, estuvo inquieto. Solo tomó un vaso de leche en el desayuno.",
+    "To": "whatsapp:+12345678901",
+    "NumSegments": "1",
+    "MessageSid": "SMabcdef123456789",
+    "AccountSid": "ACabcdef123456789",
+    "From": "whatsapp:+5493815122808",
+    "ApiVersion": "2010-04-01"
+}
+
+CLOUD_JSON = {
+    "object": "whatsapp_business_account",
+    "entry": [{
+        "id": "123456789",
+        "changes": [{
+            "value": {
+                "messaging_product": "whatsapp",
+                "messages": [{
+                    "id": f"wamid.{i}",
+                    "from": "5493815122808",
+                    "timestamp": "1679123456",
+                    "type": "text",
+                    "text": {"body": "Hoy caminó 100 pasos y comió bien el almuerzo."}
+                } for i in range(5)]
+            },
+            "field": "messages"
+        }]
+    }]
+}
+
+def legacy_detect_provider(request):
+    """Detección anterior, copiada de webhooks.detect_provider"""
+    user_agent = request.headers.get("User-Agent", "").lower()
+    if "twilio" in user_agent:
+        return "twilio"
+    elif "messagebird" in user_agent:
+        return "messagebird"
+    if request.form:
+        data = request.form.to_dict()
+        if "SmsMessageSid" in data or "MessageSid" in data:
+            return "twilio"
+    if request.is_json:
+        data = request.get_json(silent=True)
+        if not data:
+            return "unknown"
+        if "object" in data and data.get("object") == "whatsapp_business_account":
+            return "whatsapp_cloud"
+        elif "SmsMessageSid" in data:
+            return "twilio"
+        elif "message" in data and "originator" in data.get("message", {}):
+            return "messagebird"
+    return "unknown"
+
+def legacy_parse(request):
+    """Ramas del whatsapp_webhook anterior hasta obtener los datos del mensaje"""
+    provider_type = legacy_detect_provider(request)
+    if provider_type == "twilio" and request.form:
+        return request.form.to_dict()
+    elif request.is_json:
+        data = request.get_json(silent=True)
+        if data and provider_type == "whatsapp_cloud":
+            messages = []
+            for entry in data.get("entry", []):
+                for change in entry.get("changes", []):
+                    messages.extend(change.get("value", {}).get("messages", []))
+            return messages
+        return data
+    data = {}
+    if request.form:
+        data = request.form.to_dict()
+    elif request.is_json:
+        data = request.get_json(silent=True) or {}
+    return data
+
+def registry_parse(request):
+    """Ruta actual: un solo decode y un adaptador"""
+    inbound = InboundRequest.from_flask(request)
+    adapter = provider_registry.resolve(inbound)
+    return adapter.parse(inbound.payload)
+
+def baseline(request):
+    """Solo el costo de crear la petición, para descontarlo"""
+    return None
+
+def run(app, parser, iterations, repeats=5, **request_kwargs):
+    """Mejor tiempo medio por petición (µs) entre varias repeticiones, para reducir el ruido"""
+    from flask import request
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            with app.test_request_context('/api/webhook/whatsapp', method='POST', **request_kwargs):
+                parser(request)
+        best = min(best, (time.perf_counter() - start) / iterations * 1e6)
+    return best
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    app = Flask(__name__)
+    cases = {
+        "Twilio (formulario, sin User-Agent)": {"data": TWILIO_FORM},
+        "Twilio (formulario, User-Agent Twilio)": {"data": TWILIO_FORM, "headers": {"User-Agent": "TwilioProxy/1.1"}},
+        "Cloud API (JSON, 5 mensajes)": {"data": json.dumps(CLOUD_JSON), "content_type": "application/json"},
+    }
+
+    print(f"=== PARSEO DEL WEBHOOK ({iterations} iteraciones, µs por petición) ===\n")
+    print(f"{'Caso':<42}{'Antes':>10}{'Ahora':>10}{'Mejora':>10}")
+    for name, kwargs in cases.items():
+        base = run(app, baseline, iterations, **kwargs)
+        before = run(app, legacy_parse, iterations, **kwargs) - base
+        after = run(app, registry_parse, iterations, **kwargs) - base
+        print(f"{name:<42}{before:>10.1f}{after:>10.1f}{before / after:>9.1f}x")
+    print("\n(Descontado el costo de crear el contexto de la petición)")
+
+if __name__ == "__main__":
+    main()
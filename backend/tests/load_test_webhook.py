@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga del webhook /api/webhook/whatsapp, completamente sin red.
+
+Envía payloads de Twilio con frases reales de cuidadores a una tasa y concurrencia
+configurables, mientras un pool de workers de clasificación drena la cola usando un
+GeminiService simulado (latencia y errores configurables). Informa la latencia de
+respuesta (p50/p95/p99), throughput, tasa de errores y filas escritas en la base.
+
+Con --max-p99-ms y --max-error-rate el script termina con código 1 si no se cumplen,
+para usarlo como control antes de publicar una versión.
+
+Uso:
+  python tests/load_test_webhook.py --requests 2000 --concurrency 16 --rate 200 --workers 4
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+# Añadir el directorio raíz al path para importaciones relativas
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PHRASES = [
+    "Hola, buen día",
+    "Hoy durmió {horas} horas",
+    "Anoche durmió mal, se despertó {veces} veces",
+    "La presión {sis}/{dia}",
+    "Temperatura {temp}",
+    "Oxígeno {ox}%",
+    "Gastamos {monto} en remedios",
+    "Gasté ${monto} en farmacia",
+    "Pagamos {monto} a la enfermera",
+    "Tomó la medicación de la mañana",
+    "No quiso tomar la pastilla de la noche",
+    "Caminó {pasos} pasos hasta la plaza",
+    "Comió poco en el almuerzo, solo la sopa",
+    "Desayunó bien, con apetito",
+    "Estuvo muy contenta con la visita de los nietos",
+    "Está irritable y un poco triste",
+    "Preguntó varias veces qué día es hoy",
+    "No reconoció a su hermano",
+    "Se quejó de dolor en la rodilla",
+    "Estuvo inquieta toda la tarde",
+]
+
+KEYWORDS = [
+    (("durm", "despert"), "Salud Física", "Sueño"),
+    (("presión", "temperatura", "oxígeno", "dolor"), "Salud Física", "Síntomas"),
+    (("camin", "pasos"), "Salud Física", "Movilidad"),
+    (("comió", "desayun", "almuerzo"), "Salud Física", "Alimentación"),
+    (("remedios", "farmacia"), "Gastos", "Medicamentos"),
+    (("enfermera",), "Gastos", "Servicios"),
+    (("medicación", "pastilla"), "Medicación", "Adherencia"),
+    (("qué día",), "Salud Cognitiva", "Orientación"),
+    (("reconoció",), "Salud Cognitiva", "Memoria"),
+    (("contenta", "triste", "irritable"), "Estado Emocional", "Humor"),
+    (("inquieta",), "Estado Emocional", "Agitación"),
+]
+
+def render_phrase(rng):
+    """Genera una frase de cuidador con valores aleatorios"""
+    return rng.choice(PHRASES).format(
+        horas=rng.randint(3, 9), veces=rng.randint(1, 5), sis=rng.randint(100, 160),
+        dia=rng.randint(60, 95), temp=round(rng.uniform(35.8, 38.5), 1), ox=rng.randint(88, 99),
+        monto=rng.randrange(500, 20000, 500), pasos=rng.randrange(50, 2000, 50)
+    )
+
+def fake_classification(text):
+    """Clasificación determinista por palabras clave, con la estructura que devuelve Gemini"""
+    lowered = text.lower()
+    categories = {}
+    for keywords, category, subcategory in KEYWORDS:
+        if any(keyword in lowered for keyword in keywords):
+            categories.setdefault(category, []).append({
+                "nombre": subcategory, "detectada": True, "valor": text, "confianza": 0.9
+            })
+    return {
+        "categorias": [
+            {"nombre": name, "detectada": True, "subcategorias": subcategories}
+            for name, subcategories in categories.items()
+        ],
+        "resumen": text
+    }
+
+class FakeGeminiService:
+    """Sustituto de GeminiService con latencia y errores configurables"""
+
+    def __init__(self, latency_ms=800, jitter_ms=300, error_rate=0.0, seed=None):
+        self.model_name = "fake-gemini"
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _simulate_call(self):
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self._rng.gauss(self.latency_ms, self.jitter_ms)) / 1000
+            failed = self._rng.random() < self.error_rate
+        time.sleep(delay)
+        return failed
+
+    def classify_message(self, message_text, deadline=None):
+        if self._simulate_call():
+            return {"categorias": [], "resumen": "Error en clasificación", "error": "Error simulado"}
+        return fake_classification(message_text)
+
+    def classify_messages(self, messages, deadline=None):
+        if self._simulate_call():
+            return [{"categorias": [], "resumen": "Error en clasificación", "error": "Error simulado"}
+                    for _ in messages]
+        return [fake_classification(text) for text in messages]
+
+def percentile(values, pct):
+    """Percentil por rango más cercano"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Prueba de carga del webhook de WhatsApp (sin red)")
+    parser.add_argument("--requests", type=int, default=1000, help="Número de peticiones a enviar")
+    parser.add_argument("--concurrency", type=int, default=8, help="Peticiones simultáneas")
+    parser.add_argument("--rate", type=float, default=0, help="Peticiones por segundo (0 = sin límite)")
+    parser.add_argument("--caregivers", type=int, default=20, help="Cuidadores distintos que envían mensajes")
+    parser.add_argument("--duplicate-rate", type=float, default=0.05, help="Fracción de reenvíos de Twilio")
+    parser.add_argument("--workers", type=int, default=4, help="Hilos del worker de clasificación")
+    parser.add_argument("--batch-size", type=int, default=1, help="Mensajes por llamada al modelo")
+    parser.add_argument("--coalesce-window", type=float, default=0, help="Ventana de ráfagas por cuidador (s)")
+    parser.add_argument("--gemini-latency-ms", type=float, default=800, help="Latencia media del modelo simulado")
+    parser.add_argument("--gemini-jitter-ms", type=float, default=300, help="Desvío de la latencia simulada")
+    parser.add_argument("--gemini-error-rate", type=float, default=0.02, help="Fracción de llamadas fallidas")
+    parser.add_argument("--drain-timeout", type=float, default=60, help="Segundos máximos para drenar la cola")
+    parser.add_argument("--database-url", help="Base de datos a usar (por defecto un SQLite temporal)")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla aleatoria")
+    parser.add_argument("--max-p99-ms", type=float, help="Falla si el p99 de respuesta supera este valor")
+    parser.add_argument("--max-error-rate", type=float, help="Falla si la tasa de errores HTTP la supera")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    # La base debe configurarse antes de importar la aplicación
+    tmp_dir = None
+    if args.database_url:
+        os.environ["TEST_DATABASE_URL"] = args.database_url
+    else:
+        tmp_dir = tempfile.TemporaryDirectory()
+        os.environ["TEST_DATABASE_URL"] = f"sqlite:///{tmp_dir.name}/load_test.db?timeout=30"
+
+    from app import create_app
+    from app.extensions import db
+    from app.api import webhooks
+    from app.models import Patient, Caregiver, Message, ClassificationJob, ClassifiedValue, DeadLetter
+    from app.services.classification_service import ClassificationService
+    from app.services.classification_worker import ClassificationWorker
+    from app.services.rule_classifier import rule_classifier
+    from app.utils.db_init import create_default_taxonomy
+
+    app = create_app('testing')
+    app.config['CLASSIFICATION_COALESCE_WINDOW'] = args.coalesce_window
+    logging.getLogger('app').setLevel(logging.WARNING)
+
+    with app.app_context():
+        db.create_all()
+        create_default_taxonomy(db)
+        patient = Patient(name="Paciente de carga", age=80)
+        db.session.add(patient)
+        db.session.flush()
+        phones = [f"+5491100{i:06d}" for i in range(args.caregivers)]
+        for index, phone in enumerate(phones):
+            db.session.add(Caregiver(name=f"Cuidador {index}", phone=phone, patient_id=patient.id))
+        db.session.commit()
+
+    fake_gemini = FakeGeminiService(
+        latency_ms=args.gemini_latency_ms,
+        jitter_ms=args.gemini_jitter_ms,
+        error_rate=args.gemini_error_rate,
+        seed=args.seed
+    )
+    with patch('app.services.classification_service.GeminiService', return_value=fake_gemini):
+        classification_service = ClassificationService()
+    worker = ClassificationWorker(
+        app,
+        concurrency=args.workers,
+        batch_size=args.batch_size,
+        poll_interval=0.05,
+        classification_service=classification_service
+    )
+
+    # Generar los payloads de antemano para no medir su construcción
+    rng = random.Random(args.seed)
+    payloads = []
+    for index in range(args.requests):
+        if payloads and rng.random() < args.duplicate_rate:
+            payloads.append(rng.choice(payloads))  # Reenvío de Twilio
+            continue
+        payloads.append({
+            "SmsMessageSid": f"SMload{index:010d}",
+            "MessageSid": f"SMload{index:010d}",
+            "AccountSid": "ACloadtest",
+            "From": f"whatsapp:{rng.choice(phones)}",
+            "To": "whatsapp:+14155238886",
+            "Body": render_phrase(rng),
+            "NumMedia": "0",
+            "NumSegments": "1",
+            "ApiVersion": "2010-04-01"
+        })
+
+    clients = threading.local()
+    latencies = []
+    statuses = Counter()
+    results_lock = threading.Lock()
+
+    def send(index, started_at):
+        if args.rate > 0:
+            delay = started_at + index / args.rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        if not hasattr(clients, "client"):
+            clients.client = app.test_client()
+        start = time.perf_counter()
+        try:
+            response = clients.client.post(
+                '/api/webhook/whatsapp',
+                data=payloads[index],
+                headers={"User-Agent": "TwilioProxy/1.1"}
+            )
+            status = response.status_code
+        except Exception:
+            status = "exception"
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with results_lock:
+            latencies.append(elapsed_ms)
+            statuses[status] += 1
+
+    print("=== PRUEBA DE CARGA DEL WEBHOOK ===")
+    print(f"Peticiones: {args.requests} | Concurrencia: {args.concurrency} | "
+          f"Tasa: {args.rate or 'sin límite'} req/s | Workers: {args.workers} (lote {args.batch_size})")
+    print(f"Gemini simulado: {args.gemini_latency_ms:.0f}±{args.gemini_jitter_ms:.0f} ms, "
+          f"errores {args.gemini_error_rate:.1%}\n")
+
+    worker.start()
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for index in range(args.requests):
+            executor.submit(send, index, started_at)
+    load_seconds = time.perf_counter() - started_at
+
+    # Esperar a que los workers vacíen la cola (incluidos los reintentos con backoff)
+    drain_started = time.perf_counter()
+    with app.app_context():
+        while time.perf_counter() - drain_started < args.drain_timeout:
+            if not worker.queue.backlog_depth():
+                break
+            db.session.remove()
+            time.sleep(0.2)
+    drain_seconds = time.perf_counter() - drain_started
+    worker.stop()
+
+    with app.app_context():
+        rows = {
+            "messages": Message.query.count(),
+            "classified_values": ClassifiedValue.query.count(),
+        }
+        job_statuses = dict(db.session.query(
+            ClassificationJob.status, db.func.count(ClassificationJob.id)
+        ).group_by(ClassificationJob.status).all())
+        dead_letters = DeadLetter.query.count()
+    unfinished = sum(job_statuses.get(status, 0) for status in ClassificationJob.UNFINISHED_STATUSES)
+    failed_jobs = job_statuses.get(ClassificationJob.STATUS_FAILED, 0)
+
+    errors = sum(count for status, count in statuses.items() if status == "exception" or status >= 400)
+    error_rate = errors / max(1, args.requests)
+    p50, p95, p99 = (percentile(latencies, pct) for pct in (50, 95, 99))
+
+    print("Latencia de respuesta (ms):")
+    print(f"  p50={p50:.1f}  p95={p95:.1f}  p99={p99:.1f}  max={max(latencies or [0]):.1f}")
+    print(f"Throughput: {args.requests / load_seconds:.1f} req/s ({load_seconds:.2f} s)")
+    print(f"Errores HTTP: {errors} ({error_rate:.2%}) | Códigos: {dict(statuses)}")
+    print(f"Filas escritas: {rows['messages']} mensajes, {rows['classified_values']} valores clasificados")
+    print(f"Trabajos de clasificación: {job_statuses} | Dead letters: {dead_letters}")
+    print(f"Llamadas al modelo simulado: {fake_gemini.calls} | Cola drenada en {drain_seconds:.2f} s")
+    rules = rule_classifier.stats()
+    print(f"Clasificados por reglas: {rules['bypassed']} de {rules['evaluated']} ({rules['bypass_rate']:.1%})")
+    with app.app_context():
+        admission = webhooks.admission_controller.stats()
+    print(f"Control de admisión ({admission['mode']}): {admission['accepted']} aceptadas, "
+          f"{admission['deferred']} diferidas, {admission['rejected']} rechazadas")
+
+    report = {
+        "requests": args.requests, "p50_ms": p50, "p95_ms": p95, "p99_ms": p99,
+        "throughput_rps": args.requests / load_seconds, "error_rate": error_rate,
+        "rows": rows, "jobs": job_statuses, "dead_letters": dead_letters, "model_calls": fake_gemini.calls,
+        "admission": admission, "rules": rules
+    }
+    print(f"\nJSON: {json.dumps(report)}")
+
+    if tmp_dir:
+        with app.app_context():
+            db.engine.dispose()
+        tmp_dir.cleanup()
+
+    failed = (
+        (args.max_p99_ms is not None and p99 > args.max_p99_ms)
+        or (args.max_error_rate is not None and error_rate > args.max_error_rate)
+    )
+    if failed:
+        print("❌ La prueba de carga no cumple los umbrales")
+    # Sin esto, una cola que no avanza (por ejemplo, si todas las clasificaciones fallan) pasaría el control
+    if unfinished:
+        print(f"❌ La cola no se drenó en {args.drain_timeout:g} s: {unfinished} trabajos sin terminar")
+    if failed_jobs or dead_letters:
+        print(f"❌ Clasificaciones fallidas: {failed_jobs} trabajos, {dead_letters} dead letters")
+    if failed or unfinished or failed_jobs or dead_letters:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# backend/tests/test_admission_control.py
+import unittest
+import os
+import sys
+from unittest.mock import patch
+
+# Agregar el directorio padre al path de Python
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.models import Patient, Caregiver, Message, ClassificationJob
+from app.services.admission_control import AdmissionController
+from app.services.classification_service import ClassificationService
+from app.services.classification_worker import ClassificationWorker
+from app.api import webhooks
+
+class TestAdmissionControl(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app.config['WEBHOOK_BACKLOG_CHECK_INTERVAL'] = 0
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        patient = Patient(name="María García", age=78)
+        db.session.add(patient)
+        db.session.flush()
+        db.session.add(Caregiver(name="Ana Pérez", phone="+1234567890", patient_id=patient.id))
+        db.session.commit()
+        webhooks.message_deduplicator.clear()
+        webhooks.admission_controller.reset()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _post(self, sid):
+        return self.client.post('/api/webhook/whatsapp', data={
+            "MessageSid": sid,
+            "From": "whatsapp:+1234567890",
+            "Body": "Hoy durmió 6 horas"
+        })
+
+    def test_accepts_below_high_water(self):
+        response = self._post("SM001")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ClassificationJob.query.one().status, ClassificationJob.STATUS_PENDING)
+        self.assertEqual(webhooks.admission_controller.stats()["accepted"], 1)
+        self.assertEqual(webhooks.admission_controller.stats()["in_flight"], 0)
+
+    def test_persist_only_defers_classification(self):
+        self.app.config['WEBHOOK_ADMISSION_MODE'] = AdmissionController.MODE_PERSIST_ONLY
+        self._post("SM001")
+        self.app.config['WEBHOOK_BACKLOG_HIGH_WATER'] = 1
+
+        response = self._post("SM002")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("diferida", response.get_json()["message"])
+        job = ClassificationJob.query.join(Message).filter(Message.whatsapp_message_id == "SM002").one()
+        self.assertEqual(job.status, ClassificationJob.STATUS_DEFERRED)
+        self.assertEqual(webhooks.admission_controller.stats()["deferred"], 1)
+
+        # Los workers recuperan el mensaje diferido cuando la cola queda vacía
+        with patch('app.services.classification_service.GeminiService'):
+            classification_service = ClassificationService()
+        classification_service.gemini_service.classify_message.return_value = {"categorias": [], "resumen": ""}
+        ClassificationWorker(self.app, classification_service=classification_service).drain()
+        db.session.expire_all()
+        self.assertEqual(ClassificationJob.query.filter_by(status=ClassificationJob.STATUS_DONE).count(), 2)
+
+    def test_reject_mode_returns_503_with_retry_after(self):
+        self.app.config['WEBHOOK_ADMISSION_MODE'] = AdmissionController.MODE_REJECT
+        self.app.config['WEBHOOK_BACKLOG_HIGH_WATER'] = 0
+        self.app.config['WEBHOOK_RETRY_AFTER'] = 15
+
+        response = self._post("SM001")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "15")
+        self.assertEqual(Message.query.count(), 0)
+
+        stats = self.client.get('/api/webhook/stats').get_json()["data"]
+        self.assertEqual(stats["rejected"], 1)
+        self.assertEqual(stats["shed"], 1)
+        self.assertEqual(stats["in_flight"], 0)
+
+    def test_in_flight_limit(self):
+        self.app.config['WEBHOOK_MAX_IN_FLIGHT'] = 1
+        controller = AdmissionController(webhooks.classification_queue)
+        with controller.admission() as first:
+            with controller.admission() as second:
+                self.assertEqual(first, AdmissionController.ACCEPT)
+                self.assertEqual(second, AdmissionController.DEFER)
+        self.assertEqual(controller.stats()["in_flight"], 0)
+
+        self.app.config['WEBHOOK_ADMISSION_MODE'] = AdmissionController.MODE_OFF
+        with controller.admission() as first:
+            with controller.admission() as second:
+                self.assertEqual(second, AdmissionController.ACCEPT)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+# backend/tests/test_async_gemini_service.py
+import json
+import time
+import asyncio
+import unittest
+import os
+import sys
+from unittest.mock import patch, MagicMock
+
+# Agregar el directorio padre al path de Python
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.async_gemini_service import AsyncGeminiService
+from app.services.classification_cache import ClassificationCache
+from app.services.gemini_service import ModelRegistry, PRIMARY_MODEL, FALLBACK_MODELS
+from app.services.model_health import ModelHealth
+from app.utils.rate_limit import QuotaLimiter, TokenBucket
+
+def fake_response(data):
+    response = MagicMock()
+    response.text = json.dumps(data, ensure_ascii=False)
+    return response
+
+RESULT = {"categorias": [], "resumen": "Sin novedades"}
+
+class TestAsyncGeminiService(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        env = patch.dict(os.environ, {"GOOGLE_API_KEY": "test-key"})
+        env.start()
+        self.addCleanup(env.stop)
+        genai_patch = patch('app.services.gemini_service.genai')
+        self.genai = genai_patch.start()
+        self.addCleanup(genai_patch.stop)
+
+        self.models = {}
+        self.genai.GenerativeModel.side_effect = lambda name, **kwargs: self.models.setdefault(name, MagicMock())
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._model(PRIMARY_MODEL).generate_content_async = self._slow_generate
+        self.health = ModelHealth(ttl=60, failure_threshold=1)
+
+    def _model(self, name):
+        return self.genai.GenerativeModel(name)
+
+    def _service(self, concurrency=4, quota=None):
+        return AsyncGeminiService(
+            concurrency=concurrency,
+            quota=quota or QuotaLimiter(requests_per_minute=60000, tokens_per_minute=10 ** 9),
+            health=self.health,
+            registry=ModelRegistry(),
+            cache=ClassificationCache(use_db=False)
+        )
+
+    async def _slow_generate(self, prompt, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return fake_response(RESULT)
+
+    async def test_concurrency_is_limited_by_semaphore(self):
+        service = self._service(concurrency=4)
+
+        results = await asyncio.gather(*(service.classify_message(f"Mensaje {i}") for i in range(20)))
+
+        self.assertTrue(all(result["resumen"] == "Sin novedades" for result in results))
+        self.assertEqual(self.max_in_flight, 4)
+
+    async def test_requests_wait_for_quota(self):
+        # 600 RPM con ráfaga de una petición: una cada 0.1 s
+        quota = QuotaLimiter(requests_per_minute=600, tokens_per_minute=10 ** 9, burst_seconds=0.1)
+        service = self._service(concurrency=10, quota=quota)
+
+        start = time.monotonic()
+        await asyncio.gather(*(service.classify_message(f"Mensaje {i}") for i in range(3)))
+
+        self.assertGreaterEqual(time.monotonic() - start, 0.18)
+
+    async def test_falls_back_when_primary_fails(self):
+        async def unavailable(prompt, **kwargs):
+            raise RuntimeError("503 Service Unavailable")
+
+        async def fallback(prompt, **kwargs):
+            return fake_response(RESULT)
+
+        self._model(PRIMARY_MODEL).generate_content_async = unavailable
+        self._model(FALLBACK_MODELS[0]).generate_content_async = fallback
+        service = self._service()
+
+        result = await service.classify_message("Hoy comió bien")
+
+        self.assertEqual(result["resumen"], "Sin novedades")
+        self.assertFalse(self.health.is_available(PRIMARY_MODEL))
+
+    async def test_batch_results_keep_input_order(self):
+        async def batch(prompt, **kwargs):
+            return fake_response({"resultados": [
+                {"id": "m2", "categorias": [], "resumen": "Segundo"},
+                {"id": "m1", "categorias": [], "resumen": "Primero"}
+            ]})
+
+        self._model(PRIMARY_MODEL).generate_content_async = batch
+        service = self._service()
+
+        results = await service.classify_messages(["Uno", "Dos"])
+
+        self.assertEqual([result["resumen"] for result in results], ["Primero", "Segundo"])
+
+class TestTokenBucketDebit(unittest.TestCase):
+    def test_debit_delays_next_acquire(self):
+        bucket = TokenBucket(rate=1, capacity=10)
+        bucket.debit(15)
+        self.assertFalse(bucket.try_acquire())
+
+if __name__ == '__main__':
+    unittest.main()
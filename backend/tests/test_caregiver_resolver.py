@@ -0,0 +1,84 @@
+# backend/tests/test_caregiver_resolver.py
+import unittest
+import os
+import sys
+from unittest.mock import patch
+
+# Agregar el directorio padre al path de Python
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.models import Patient, Caregiver
+from app.services.caregiver_resolver import CaregiverResolver, CaregiverIdentity, caregiver_resolver
+from app.utils.formatters import normalize_phone, phone_variants
+
+class TestPhoneNormalization(unittest.TestCase):
+    def test_strips_whatsapp_prefix_and_separators(self):
+        self.assertEqual(normalize_phone("whatsapp:+54 9 381 512-2808"), "+5493815122808")
+
+    def test_adds_argentine_mobile_nine(self):
+        self.assertEqual(normalize_phone("+543815122808"), "+5493815122808")
+        self.assertEqual(normalize_phone("5493815122808"), "+5493815122808")
+
+    def test_variants_include_legacy_argentine_format(self):
+        self.assertEqual(phone_variants("+5493815122808"), ["+5493815122808", "+543815122808"])
+        self.assertEqual(phone_variants("+1234567890"), ["+1234567890"])
+
+class TestCaregiverResolver(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        patient = Patient(name="María García", age=78)
+        db.session.add(patient)
+        db.session.flush()
+        # Guardado sin el 9, como en registros antiguos
+        self.caregiver = Caregiver(name="Ana Pérez", phone="+541112345678", patient_id=patient.id)
+        db.session.add(self.caregiver)
+        db.session.commit()
+        self.patient_id = patient.id
+        self.resolver = CaregiverResolver()
+        caregiver_resolver.clear()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_resolves_whatsapp_sender_and_caches(self):
+        with patch.object(Caregiver, 'get_by_phone', wraps=Caregiver.get_by_phone) as lookup:
+            first = self.resolver.resolve("whatsapp:+5491112345678")
+            second = self.resolver.resolve("+54 9 11 1234-5678")
+
+        self.assertEqual(first, CaregiverIdentity(self.caregiver.id, self.patient_id))
+        self.assertEqual(second, first)
+        self.assertEqual(lookup.call_count, 1)
+
+    def test_unknown_sender_is_negatively_cached(self):
+        with patch.object(Caregiver, 'get_by_phone', wraps=Caregiver.get_by_phone) as lookup:
+            self.assertIsNone(self.resolver.resolve("+15550000000"))
+            self.assertIsNone(self.resolver.resolve("whatsapp:+15550000000"))
+
+        self.assertEqual(lookup.call_count, 1)
+
+    def test_new_caregiver_invalidates_negative_entry(self):
+        self.assertIsNone(caregiver_resolver.resolve("+15550000000"))
+
+        caregiver = Caregiver(name="Juan", phone="+15550000000", patient_id=self.patient_id)
+        db.session.add(caregiver)
+        db.session.commit()
+
+        self.assertEqual(caregiver_resolver.resolve("+15550000000").caregiver_id, caregiver.id)
+
+    def test_phone_change_invalidates_old_number(self):
+        self.assertIsNotNone(caregiver_resolver.resolve("+5491112345678"))
+
+        self.caregiver.phone = "+15551112222"
+        db.session.commit()
+
+        self.assertIsNone(caregiver_resolver.resolve("+5491112345678"))
+        self.assertIsNotNone(caregiver_resolver.resolve("+15551112222"))
+
+if __name__ == '__main__':
+    unittest.main()
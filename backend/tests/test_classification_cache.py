@@ -0,0 +1,157 @@
+# backend/tests/test_classification_cache.py
+import json
+import unittest
+import os
+import sys
+from unittest.mock import patch, MagicMock
+
+# Agregar el directorio padre al path de Python
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.models import ClassificationCacheEntry, Category, Subcategory, Patient
+from app.services.classification_cache import ClassificationCache, normalize_message
+from app.services.classification_prompt import ClassificationPrompt
+from app.services.gemini_service import GeminiService, ModelRegistry, PRIMARY_MODEL, FALLBACK_MODELS
+from app.services.model_health import ModelHealth
+
+def fake_response(data):
+    response = MagicMock()
+    response.text = json.dumps(data, ensure_ascii=False)
+    return response
+
+def single_result(valor):
+    return {
+        "categorias": [{
+            "nombre": "Medicación",
+            "detectada": True,
+            "subcategorias": [{"nombre": "Adherencia", "detectada": True, "valor": valor, "confianza": 0.9}]
+        }],
+        "resumen": valor
+    }
+
+class TestClassificationCache(unittest.TestCase):
+    def setUp(self):
+        env = patch.dict(os.environ, {"GOOGLE_API_KEY": "test-key"})
+        env.start()
+        self.addCleanup(env.stop)
+        genai_patch = patch('app.services.gemini_service.genai')
+        self.genai = genai_patch.start()
+        self.addCleanup(genai_patch.stop)
+        self.model = self.genai.GenerativeModel.return_value
+
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _service(self, cache=None):
+        return GeminiService(health=ModelHealth(), registry=ModelRegistry(), cache=cache or ClassificationCache(),
+                             prompts=ClassificationPrompt(ttl=0))
+
+    def test_normalization(self):
+        self.assertEqual(normalize_message("  Tomó la MEDICACIÓN   de la mañana 💊👍🏽 "),
+                         "tomo la medicacion de la manana")
+        self.assertEqual(normalize_message("Durmió bien 😴"), normalize_message("durmio\tbien"))
+
+    def test_repeated_message_skips_model(self):
+        self.model.generate_content.return_value = fake_response(single_result("tomó la medicación"))
+        service = self._service()
+
+        first = service.classify_message("Tomó la medicación de la mañana")
+        second = service.classify_message("tomo la medicacion de la mañana 💊")
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.model.generate_content.call_count, 1)
+        self.assertEqual(service.cache.stats()["memory_hits"], 1)
+
+    def test_fallback_answer_is_not_served_as_primary(self):
+        answer = fake_response(single_result("tomó la medicación"))
+        self.model.generate_content.side_effect = [RuntimeError("503 Service Unavailable"), answer, answer]
+        service = self._service()
+
+        service.classify_message("Tomó la medicación de la mañana")
+
+        version = service.prompt_version()
+        self.assertIsNone(service.cache.get("Tomó la medicación de la mañana", version, PRIMARY_MODEL))
+        self.assertIsNotNone(service.cache.get("Tomó la medicación de la mañana", version, FALLBACK_MODELS[0]))
+        service.classify_message("Tomó la medicación de la mañana")
+        self.assertEqual(self.model.generate_content.call_count, 3)
+
+    def test_db_tier_is_shared_between_processes(self):
+        self.model.generate_content.return_value = fake_response(single_result("tomó la medicación"))
+        self._service().classify_message("Tomó la medicación de la mañana")
+
+        # Otro proceso: memoria vacía, misma tabla
+        service = self._service()
+        result = service.classify_message("Tomó la medicación de la mañana")
+
+        self.assertEqual(result["resumen"], "tomó la medicación")
+        self.assertEqual(self.model.generate_content.call_count, 1)
+        self.assertEqual(service.cache.stats()["db_hits"], 1)
+        self.assertEqual(ClassificationCacheEntry.query.one().hits, 0)  # Acumulado en memoria
+        service.cache.flush_hits()
+        self.assertEqual(ClassificationCacheEntry.query.one().hits, 1)
+
+    def test_cache_does_not_commit_the_callers_transaction(self):
+        cache = ClassificationCache(hit_flush_every=1)
+        cache.set("Durmió bien", "v1", "modelo", single_result("durmió bien"))
+        db.session.commit()
+        db.session.add(Patient(name="Sin confirmar", age=80))
+
+        cache.set("Comió poco", "v1", "modelo", single_result("comió poco"))
+        ClassificationCache(hit_flush_every=1).get("Durmió bien", "v1", "modelo")  # Otro proceso
+        db.session.rollback()
+
+        self.assertIsNone(Patient.query.filter_by(name="Sin confirmar").first())
+        self.assertEqual(ClassificationCacheEntry.query.count(), 1)
+
+    def test_batch_sends_only_misses(self):
+        service = self._service()
+        self.model.generate_content.return_value = fake_response(single_result("durmió bien"))
+        service.classify_message("Durmió bien")
+        self.model.generate_content.return_value = fake_response({
+            "resultados": [{"id": "m1", **single_result("comió poco")}, {"id": "m2", **single_result("caminó")}]
+        })
+
+        results = service.classify_messages(["Comió poco", "durmio bien", "Caminó"])
+
+        self.assertEqual([result["resumen"] for result in results], ["comió poco", "durmió bien", "caminó"])
+        self.assertEqual(self.model.generate_content.call_count, 2)
+        self.assertNotIn("durmio bien", self.model.generate_content.call_args[0][0])
+
+    def test_prompt_change_invalidates(self):
+        self.model.generate_content.return_value = fake_response(single_result("durmió bien"))
+        service = self._service()
+        service.classify_message("Durmió bien")
+
+        category = Category(name="Actividades", display_order=6)
+        db.session.add(category)
+        db.session.flush()
+        db.session.add(Subcategory(name="Paseos", category_id=category.id, display_order=1))
+        db.session.commit()
+        service.classify_message("Durmió bien")
+
+        self.assertEqual(self.model.generate_content.call_count, 2)
+        self.assertEqual(ClassificationCacheEntry.query.count(), 2)
+
+    def test_errors_are_not_cached_and_lru_is_bounded(self):
+        self.model.generate_content.side_effect = RuntimeError("503 Service Unavailable")
+        cache = ClassificationCache(max_size=2, use_db=False)
+        service = self._service(cache)
+        self.assertIn("error", service.classify_message("Durmió bien"))
+        self.assertEqual(cache.stats()["stores"], 0)
+
+        for text in ["uno", "dos", "tres"]:
+            cache.set(text, "v1", "modelo", single_result(text))
+        self.assertEqual(cache.stats()["size"], 2)
+        self.assertIsNone(cache.get("uno", "v1", "modelo"))
+        self.assertIsNotNone(cache.get("tres", "v1", "modelo"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+# backend/tests/test_classification_prompt.py
+import json
+import unittest
+import os
+import sys
+from unittest.mock import patch, MagicMock
+
+# Agregar el directorio padre al path de Python
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.models import Category, Subcategory
+from app.services.classification_cache import ClassificationCache
+from app.services.classification_prompt import ClassificationPrompt
+from app.services.gemini_service import GeminiService, ModelRegistry, TokenUsage, PRIMARY_MODEL
+from app.services.model_health import ModelHealth
+from app.utils.db_init import create_default_taxonomy
+
+class TestClassificationPrompt(unittest.TestCase):
+    def setUp(self):
+        env = patch.dict(os.environ, {"GOOGLE_API_KEY": "test-key"})
+        env.start()
+        self.addCleanup(env.stop)
+        genai_patch = patch('app.services.gemini_service.genai')
+        self.genai = genai_patch.start()
+        self.addCleanup(genai_patch.stop)
+        self.model = self.genai.GenerativeModel.return_value
+
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        create_default_taxonomy(db)
+
+        self.prompts = ClassificationPrompt(ttl=60)
+        self.usage = TokenUsage()
+        self.service = GeminiService(
+            health=ModelHealth(), registry=ModelRegistry(), cache=ClassificationCache(max_size=0),
+            prompts=self.prompts, usage=self.usage
+        )
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_prompt_is_built_from_active_taxonomy(self):
+        Subcategory.query.filter_by(name="Orientación").one().active = False
+        db.session.commit()
+
+        prompt = self.service._create_classification_prompt("Hoy caminó 100 pasos")
+
+        self.assertIn("- Salud Física: Movilidad (pasos, distancia); Alimentación (comidas, apetito)", prompt)
+        self.assertIn("- Salud Cognitiva: Memoria (olvidos, reconocimiento); Comunicación", prompt)
+        self.assertNotIn("Orientación", prompt)
+        self.assertTrue(prompt.endswith('"Hoy caminó 100 pasos"'))
+        self.assertNotIn('"detectada"', prompt)
+
+    def test_template_is_reused_until_invalidated(self):
+        compiled = self.prompts.compiled()
+        Category.query.filter_by(name="Gastos").one().active = False
+        db.session.commit()
+
+        self.assertIs(self.prompts.compiled(), compiled)
+
+        self.prompts.invalidate()
+        self.assertIsNot(self.prompts.compiled(), compiled)
+        self.assertNotIn("Gastos", self.prompts.compiled().single("hola"))
+        self.assertNotEqual(self.prompts.compiled().version, compiled.version)
+
+    def test_sparse_response_is_marked_detected(self):
+        response = MagicMock()
+        response.text = json.dumps({
+            "categorias": [{"nombre": "Salud Física", "subcategorias": [
+                {"nombre": "Sueño", "valor": "durmió 6 horas", "confianza": 0.9}
+            ]}],
+            "resumen": "Descansó"
+        })
+        self.model.generate_content.return_value = response
+
+        result = self.service.classify_message("Durmió 6 horas")
+
+        self.assertTrue(result["categorias"][0]["detectada"])
+        self.assertTrue(result["categorias"][0]["subcategorias"][0]["detectada"])
+
+    def test_token_usage_is_recorded(self):
+        response = MagicMock()
+        response.text = json.dumps({"categorias": [], "resumen": "Sin novedades"})
+        response.usage_metadata.prompt_token_count = 180
+        response.usage_metadata.candidates_token_count = 12
+        self.model.generate_content.return_value = response
+        self.service.classify_message("Hoy todo bien")
+
+        # Sin usage_metadata (versiones anteriores del SDK) se estima por caracteres
+        del response.usage_metadata
+        self.service.classify_message("Hoy todo tranquilo")
+
+        stats = self.usage.stats()[PRIMARY_MODEL]
+        self.assertEqual(stats["calls"], 2)
+        self.assertEqual(stats["estimated_calls"], 1)
+        prompt = self.service._create_classification_prompt("Hoy todo tranquilo")
+        self.assertEqual(stats["prompt_tokens"], 180 + -(-len(prompt) // 4))
+
+if __name__ == '__main__':
+    unittest.main()
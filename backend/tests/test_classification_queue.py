@@ -0,0 +1,232 @@
+# backend/tests/test_classification_queue.py
+import unittest
+import os
+import sys
+from datetime import datetime, timedelta
+from unittest.mock import patch, ANY
+
+# Agregar el directorio padre al path de Python
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.models import Patient, Caregiver, Message, Category, Subcategory, ClassifiedValue, ClassificationJob
+from app.services.classification_service import ClassificationService
+from app.services.classification_worker import ClassificationWorker
+from app.api import webhooks
+
+CLASSIFICATION_RESULT = {
+    "categorias": [
+        {
+            "nombre": "Salud Física",
+            "detectada": True,
+            "subcategorias": [
+                {"nombre": "Sueño", "detectada": True, "valor": "durmió 6 horas", "confianza": 0.9}
+            ]
+        }
+    ],
+    "resumen": "Descansó bien"
+}
+
+class TestClassificationQueue(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self._create_test_data()
+        webhooks.message_deduplicator.clear()
+
+        with patch('app.services.classification_service.GeminiService'):
+            # Sin reglas: estas pruebas verifican la cola, todos los mensajes van al modelo
+            self.classification_service = ClassificationService(use_rules=False)
+        self.gemini = self.classification_service.gemini_service
+        self.gemini.classify_message.return_value = CLASSIFICATION_RESULT
+        self.worker = ClassificationWorker(self.app, classification_service=self.classification_service)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _create_test_data(self):
+        patient = Patient(name="María García", age=78)
+        db.session.add(patient)
+        db.session.flush()
+        db.session.add(Caregiver(name="Ana Pérez", phone="+1234567890", patient_id=patient.id))
+        db.session.add(Caregiver(name="Luis Gómez", phone="+1234567891", patient_id=patient.id))
+        category = Category(name="Salud Física", display_order=1)
+        db.session.add(category)
+        db.session.flush()
+        db.session.add(Subcategory(name="Sueño", category_id=category.id, display_order=1))
+        db.session.commit()
+
+    def _post_message(self, sid="SM001", body="Hoy durmió 6 horas", sender="+1234567890"):
+        return self.client.post('/api/webhook/whatsapp', data={
+            "MessageSid": sid,
+            "From": f"whatsapp:{sender}",
+            "Body": body
+        }, headers={"User-Agent": "TwilioProxy/1.1"})
+
+    def test_webhook_enqueues_without_classifying(self):
+        response = self._post_message()
+
+        self.assertEqual(response.status_code, 200)
+        message = Message.query.filter_by(whatsapp_message_id="SM001").one()
+        job = ClassificationJob.query.filter_by(message_id=message.id).one()
+        self.assertEqual(job.status, ClassificationJob.STATUS_PENDING)
+        self.gemini.classify_message.assert_not_called()
+
+    def test_worker_drains_queue_and_saves_values(self):
+        self._post_message()
+
+        processed = self.worker.drain()
+
+        self.assertEqual(processed, 1)
+        job = ClassificationJob.query.one()
+        self.assertEqual(job.status, ClassificationJob.STATUS_DONE)
+        self.assertEqual(job.attempts, 1)
+        values = ClassifiedValue.query.all()
+        self.assertEqual([v.value for v in values], ["durmió 6 horas"])
+
+    def test_worker_classifies_claimed_batch_in_one_call(self):
+        self._post_message("SM001", "Hoy durmió 6 horas")
+        self._post_message("SM002", "Anoche durmió 6 horas")
+        self.gemini.classify_messages.return_value = [CLASSIFICATION_RESULT, CLASSIFICATION_RESULT]
+        worker = ClassificationWorker(self.app, batch_size=2, classification_service=self.classification_service)
+
+        processed = worker.drain()
+
+        self.assertEqual(processed, 2)
+        self.gemini.classify_messages.assert_called_once_with(["Hoy durmió 6 horas", "Anoche durmió 6 horas"], deadline=ANY)
+        self.assertEqual(ClassifiedValue.query.count(), 2)
+
+    def test_failed_job_is_retried_with_backoff(self):
+        self._post_message()
+        self.gemini.classify_message.return_value = {"categorias": [], "error": "quota"}
+
+        self.worker.drain()
+
+        job = ClassificationJob.query.one()
+        self.assertEqual(job.status, ClassificationJob.STATUS_PENDING)
+        self.assertEqual(job.last_error, "quota")
+        self.assertGreater(job.next_attempt_at, datetime.utcnow())
+        self.assertEqual(ClassifiedValue.query.count(), 0)
+
+    def test_job_fails_after_max_attempts(self):
+        self._post_message()
+        self.gemini.classify_message.side_effect = RuntimeError("sin conexión")
+        job = ClassificationJob.query.one()
+        job.max_attempts = 2
+        db.session.commit()
+
+        for _ in range(2):
+            job.next_attempt_at = datetime.utcnow()
+            db.session.commit()
+            self.worker.drain()
+
+        job = ClassificationJob.query.one()
+        self.assertEqual(job.status, ClassificationJob.STATUS_FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_claim_keeps_caregiver_order(self):
+        self._post_message("SM001", "La presión 120/80")
+        self._post_message("SM002", "La presión 140/90")
+        self._post_message("SM003", "Hoy durmió 6 horas", sender="+1234567891")
+        queue = self.worker.queue
+
+        first = queue.claim("worker-a", limit=1)
+        # El segundo mensaje de Ana espera al primero; el de Luis se procesa en paralelo
+        second = queue.claim("worker-b", limit=10)
+
+        self.assertEqual([job.message.whatsapp_message_id for job in first], ["SM001"])
+        self.assertEqual([job.message.whatsapp_message_id for job in second], ["SM003"])
+
+        queue.complete(first[0])
+        third = queue.claim("worker-b", limit=10)
+        self.assertEqual([job.message.whatsapp_message_id for job in third], ["SM002"])
+
+    def test_unclaimed_earlier_job_blocks_its_successor(self):
+        self._post_message("SM001", "La presión 120/80")
+        self._post_message("SM002", "La presión 140/90")
+        queue = self.worker.queue
+        now = datetime.utcnow()
+
+        # Al reclamar, un anterior pendiente y sin bloqueo (locked_by NULL) sigue bloqueando
+        claimable = ClassificationJob.query.filter(queue._claimable_filter(now, "worker-a")).all()
+
+        self.assertEqual([job.message.whatsapp_message_id for job in claimable], ["SM001"])
+
+    def test_batch_claims_consecutive_messages_of_a_caregiver(self):
+        self._post_message("SM001", "La presión 120/80")
+        self._post_message("SM002", "La presión 140/90")
+
+        jobs = self.worker.queue.claim("worker-a", limit=10)
+
+        self.assertEqual([job.message.whatsapp_message_id for job in jobs], ["SM001", "SM002"])
+
+    def test_failure_holds_back_later_messages_of_the_caregiver(self):
+        self._post_message("SM001", "La presión 120/80")
+        self._post_message("SM002", "La presión 140/90")
+        self.gemini.classify_messages.return_value = [{"categorias": [], "error": "quota"}, CLASSIFICATION_RESULT]
+        worker = ClassificationWorker(self.app, batch_size=2, classification_service=self.classification_service)
+
+        worker.drain()
+
+        first, second = ClassificationJob.query.order_by(ClassificationJob.id).all()
+        self.assertEqual(first.status, ClassificationJob.STATUS_PENDING)
+        self.assertEqual(first.attempts, 1)
+        self.assertEqual(second.status, ClassificationJob.STATUS_PENDING)
+        self.assertEqual(second.attempts, 0)
+        self.assertEqual(ClassifiedValue.query.count(), 0)
+
+        second.next_attempt_at = datetime.utcnow()
+        db.session.commit()
+        self.assertEqual(worker.queue.claim("worker-b", limit=10), [])
+
+    def test_burst_of_messages_is_classified_in_one_call(self):
+        self.app.config['CLASSIFICATION_COALESCE_WINDOW'] = 20
+        worker = ClassificationWorker(self.app, classification_service=self.classification_service)
+        bodies = ["Hola", "Hoy durmió 6 horas", "La presión 130/85"]
+        for index, body in enumerate(bodies):
+            self._post_message(f"SM00{index}", body)
+
+        # Mientras la ventana sigue abierta no se clasifica nada
+        self.assertEqual(worker.drain(), 0)
+        jobs = ClassificationJob.query.order_by(ClassificationJob.id).all()
+        self.assertEqual(len({job.next_attempt_at for job in jobs}), 1)
+
+        for job in jobs:
+            job.next_attempt_at = datetime.utcnow()
+        db.session.commit()
+        self.gemini.classify_messages.return_value = [
+            {"categorias": [], "resumen": ""}, CLASSIFICATION_RESULT, CLASSIFICATION_RESULT
+        ]
+
+        self.assertEqual(worker.drain(), 3)
+        self.gemini.classify_messages.assert_called_once_with(bodies, deadline=ANY)
+        self.gemini.classify_message.assert_not_called()
+        # Cada valor queda asociado a su mensaje de origen
+        messages = {m.whatsapp_message_id: m.id for m in Message.query.all()}
+        self.assertEqual(
+            sorted(value.message_id for value in ClassifiedValue.query.all()),
+            [messages["SM001"], messages["SM002"]]
+        )
+
+    def test_burst_window_does_not_exceed_max_wait(self):
+        self.app.config['CLASSIFICATION_COALESCE_WINDOW'] = 20
+        self.app.config['CLASSIFICATION_COALESCE_MAX_WAIT'] = 60
+        self._post_message("SM001", "Hola")
+        first = ClassificationJob.query.one()
+        first.created_at = datetime.utcnow() - timedelta(seconds=50)
+        db.session.commit()
+        ready_at = first.next_attempt_at
+
+        self._post_message("SM002", "Hoy durmió 6 horas")
+
+        db.session.expire_all()
+        first = ClassificationJob.query.filter_by(id=first.id).one()
+        self.assertEqual(first.next_attempt_at, ready_at)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+# backend/tests/test_dead_letters.py
+import unittest
+import os
+import sys
+import time
+from unittest.mock import patch
+
+# Agregar el directorio padre al path de Python
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.models import Patient, Caregiver, Message, Category, Subcategory, ClassifiedValue, ClassificationJob, DeadLetter
+from app.services.classification_service import ClassificationService
+from app.services.classification_worker import ClassificationWorker
+from app.services.dead_letter_replay import DeadLetterReplayer
+from app.utils.rate_limit import TokenBucket
+
+CLASSIFICATION_RESULT = {
+    "categorias": [
+        {
+            "nombre": "Salud Física",
+            "detectada": True,
+            "subcategorias": [
+                {"nombre": "Sueño", "detectada": True, "valor": "durmió 6 horas", "confianza": 0.9}
+            ]
+        }
+    ],
+    "resumen": "Descansó bien"
+}
+
+MODEL_ERROR = {
+    "categorias": [],
+    "resumen": "Error en clasificación",
+    "error": "503 Service Unavailable",
+    "modelos": ["models/gemini-2.0-flash-lite", "models/gemini-2.0-flash"]
+}
+
+class TestDeadLetters(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app.config['CLASSIFICATION_MAX_ATTEMPTS'] = 1
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        patient = Patient(name="María García", age=78)
+        db.session.add(patient)
+        db.session.flush()
+        caregiver = Caregiver(name="Ana Pérez", phone="+1234567890", patient_id=patient.id)
+        category = Category(name="Salud Física", display_order=1)
+        db.session.add_all([caregiver, category])
+        db.session.flush()
+        db.session.add(Subcategory(name="Sueño", category_id=category.id, display_order=1))
+        self.message = Message(content="Hoy durmió 6 horas", caregiver_id=caregiver.id, patient_id=patient.id)
+        db.session.add(self.message)
+        db.session.commit()
+
+        with patch('app.services.classification_service.GeminiService'):
+            self.classification_service = ClassificationService()
+        self.gemini = self.classification_service.gemini_service
+        self.worker = ClassificationWorker(self.app, classification_service=self.classification_service)
+        self.worker.queue.enqueue(self.message)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _exhaust_job(self):
+        self.gemini.classify_message.return_value = MODEL_ERROR
+        self.worker.drain()
+        return DeadLetter.query.one()
+
+    def test_exhausted_job_is_dead_lettered(self):
+        dead_letter = self._exhaust_job()
+
+        self.assertEqual(dead_letter.status, DeadLetter.STATUS_OPEN)
+        self.assertEqual(dead_letter.message_id, self.message.id)
+        self.assertEqual(dead_letter.error, "503 Service Unavailable")
+        self.assertEqual(dead_letter.attempts, 1)
+        self.assertEqual(dead_letter.model_name, "models/gemini-2.0-flash-lite, models/gemini-2.0-flash")
+        self.assertEqual(dead_letter.job.status, ClassificationJob.STATUS_FAILED)
+
+    def test_replay_resolves_dead_letter(self):
+        dead_letter = self._exhaust_job()
+        self.gemini.classify_message.return_value = CLASSIFICATION_RESULT
+        replayer = DeadLetterReplayer(self.app, concurrency=1, rate=100,
+                                      classification_service=self.classification_service)
+        progress = []
+
+        summary = replayer.replay([dead_letter.id], on_progress=lambda *args: progress.append(args))
+
+        self.assertEqual(summary, {"resolved": 1, "failed": 0})
+        self.assertEqual(progress, [(dead_letter.id, True)])
+        db.session.expire_all()
+        dead_letter = DeadLetter.query.one()
+        self.assertEqual(dead_letter.status, DeadLetter.STATUS_RESOLVED)
+        self.assertIsNotNone(dead_letter.resolved_at)
+        self.assertEqual(dead_letter.job.status, ClassificationJob.STATUS_DONE)
+        self.assertEqual(ClassifiedValue.query.count(), 1)
+
+    def test_replay_failure_keeps_dead_letter_open(self):
+        dead_letter = self._exhaust_job()
+        replayer = DeadLetterReplayer(self.app, concurrency=1, rate=100,
+                                      classification_service=self.classification_service)
+
+        summary = replayer.replay([dead_letter.id])
+
+        self.assertEqual(summary, {"resolved": 0, "failed": 1})
+        db.session.expire_all()
+        dead_letter = DeadLetter.query.one()
+        self.assertEqual(dead_letter.status, DeadLetter.STATUS_OPEN)
+        self.assertEqual(dead_letter.replay_attempts, 1)
+        self.assertEqual(DeadLetter.get_open(), [dead_letter])
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=50, capacity=2)
+        self.assertTrue(bucket.try_acquire())
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+
+        start = time.monotonic()
+        self.assertTrue(bucket.acquire())
+        self.assertGreaterEqual(time.monotonic() - start, 0.01)
+
+    def test_acquire_times_out(self):
+        bucket = TokenBucket(rate=1, capacity=1)
+        bucket.acquire()
+        self.assertFalse(bucket.acquire(timeout=0.01))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+# backend/tests/test_fake_gemini_backend.py
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+
+# Agregar el directorio padre al path de Python
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.classification_cache import ClassificationCache
+from app.services.classification_prompt import ClassificationPrompt
+from app.services.fake_gemini_backend import FakeGeminiBackend, RecordingBackend, parse_latency
+from app.services.gemini_service import GeminiService, ParseStats, PRIMARY_MODEL
+from app.services.model_health import ModelHealth
+from app.utils.db_init import DEFAULT_TAXONOMY
+
+SUBCATEGORIES = {
+    category: {name for name, _ in subcategories} for category, subcategories in DEFAULT_TAXONOMY
+}
+
+class TestFakeGeminiBackend(unittest.TestCase):
+    def setUp(self):
+        # Sin clave de API: el backend simulado no la necesita
+        env = patch.dict(os.environ, {}, clear=False)
+        env.start()
+        self.addCleanup(env.stop)
+        os.environ.pop("GOOGLE_API_KEY", None)
+        self.health = ModelHealth(ttl=60)
+        self.parsing = ParseStats()
+
+    def _service(self, **backend_options):
+        self.backend = FakeGeminiBackend(seed=7, prompts=ClassificationPrompt(), **backend_options)
+        return GeminiService(registry=self.backend, health=self.health, parsing=self.parsing,
+                             cache=ClassificationCache(use_db=False))
+
+    def assertValidResult(self, result):
+        self.assertNotIn("error", result)
+        for category in result["categorias"]:
+            self.assertIn(category["nombre"], SUBCATEGORIES)
+            for subcategory in category["subcategorias"]:
+                self.assertIn(subcategory["nombre"], SUBCATEGORIES[category["nombre"]])
+
+    def test_results_follow_taxonomy(self):
+        service = self._service()
+        texts = [f"Mensaje de prueba {i}" for i in range(20)]
+
+        for text in texts[:5]:
+            self.assertValidResult(service.classify_message(text))
+        for result in service.classify_messages(texts[5:]):
+            self.assertValidResult(result)
+        self.assertEqual(self.backend.stats()["calls"], 7)
+
+    def test_content_is_deterministic(self):
+        first = self._service().classify_message("Hoy durmió 6 horas")
+        second = self._service().classify_message("Hoy durmió 6 horas")
+        self.assertEqual(first, second)
+
+    def test_error_injection(self):
+        service = self._service(error_rate=1.0)
+
+        result = service.classify_message("Hoy comió bien")
+
+        self.assertIn("error", result)
+        self.assertEqual(self.health.stats()[PRIMARY_MODEL]["failures"], 1)
+        self.assertEqual(self.backend.stats()["errors"], len(result["modelos"]))
+
+    def test_malformed_output_is_parsed_or_reported(self):
+        service = self._service(malformed_rate=1.0)
+
+        for i in range(40):
+            service.classify_message(f"Mensaje {i}")
+
+        stats = self.parsing.stats()
+        self.assertGreater(stats["repaired"], 0)
+        self.assertGreater(stats["failed"], 0)
+
+    def test_latency_distribution(self):
+        service = self._service(latency=0.05)
+        start = time.monotonic()
+        service.classify_message("Hoy comió bien")
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+        rng = random.Random(1)
+        self.assertEqual(parse_latency("constant:50")(rng), 0.05)
+        self.assertTrue(0.1 <= parse_latency("uniform:100:500")(rng) <= 0.5)
+        self.assertGreater(parse_latency("lognormal:300:0.4")(rng), 0)
+        with self.assertRaises(ValueError):
+            parse_latency("normal:300")
+
+    def test_record_and_replay(self):
+        real = MagicMock(requires_api_key=False)
+        real.get.return_value.generate_content.return_value.text = json.dumps(
+            {"categorias": [], "resumen": "Respuesta real"}
+        )
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "respuestas.jsonl")
+            prompts = ClassificationPrompt()
+            recorder = RecordingBackend(real, path)
+            GeminiService(registry=recorder, prompts=prompts, health=self.health,
+                          cache=ClassificationCache(use_db=False)).classify_message("Hoy comió bien")
+
+            replay = FakeGeminiBackend(replay_path=path, prompts=prompts)
+            result = GeminiService(registry=replay, prompts=prompts, health=ModelHealth(),
+                                   cache=ClassificationCache(use_db=False)).classify_message("Hoy comió bien")
+
+        self.assertEqual(result["resumen"], "Respuesta real")
+        self.assertEqual(replay.stats()["replayed"], 1)
+
+    def test_real_backend_still_requires_api_key(self):
+        with self.assertRaises(ValueError):
+            GeminiService(registry=MagicMock(requires_api_key=True))
+
+if __name__ == '__main__':
+    unittest.main()
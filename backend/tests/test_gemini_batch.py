@@ -0,0 +1,78 @@
+# backend/tests/test_gemini_batch.py
+import json
+import unittest
+import os
+import sys
+from unittest.mock import patch, MagicMock
+
+# Agregar el directorio padre al path de Python
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.classification_cache import ClassificationCache
+from app.services.gemini_service import GeminiService, ModelRegistry
+
+def fake_response(data):
+    response = MagicMock()
+    response.text = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False)
+    return response
+
+def single_result(valor):
+    return {
+        "categorias": [{
+            "nombre": "Salud Física",
+            "detectada": True,
+            "subcategorias": [{"nombre": "Sueño", "detectada": True, "valor": valor, "confianza": 0.9}]
+        }],
+        "resumen": valor
+    }
+
+class TestGeminiBatchClassification(unittest.TestCase):
+    def setUp(self):
+        env = patch.dict(os.environ, {"GOOGLE_API_KEY": "test-key"})
+        env.start()
+        self.addCleanup(env.stop)
+        genai_patch = patch('app.services.gemini_service.genai')
+        self.genai = genai_patch.start()
+        self.addCleanup(genai_patch.stop)
+        self.model = self.genai.GenerativeModel.return_value
+        self.service = GeminiService(registry=ModelRegistry(), cache=ClassificationCache(use_db=False))
+        self.model.generate_content.reset_mock()
+
+    def test_batch_sends_one_request_and_splits_results(self):
+        self.model.generate_content.return_value = fake_response({
+            "resultados": [
+                {"id": "m2", **single_result("durmió mal")},
+                {"id": "m1", **single_result("durmió 6 horas")}
+            ]
+        })
+
+        results = self.service.classify_messages(["durmió 6 horas", "durmió mal"])
+
+        self.assertEqual(self.model.generate_content.call_count, 1)
+        self.assertEqual(results[0]["resumen"], "durmió 6 horas")
+        self.assertEqual(results[1]["resumen"], "durmió mal")
+
+    def test_missing_ids_fall_back_to_single_calls(self):
+        self.model.generate_content.side_effect = [
+            fake_response({"resultados": [{"id": "m1", **single_result("uno")}]}),
+            fake_response(single_result("dos"))
+        ]
+
+        results = self.service.classify_messages(["uno", "dos"])
+
+        self.assertEqual(self.model.generate_content.call_count, 2)
+        self.assertEqual([r["resumen"] for r in results], ["uno", "dos"])
+
+    def test_malformed_batch_falls_back_to_single_calls(self):
+        self.model.generate_content.side_effect = [
+            fake_response("esto no es JSON"),
+            fake_response(single_result("uno")),
+            fake_response(single_result("dos"))
+        ]
+
+        results = self.service.classify_messages(["uno", "dos"])
+
+        self.assertEqual([r["resumen"] for r in results], ["uno", "dos"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+# backend/tests/test_gemini_deadlines.py
+import json
+import time
+import asyncio
+import threading
+import unittest
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock
+import google.generativeai as genai
+from google.ai import generativelanguage as glm
+
+# Agregar el directorio padre al path de Python
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.async_gemini_service import AsyncGeminiService
+from app.services.classification_cache import ClassificationCache
+from app.services.classification_prompt import ClassificationPrompt
+from app.services.fake_gemini_backend import FakeGeminiBackend
+from app.services.gemini_service import (
+    GeminiService, ModelRegistry, TimedModel, PRIMARY_MODEL, FALLBACK_MODELS
+)
+from app.services.model_health import ModelHealth
+from app.utils.deadline import Deadline
+from app.utils.rate_limit import QuotaLimiter
+
+RESULT = {"categorias": [], "resumen": "Sin novedades"}
+
+def fake_response(data):
+    response = MagicMock()
+    response.text = json.dumps(data, ensure_ascii=False)
+    return response
+
+class DeadlineTestCase(unittest.TestCase):
+    def setUp(self):
+        env = patch.dict(os.environ, {"GOOGLE_API_KEY": "test-key"})
+        env.start()
+        self.addCleanup(env.stop)
+        genai_patch = patch('app.services.gemini_service.genai')
+        self.genai = genai_patch.start()
+        self.addCleanup(genai_patch.stop)
+
+        self.models = {}
+        self.genai.GenerativeModel.side_effect = lambda name, **kwargs: self.models.setdefault(name, MagicMock())
+        # Las llamadas colgadas se liberan al terminar cada prueba
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        self.health = ModelHealth(ttl=60)
+
+    def _model(self, name):
+        return self.genai.GenerativeModel(name)
+
+    def _hang(self, *args, **kwargs):
+        self.release.wait(5)
+        return fake_response(RESULT)
+
+class TestGeminiDeadlines(DeadlineTestCase):
+    def setUp(self):
+        super().setUp()
+        self.service = GeminiService(health=self.health, registry=ModelRegistry(),
+                                     cache=ClassificationCache(use_db=False))
+
+    def test_hung_model_is_abandoned_at_deadline(self):
+        self._model(PRIMARY_MODEL).generate_content.side_effect = self._hang
+
+        start = time.monotonic()
+        result = self.service.classify_message("Hoy comió bien", deadline=Deadline(0.2))
+
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertIn("error", result)
+        self.assertEqual(self.health.stats()[PRIMARY_MODEL]["timeouts"], 1)
+        self._model(FALLBACK_MODELS[0]).generate_content.assert_not_called()
+
+    def test_fallback_only_gets_remaining_budget(self):
+        self._model(PRIMARY_MODEL).generate_content.side_effect = RuntimeError("503 Service Unavailable")
+        self._model(FALLBACK_MODELS[0]).generate_content.side_effect = self._hang
+
+        start = time.monotonic()
+        result = self.service.classify_message("Hoy comió bien", deadline=Deadline(0.3))
+
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertIn("error", result)
+        stats = self.health.stats()
+        self.assertEqual(stats[PRIMARY_MODEL]["timeouts"], 0)
+        self.assertEqual(stats[FALLBACK_MODELS[0]]["timeouts"], 1)
+
+    def test_expired_deadline_skips_model_calls(self):
+        deadline = Deadline(0.01)
+        time.sleep(0.02)
+
+        result = self.service.classify_message("Hoy comió bien", deadline=deadline)
+
+        self.assertIn("error", result)
+        self.genai.GenerativeModel.assert_not_called()
+
+    def test_late_result_does_not_count_as_success(self):
+        self._model(PRIMARY_MODEL).generate_content.side_effect = self._hang
+        self.service.classify_message("Hoy comió bien", deadline=Deadline(0.1))
+
+        self.release.set()
+        time.sleep(0.1)
+
+        stats = self.health.stats()[PRIMARY_MODEL]
+        self.assertEqual(stats["calls"], 1)
+        self.assertEqual(stats["failures"], 1)
+
+class TestTransportTimeout(unittest.TestCase):
+    def test_timeout_reaches_the_grpc_client(self):
+        model = TimedModel(genai.GenerativeModel(PRIMARY_MODEL))
+        model.model._client = MagicMock()
+        model.model._client.generate_content.return_value = glm.GenerateContentResponse()
+
+        model.generate_content("Hoy comió bien", request_options={"timeout": 2.5})
+
+        self.assertEqual(model.model._client.generate_content.call_args.kwargs["timeout"], 2.5)
+
+    def test_hung_calls_do_not_exhaust_the_call_pool(self):
+        # Un backend que no responde en el tiempo de la prueba, salvo que el timeout corte la llamada
+        backend = FakeGeminiBackend(latency=5, prompts=ClassificationPrompt())
+        service = GeminiService(registry=backend, health=ModelHealth(ttl=60),
+                                cache=ClassificationCache(use_db=False))
+        pool = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(pool.shutdown, wait=False)
+
+        with patch('app.services.gemini_service._call_pool', pool):
+            # Más llamadas colgadas que hilos en el pool
+            for text in ("Hoy comió bien", "Durmió poco", "Caminó un rato"):
+                self.assertIn("error", service.classify_message(text, deadline=Deadline(0.2)))
+            backend.latency = lambda rng: 0.0
+            start = time.monotonic()
+            result = service.classify_message("Tomó la medicación", deadline=Deadline(2))
+
+        self.assertNotIn("error", result)
+        self.assertLess(time.monotonic() - start, 1)
+
+class TestAsyncGeminiDeadlines(DeadlineTestCase):
+    def test_hung_call_is_cancelled(self):
+        cancelled = []
+
+        async def hang(prompt, **kwargs):
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        self._model(PRIMARY_MODEL).generate_content_async = hang
+        service = AsyncGeminiService(
+            quota=QuotaLimiter(requests_per_minute=60000, tokens_per_minute=10 ** 9),
+            health=self.health, registry=ModelRegistry(), cache=ClassificationCache(use_db=False)
+        )
+
+        start = time.monotonic()
+        result = asyncio.run(service.classify_message("Hoy comió bien", deadline=Deadline(0.1)))
+
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertIn("error", result)
+        self.assertEqual(cancelled, [True])
+        self.assertEqual(self.health.stats()[PRIMARY_MODEL]["timeouts"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+# backend/tests/test_gemini_model_health.py
+import json
+import time
+import unittest
+import os
+import sys
+from unittest.mock import patch, MagicMock
+from concurrent.futures import ThreadPoolExecutor
+
+# Agregar el directorio padre al path de Python
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.classification_cache import ClassificationCache
+from app.services.gemini_service import (
+    GeminiService, ModelRegistry, GENERATION_CONFIG, PRIMARY_MODEL, FALLBACK_MODELS
+)
+from app.services.model_health import ModelHealth
+
+RESULT = {"categorias": [], "resumen": "Sin novedades"}
+
+def fake_response(data):
+    response = MagicMock()
+    response.text = json.dumps(data, ensure_ascii=False)
+    return response
+
+class TestGeminiModelHealth(unittest.TestCase):
+    def setUp(self):
+        env = patch.dict(os.environ, {"GOOGLE_API_KEY": "test-key"})
+        env.start()
+        self.addCleanup(env.stop)
+        genai_patch = patch('app.services.gemini_service.genai')
+        self.genai = genai_patch.start()
+        self.addCleanup(genai_patch.stop)
+
+        # Un modelo simulado por nombre, para saber a cuál se llamó
+        self.models = {}
+        self.genai.GenerativeModel.side_effect = lambda name, **kwargs: self.models.setdefault(name, MagicMock())
+        self.health = ModelHealth(ttl=60, failure_threshold=1)
+        self.service = GeminiService(health=self.health, registry=ModelRegistry(), cache=ClassificationCache(use_db=False))
+
+    def _model(self, name):
+        return self.genai.GenerativeModel(name)
+
+    def test_construction_does_no_network_calls(self):
+        self.genai.GenerativeModel.assert_not_called()
+
+    def test_failed_primary_is_skipped_within_ttl(self):
+        self._model(PRIMARY_MODEL).generate_content.side_effect = RuntimeError("503 Service Unavailable")
+        self._model(FALLBACK_MODELS[0]).generate_content.return_value = fake_response(RESULT)
+
+        self.assertEqual(self.service.classify_message("Hoy comió bien")["resumen"], "Sin novedades")
+        self.assertEqual(self.service.classify_message("Hoy durmió bien")["resumen"], "Sin novedades")
+
+        self.assertEqual(self._model(PRIMARY_MODEL).generate_content.call_count, 1)
+        self.assertEqual(self._model(FALLBACK_MODELS[0]).generate_content.call_count, 2)
+        self.assertEqual(self.service.model_name, PRIMARY_MODEL)
+        self.assertIn(PRIMARY_MODEL, self.health.snapshot())
+
+    def test_primary_is_retried_after_ttl(self):
+        self.health.mark_failure(PRIMARY_MODEL, "503 Service Unavailable")
+        self._model(PRIMARY_MODEL).generate_content.return_value = fake_response(RESULT)
+
+        with patch('app.services.model_health.time.monotonic', return_value=10 ** 9):
+            self.service.classify_message("Hoy comió bien")
+
+        self.assertEqual(self._model(PRIMARY_MODEL).generate_content.call_count, 1)
+        self.assertTrue(self.health.is_available(PRIMARY_MODEL))
+        self.assertEqual(self.health.snapshot(), {})
+
+    def test_hedged_request_returns_backup_result(self):
+        for _ in range(20):
+            self.health.mark_success(PRIMARY_MODEL, 0.01)
+
+        def slow_primary(*args, **kwargs):
+            time.sleep(0.5)
+            return fake_response({"categorias": [], "resumen": "Primario"})
+
+        self._model(PRIMARY_MODEL).generate_content.side_effect = slow_primary
+        self._model(FALLBACK_MODELS[0]).generate_content.return_value = fake_response(RESULT)
+        service = GeminiService(health=self.health, registry=ModelRegistry(),
+                                cache=ClassificationCache(use_db=False), hedging=True)
+
+        self.assertEqual(service.classify_message("Hoy comió bien")["resumen"], "Sin novedades")
+        self.assertEqual(self._model(FALLBACK_MODELS[0]).generate_content.call_count, 1)
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.health = ModelHealth(ttl=60, failure_threshold=3)
+
+    def test_circuit_opens_after_consecutive_failures(self):
+        for _ in range(2):
+            self.health.mark_failure(PRIMARY_MODEL, "timeout")
+        self.assertTrue(self.health.is_available(PRIMARY_MODEL))
+
+        self.health.mark_failure(PRIMARY_MODEL, "timeout")
+        self.assertFalse(self.health.is_available(PRIMARY_MODEL))
+        self.assertEqual(self.health.order([PRIMARY_MODEL, FALLBACK_MODELS[0]]), [FALLBACK_MODELS[0], PRIMARY_MODEL])
+
+    def test_success_resets_consecutive_failures(self):
+        for _ in range(5):
+            self.health.mark_failure(PRIMARY_MODEL, "timeout")
+            self.health.mark_success(PRIMARY_MODEL, 0.2)
+        self.assertTrue(self.health.is_available(PRIMARY_MODEL))
+
+    def test_half_open_circuit_admits_a_single_probe(self):
+        for _ in range(3):
+            self.health.mark_failure(PRIMARY_MODEL, "timeout")
+        models = [PRIMARY_MODEL, FALLBACK_MODELS[0]]
+
+        with patch('app.services.model_health.time.monotonic', return_value=time.monotonic() + 120):
+            self.assertEqual(self.health.order(models), models)
+            self.assertEqual(self.health.order(models), [FALLBACK_MODELS[0], PRIMARY_MODEL])
+
+            self.health.mark_failure(PRIMARY_MODEL, "timeout")
+            self.assertFalse(self.health.is_available(PRIMARY_MODEL))
+
+    def test_latency_stats(self):
+        self.assertIsNone(self.health.hedge_delay(PRIMARY_MODEL))
+        for latency in range(1, 101):
+            self.health.mark_success(PRIMARY_MODEL, latency / 1000)
+
+        stats = self.health.stats()[PRIMARY_MODEL]
+        self.assertEqual(stats["state"], "closed")
+        self.assertAlmostEqual(self.health.hedge_delay(PRIMARY_MODEL), 0.095)
+        self.assertGreater(stats["latency_ewma_ms"], 90)
+
+class TestModelRegistry(unittest.TestCase):
+    def setUp(self):
+        genai_patch = patch('app.services.gemini_service.genai')
+        self.genai = genai_patch.start()
+        self.addCleanup(genai_patch.stop)
+        self.genai.GenerativeModel.side_effect = lambda name, **kwargs: MagicMock()
+        self.registry = ModelRegistry()
+
+    def test_models_are_created_once_across_threads(self):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            models = list(executor.map(lambda _: self.registry.get(PRIMARY_MODEL), range(50)))
+
+        self.assertTrue(all(model is models[0] for model in models))
+        self.genai.GenerativeModel.assert_called_once_with(PRIMARY_MODEL, generation_config=GENERATION_CONFIG)
+
+    def test_configure_keeps_clients_for_same_key(self):
+        self.registry.configure("test-key")
+        model = self.registry.get(PRIMARY_MODEL)
+        self.registry.configure("test-key")
+
+        self.assertIs(self.registry.get(PRIMARY_MODEL), model)
+        self.genai.configure.assert_called_once_with(api_key="test-key")
+
+        self.registry.configure("otra-clave")
+        self.assertIsNot(self.registry.get(PRIMARY_MODEL), model)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+# backend/tests/test_json_repair.py
+import json
+import unittest
+import os
+import sys
+from unittest.mock import patch, MagicMock
+
+# Agregar el directorio padre al path de Python
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.json_repair import TolerantJSONParser, parse_json
+from app.services.classification_cache import ClassificationCache
+from app.services.classification_prompt import ClassificationPrompt
+from app.services.gemini_service import GeminiService, ModelRegistry, ParseStats
+from app.services.model_health import ModelHealth
+
+RESULT = {
+    "categorias": [{"nombre": "Salud Física", "subcategorias": [
+        {"nombre": "Sueño", "valor": "durmió 6 horas", "confianza": 0.9},
+        {"nombre": "Alimentación", "valor": "comió poco", "confianza": 0.8}
+    ]}],
+    "resumen": "Durmió bien y comió poco"
+}
+
+class TestTolerantJSONParser(unittest.TestCase):
+    def test_valid_json_is_not_repaired(self):
+        self.assertEqual(parse_json(json.dumps(RESULT)), (RESULT, False))
+        self.assertEqual(parse_json("```json\n" + json.dumps(RESULT) + "\n```"), (RESULT, False))
+
+    def test_comments_and_trailing_commas(self):
+        text = 'Resultado:\n```json\n{"categorias": [], // sin datos\n "resumen": "ok", /* fin */}\n```'
+        self.assertEqual(parse_json(text), ({"categorias": [], "resumen": "ok"}, True))
+
+    def test_missing_comma(self):
+        self.assertEqual(parse_json('{"a": "x" "b": [1 2]}'), ({"a": "x", "b": [1, 2]}, True))
+
+    def test_truncated_tail_keeps_complete_elements(self):
+        text = json.dumps(RESULT, ensure_ascii=False)
+        truncated = text[:text.index("comió poco") + 4]
+
+        data, repaired = parse_json(truncated)
+
+        self.assertTrue(repaired)
+        self.assertEqual(data["categorias"][0]["subcategorias"],
+                         [{"nombre": "Sueño", "valor": "durmió 6 horas", "confianza": 0.9},
+                          {"nombre": "Alimentación"}])
+
+    def test_silent_fixes_are_reported(self):
+        self.assertEqual(parse_json('{"a": 1.}'), ({"a": 1}, True))
+        self.assertEqual(parse_json('{"a": [1, 2]]'), ({"a": [1, 2]}, True))
+
+    def test_truncated_number_and_dangling_key_are_dropped(self):
+        self.assertEqual(parse_json('{"resumen": "ok", "confianza": 0.')[0], {"resumen": "ok"})
+        self.assertEqual(parse_json('{"resumen": "ok", "categorias"')[0], {"resumen": "ok"})
+
+    def test_incremental_feed(self):
+        text = json.dumps(RESULT, ensure_ascii=False)
+        parser = TolerantJSONParser()
+        for start in range(0, len(text), 7):
+            parser.feed(text[start:start + 7])
+
+        self.assertEqual(parser.close(), RESULT)
+        self.assertFalse(parser.repaired)
+
+    def test_no_json(self):
+        with self.assertRaises(ValueError):
+            parse_json("Lo siento, no puedo ayudar con eso.")
+
+class TestGeminiStructuredOutput(unittest.TestCase):
+    def setUp(self):
+        env = patch.dict(os.environ, {"GOOGLE_API_KEY": "test-key"})
+        env.start()
+        self.addCleanup(env.stop)
+        genai_patch = patch('app.services.gemini_service.genai')
+        self.genai = genai_patch.start()
+        self.addCleanup(genai_patch.stop)
+        self.model = self.genai.GenerativeModel.return_value
+        self.parsing = ParseStats()
+        self.service = GeminiService(
+            health=ModelHealth(), registry=ModelRegistry(), cache=ClassificationCache(max_size=0),
+            prompts=ClassificationPrompt(), parsing=self.parsing
+        )
+
+    def _respond(self, text):
+        response = MagicMock()
+        response.text = text
+        self.model.generate_content.return_value = response
+
+    def test_repaired_complete_response_does_not_trigger_another_call(self):
+        self._respond("```json\n" + json.dumps(RESULT, ensure_ascii=False)[:-1] + ",}\n```")
+
+        result = self.service.classify_message("Durmió 6 horas y comió poco")
+
+        self.assertNotIn("error", result)
+        self.assertEqual(result["categorias"][0]["subcategorias"][0]["valor"], "durmió 6 horas")
+        self.assertEqual(self.model.generate_content.call_count, 1)
+        self.assertEqual(self.parsing.stats()["repaired"], 1)
+
+    def test_truncated_response_without_summary_is_not_accepted(self):
+        self.service.cache = ClassificationCache(max_size=10, use_db=False)
+        self._respond(json.dumps(RESULT, ensure_ascii=False)[:-30])
+
+        result = self.service.classify_message("Durmió 6 horas y comió poco")
+
+        # Una clasificación parcial no se guarda: el trabajo se reintenta
+        self.assertIn("error", result)
+        self.assertIsNone(self.service.cache.get("Durmió 6 horas y comió poco", self.service.prompt_version(),
+                                                 self.service.model_name))
+        self.assertEqual(self.parsing.stats()["repaired"], 1)
+
+    def test_truncated_batch_only_retries_missing_messages(self):
+        batch = {"resultados": [{"id": "m1", **RESULT}, {"id": "m2", **RESULT}]}
+        self._respond(json.dumps(batch, ensure_ascii=False)[:-60])
+
+        self.service.classify_messages(["uno", "dos"])
+
+        # El primer resultado se conserva; solo el segundo se pide de nuevo
+        self.assertEqual(self.model.generate_content.call_count, 2)
+        self.assertIn('"dos"', self.model.generate_content.call_args[0][0])
+
+    def test_response_schema_is_requested_when_supported(self):
+        self._respond(json.dumps(RESULT))
+
+        with patch('app.services.gemini_service.STRUCTURED_OUTPUT', True):
+            self.service.classify_message("Durmió 6 horas")
+
+        config = self.model.generate_content.call_args[1]["generation_config"]
+        self.assertEqual(config["response_mime_type"], "application/json")
+        category = config["response_schema"]["properties"]["categorias"]["items"]
+        self.assertIn("Salud Física", category["properties"]["nombre"]["enum"])
+        self.assertIn("Sueño", category["properties"]["subcategorias"]["items"]["properties"]["nombre"]["enum"])
+
+    def test_unparseable_response_is_an_error(self):
+        self._respond("Lo siento, no puedo ayudar con eso.")
+
+        result = self.service.classify_message("Durmió 6 horas")
+
+        self.assertIn("error", result)
+        self.assertEqual(self.parsing.stats()["failed"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
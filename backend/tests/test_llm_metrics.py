@@ -0,0 +1,180 @@
+# backend/tests/test_llm_metrics.py
+import os
+import sys
+import tempfile
+import unittest
+import subprocess
+import urllib.request
+import numpy as np
+from unittest.mock import patch
+from prometheus_client import REGISTRY
+from prometheus_client.parser import text_string_to_metric_families
+
+# Agregar el directorio padre al path de Python
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app, db
+from app.models import Patient, Caregiver, Message
+from app.services import llm_metrics
+from app.services.classification_cache import ClassificationCache
+from app.services.classification_prompt import ClassificationPrompt
+from app.services.classification_queue import ClassificationQueue
+from app.services.classification_service import ClassificationService
+from app.services.classification_worker import ClassificationWorker
+from app.services.local_classifier import LocalClassifier, LocalModel, HashedNgramVectorizer
+from app.services.fake_gemini_backend import FakeGeminiBackend
+from app.services.gemini_service import GeminiService, PRIMARY_MODEL, FALLBACK_MODELS
+from app.services.model_health import ModelHealth
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+def scrape(port):
+    """Muestras de /metrics de un servidor de métricas, por (nombre, etiquetas)"""
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+        content = response.read().decode()
+    return {
+        (metric_sample.name, tuple(sorted(metric_sample.labels.items()))): metric_sample.value
+        for family in text_string_to_metric_families(content) for metric_sample in family.samples
+    }
+
+class TestLLMMetrics(unittest.TestCase):
+    def setUp(self):
+        self.backend = FakeGeminiBackend(seed=3, prompts=ClassificationPrompt())
+        self.service = GeminiService(registry=self.backend, health=ModelHealth(),
+                                     cache=ClassificationCache(max_size=100, use_db=False))
+
+    def test_calls_tokens_cost_and_cache_are_recorded(self):
+        calls = sample("gemini_call_duration_seconds_count", model=PRIMARY_MODEL, outcome="success")
+        prompt_tokens = sample("gemini_tokens_total", model=PRIMARY_MODEL, kind="prompt")
+        cost = sample("gemini_cost_usd_total", model=PRIMARY_MODEL)
+        cached = sample("gemini_classify_duration_seconds_count", operation="message", outcome="cached")
+        misses = sample("classification_cache_lookups_total", result="miss")
+
+        self.service.classify_message("Hoy durmió 6 horas")
+        self.service.classify_message("Hoy durmió 6 horas")
+
+        self.assertEqual(sample("gemini_call_duration_seconds_count", model=PRIMARY_MODEL, outcome="success"),
+                         calls + 1)
+        self.assertGreater(sample("gemini_tokens_total", model=PRIMARY_MODEL, kind="prompt"), prompt_tokens)
+        self.assertGreater(sample("gemini_cost_usd_total", model=PRIMARY_MODEL), cost)
+        self.assertEqual(sample("gemini_classify_duration_seconds_count", operation="message", outcome="cached"),
+                         cached + 1)
+        self.assertEqual(sample("classification_cache_lookups_total", result="miss"), misses + 1)
+
+    def test_fallback_attempts_are_recorded(self):
+        self.backend.error_rate = 1.0
+        attempts = sample("gemini_attempts_sum")
+        errors = sample("gemini_call_duration_seconds_count", model=FALLBACK_MODELS[0], outcome="error")
+
+        result = self.service.classify_message("Comió poco")
+
+        self.assertIn("error", result)
+        self.assertEqual(sample("gemini_attempts_sum"), attempts + 1 + len(FALLBACK_MODELS))
+        self.assertEqual(sample("gemini_call_duration_seconds_count", model=FALLBACK_MODELS[0], outcome="error"),
+                         errors + 1)
+
+    def test_tokens_are_attributed_to_patient(self):
+        before = sample("gemini_patient_tokens_total", patient="42")
+
+        with llm_metrics.attribute_to_patients([42, 42]):
+            self.service.classify_message("Tomó la medicación de la mañana")
+        with llm_metrics.attribute_to_patients([42, 7]):
+            self.service.classify_message("Se quejó de dolor en la rodilla")
+
+        self.assertGreater(sample("gemini_patient_tokens_total", patient="42"), before)
+        self.assertGreater(sample("gemini_patient_tokens_total", patient="multiple"), 0)
+
+    def test_metrics_endpoint(self):
+        app = create_app('testing')
+        self.service.classify_message("Desayunó bien, con apetito")
+
+        response = app.test_client().get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("text/plain", response.content_type)
+        self.assertIn(b"gemini_call_duration_seconds_bucket", response.data)
+        self.assertIn(b"gemini_parse_results_total", response.data)
+
+class TestWorkerMetricsServer(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.server = llm_metrics.start_metrics_server(0, addr="127.0.0.1")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_classifications_from_the_worker_are_scraped(self):
+        patient = Patient(name="María García", age=78)
+        db.session.add(patient)
+        db.session.flush()
+        caregiver = Caregiver(name="Ana Pérez", phone="+1234567890", patient_id=patient.id)
+        db.session.add(caregiver)
+        db.session.flush()
+        queue = ClassificationQueue()
+        for text in ("La presión 130/85", "Se quejó de dolor en la rodilla"):
+            message = Message(content=text, caregiver_id=caregiver.id, patient_id=patient.id)
+            db.session.add(message)
+            db.session.flush()
+            queue.enqueue(message, commit=False)
+        db.session.commit()
+
+        with patch('app.services.classification_service.GeminiService'):
+            service = ClassificationService()
+        service.gemini_service = GeminiService(
+            registry=FakeGeminiBackend(seed=5, prompts=ClassificationPrompt()), health=ModelHealth(),
+            cache=ClassificationCache(max_size=100, use_db=False)
+        )
+        # Un modelo sin aprender: evalúa cada mensaje pero nunca está seguro
+        service.local_classifier = LocalClassifier(LocalModel(
+            [("Salud Física", "Sueño")], np.zeros((2 ** 10, 1)), np.zeros(1), HashedNgramVectorizer(n_features=2 ** 10)
+        ))
+        port = self.server.server_port
+        names = ["rule_evaluated_total", "rule_bypass_total", "local_classifier_evaluated_total",
+                 "local_classifier_accepted_total", "gemini_attempts_count"]
+        before = scrape(port)
+
+        processed = ClassificationWorker(self.app, classification_service=service).drain()
+
+        after = scrape(port)
+        self.assertEqual(processed, 2)
+        delta = {name: after[(name, ())] - before.get((name, ()), 0.0) for name in names}
+        # Las reglas resuelven la presión; el otro mensaje pasa por el clasificador local y llega a Gemini
+        self.assertEqual(delta, {
+            "rule_evaluated_total": 2, "rule_bypass_total": 1, "local_classifier_evaluated_total": 1,
+            "local_classifier_accepted_total": 0, "gemini_attempts_count": 1
+        })
+        call = ("gemini_call_duration_seconds_count", (("model", PRIMARY_MODEL), ("outcome", "success")))
+        self.assertEqual(after[call] - before.get(call, 0.0), 1)
+        self.assertGreater(after[("gemini_tokens_total", (("kind", "prompt"), ("model", PRIMARY_MODEL)))], 0)
+
+class TestMultiprocessMetrics(unittest.TestCase):
+    def test_metrics_are_summed_across_workers(self):
+        script = (
+            "from app.services import llm_metrics\n"
+            "llm_metrics.record_tokens('models/gemini-2.0-flash', 100, 10)\n"
+        )
+        with tempfile.TemporaryDirectory() as metrics_dir:
+            env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": metrics_dir}
+            # Dos procesos, como dos workers de gunicorn
+            for _ in range(2):
+                subprocess.run([sys.executable, "-c", script], cwd=BACKEND_DIR, env=env, check=True,
+                               capture_output=True)
+
+            with patch.object(llm_metrics, "MULTIPROC_DIR", metrics_dir):
+                content, _ = llm_metrics.render_metrics()
+
+        self.assertIn('gemini_tokens_total{kind="prompt",model="models/gemini-2.0-flash"} 200.0',
+                      content.decode())
+
+if __name__ == '__main__':
+    unittest.main()
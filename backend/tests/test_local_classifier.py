@@ -0,0 +1,233 @@
+# backend/tests/test_local_classifier.py
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+from unittest.mock import patch
+from prometheus_client import REGISTRY
+
+# Agregar el directorio padre al path de Python
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.models import Message, Patient, Caregiver, Category, Subcategory, ClassifiedValue, ClassificationJob
+from app.services.classification_service import ClassificationService, result_origin
+from app.services.local_classifier import (
+    HashedNgramVectorizer, LocalModel, LocalClassifier, load_training_data
+)
+
+SLEEP = ("Salud Física", "Sueño")
+FOOD = ("Salud Física", "Alimentación")
+MOOD = ("Estado Emocional", "Humor")
+SYMPTOMS = ("Salud Física", "Síntomas")
+
+# Mensajes clasificados por Gemini: el mismo tipo de frase con distintos valores
+TRAINING = (
+    [(f"Hoy durmió {hours} horas", {SLEEP}) for hours in range(3, 10)] +
+    [(f"Anoche durmió mal, se despertó {times} veces", {SLEEP}) for times in range(1, 6)] +
+    [(f"Comió poco en el almuerzo, solo {food}", {FOOD}) for food in ("la sopa", "fruta", "pan", "arroz", "puré")] +
+    [(f"Desayunó bien, con {adverb} apetito", {FOOD}) for adverb in ("mucho", "buen", "algo de", "bastante")] +
+    [(f"Estuvo muy {mood} con la visita de {who}", {MOOD})
+     for mood in ("contenta", "alegre") for who in ("los nietos", "su hija", "la vecina")] +
+    [(f"Hola, buen {moment}", set()) for moment in ("día", "día!", "dia", "día para todos")] +
+    [("Gracias por todo", set()), ("Ok, mañana te escribo", set())]
+)
+
+def trained_model():
+    texts, label_sets = zip(*TRAINING)
+    return LocalModel.train(list(texts), list(label_sets), n_features=2 ** 12, epochs=30, batch_size=16,
+                            min_positives=3)
+
+def predicted(result):
+    return {(category["nombre"], subcategory["nombre"])
+            for category in result["categorias"] for subcategory in category["subcategorias"]}
+
+class TestHashedNgramVectorizer(unittest.TestCase):
+    def test_vectors_are_normalized_and_accent_insensitive(self):
+        vectorizer = HashedNgramVectorizer(n_features=2 ** 12)
+
+        indices, values = vectorizer.transform_one("Durmió  bien 😴")
+        same_indices, same_values = vectorizer.transform_one("durmio bien")
+
+        np.testing.assert_array_equal(indices, same_indices)
+        np.testing.assert_allclose(values, same_values)
+        self.assertAlmostEqual(float(np.linalg.norm(values)), 1.0, places=5)
+        self.assertEqual(len(vectorizer.transform_one("")[0]), 0)
+
+class TestLocalModel(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.model = trained_model()
+
+    def test_learns_subcategories_seen_often_enough(self):
+        self.assertEqual(sorted(self.model.labels), sorted([SLEEP, FOOD, MOOD]))
+        probabilities = dict(zip(self.model.labels, self.model.predict_proba("Hoy durmió 11 horas")))
+
+        self.assertGreater(probabilities[SLEEP], 0.5)
+        self.assertLess(probabilities[FOOD], 0.5)
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "local.npz")
+            self.model.save(path)
+            loaded = LocalModel.load(path)
+
+        self.assertEqual(loaded.labels, self.model.labels)
+        np.testing.assert_allclose(loaded.predict_proba("Comió poco en la cena"),
+                                   self.model.predict_proba("Comió poco en la cena"))
+
+class TestLocalClassifier(unittest.TestCase):
+    def setUp(self):
+        self.classifier = LocalClassifier(trained_model(), min_confidence=0.8)
+
+    def test_confident_prediction_has_gemini_structure(self):
+        result = self.classifier.classify("Hoy durmió 4 horas")
+
+        self.assertEqual(predicted(result), {SLEEP})
+        self.assertEqual(result["origen"], "local")
+        subcategory = result["categorias"][0]["subcategorias"][0]
+        self.assertTrue(result["categorias"][0]["detectada"] and subcategory["detectada"])
+        self.assertEqual(subcategory["valor"], "4 horas")
+
+    def test_numeric_values_are_extracted_or_left_to_gemini(self):
+        model = LocalModel([SYMPTOMS, SLEEP, MOOD], np.zeros((2 ** 12, 3)), np.zeros(3),
+                           HashedNgramVectorizer(n_features=2 ** 12))
+        classifier = LocalClassifier(model, min_confidence=0.8)
+
+        def classify(text, *labels):
+            probabilities = np.array([0.99 if label in labels else 0.01 for label in model.labels])
+            with patch.object(model, "predict_proba", return_value=probabilities):
+                return classifier.classify(text)
+
+        result = classify("Fiebre 38,5 y estuvo contenta con los nietos", SYMPTOMS, MOOD)
+        values = {subcategory["nombre"]: subcategory["valor"]
+                  for category in result["categorias"] for subcategory in category["subcategorias"]}
+        self.assertEqual(values, {"Síntomas": "temperatura 38.5",
+                                  "Humor": "Fiebre 38,5 y estuvo contenta con los nietos"})
+        self.assertEqual(predicted(classify("Durmió mal toda la noche", SLEEP)), {SLEEP})
+
+        # El texto se leería como medición: sin valor extraíble decide Gemini
+        self.assertIsNone(classify("Tos desde hace 3 días", SYMPTOMS))
+        self.assertIsNone(classify("Se despertó 3 veces, durmió 5 horas y media o 6 horas", SLEEP))
+        # Las reglas reconocen una medición que el modelo no predijo
+        self.assertIsNone(classify("Contenta, la presión 130/85", MOOD))
+        self.assertEqual(classifier.stats()["accepted"], 2)
+
+    def test_uncertain_messages_are_left_to_gemini(self):
+        self.classifier.min_confidence = 0.999
+
+        self.assertIsNone(self.classifier.classify("Se quejó de dolor en la rodilla"))
+        self.assertEqual(self.classifier.stats(), {"evaluated": 1, "accepted": 0, "accept_rate": 0.0})
+
+    def test_counts_are_exported_to_prometheus(self):
+        evaluated = REGISTRY.get_sample_value("local_classifier_evaluated_total")
+        accepted = REGISTRY.get_sample_value("local_classifier_accepted_total")
+
+        self.classifier.classify("Hoy durmió 4 horas")
+        self.classifier.min_confidence = 1.0
+        self.classifier.classify("Hoy durmió 4 horas")
+
+        self.assertEqual(REGISTRY.get_sample_value("local_classifier_evaluated_total"), evaluated + 2)
+        self.assertEqual(REGISTRY.get_sample_value("local_classifier_accepted_total"), accepted + 1)
+
+    def test_without_model_nothing_is_classified(self):
+        classifier = LocalClassifier()
+
+        self.assertFalse(classifier.enabled)
+        self.assertIsNone(classifier.classify("Hoy durmió 4 horas"))
+
+class TestLocalClassifierInService(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_only_uncertain_messages_reach_gemini(self):
+        with patch('app.services.classification_service.GeminiService'):
+            service = ClassificationService(use_rules=False)
+        classifier = service.local_classifier = LocalClassifier(trained_model(), min_confidence=0.8)
+        service.gemini_service.classify_message.return_value = {"categorias": [], "resumen": "dolor"}
+        predict = classifier.predict
+
+        # Un mensaje fuera de lo aprendido queda por debajo del umbral
+        with patch.object(classifier, "predict", side_effect=lambda text: (
+            predict(text) if "durmió" in text else ({"categorias": []}, 0.5)
+        )):
+            results = service.classify_stored_messages([
+                Message(content="Hoy durmió 7 horas"), Message(content="Se quejó de dolor en la rodilla")
+            ])
+
+        service.gemini_service.classify_message.assert_called_once_with(
+            "Se quejó de dolor en la rodilla", deadline=None
+        )
+        self.assertEqual(results[0]["origen"], "local")
+        self.assertEqual(results[1]["resumen"], "dolor")
+
+    def test_training_data_comes_from_classified_messages(self):
+        patient = Patient(name="María García", age=78)
+        db.session.add(patient)
+        db.session.flush()
+        caregiver = Caregiver(name="Ana Pérez", phone="+1234567890", patient_id=patient.id)
+        category = Category(name="Salud Física", display_order=1)
+        db.session.add_all([caregiver, category])
+        db.session.flush()
+        subcategory = Subcategory(name="Sueño", category_id=category.id, display_order=1)
+        db.session.add(subcategory)
+        messages = [Message(content=text, caregiver_id=caregiver.id, patient_id=patient.id)
+                    for text in ("Hoy durmió 6 horas", "Hola, buen día", "Sin clasificar todavía",
+                                 "Durmió 7 horas", "Durmió 8 horas")]
+        db.session.add_all(messages)
+        db.session.flush()
+        db.session.add(ClassifiedValue(message_id=messages[0].id, subcategory_id=subcategory.id,
+                                       value="6 horas", confidence=0.9, origin=ClassifiedValue.ORIGIN_MODEL))
+        db.session.add(ClassificationJob(message_id=messages[1].id, status=ClassificationJob.STATUS_DONE,
+                                         origin=ClassifiedValue.ORIGIN_MODEL))
+        db.session.add(ClassificationJob(message_id=messages[2].id, status=ClassificationJob.STATUS_PENDING))
+        db.session.add(ClassifiedValue(message_id=messages[3].id, subcategory_id=subcategory.id,
+                                       value="7 horas", confidence=0.9, origin=ClassifiedValue.ORIGIN_RULES))
+        db.session.add(ClassificationJob(message_id=messages[3].id, status=ClassificationJob.STATUS_DONE,
+                                         origin=ClassifiedValue.ORIGIN_RULES))
+        db.session.add(ClassifiedValue(message_id=messages[4].id, subcategory_id=subcategory.id,
+                                       value="8 horas", confidence=0.9))
+        db.session.commit()
+
+        texts, label_sets = load_training_data()
+
+        self.assertEqual(texts, ["Hoy durmió 6 horas", "Hola, buen día"])
+        self.assertEqual(label_sets, [{SLEEP}, set()])
+        self.assertEqual(load_training_data(limit=1), (["Hoy durmió 6 horas"], [{SLEEP}]))
+        self.assertEqual(load_training_data(include_unlabeled=True)[0],
+                         ["Hoy durmió 6 horas", "Hola, buen día", "Durmió 8 horas"])
+
+    def test_results_record_their_origin(self):
+        patient = Patient(name="María García", age=78)
+        db.session.add(patient)
+        db.session.flush()
+        caregiver = Caregiver(name="Ana Pérez", phone="+1234567890", patient_id=patient.id)
+        category = Category(name="Salud Física", display_order=1)
+        db.session.add_all([caregiver, category])
+        db.session.flush()
+        db.session.add(Subcategory(name="Síntomas", category_id=category.id, display_order=1))
+        message = Message(content="La presión 130/85", caregiver_id=caregiver.id, patient_id=patient.id)
+        db.session.add(message)
+        db.session.commit()
+
+        with patch('app.services.classification_service.GeminiService'):
+            service = ClassificationService(use_local_model=False)
+        result = service.classify_stored_messages([message])[0]
+        saved = service.save_classification(message, result)
+
+        self.assertEqual(result_origin(result), ClassifiedValue.ORIGIN_RULES)
+        self.assertGreater(saved, 0)
+        values = ClassifiedValue.query.filter_by(message_id=message.id).all()
+        self.assertEqual({value.origin for value in values}, {ClassifiedValue.ORIGIN_RULES})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+# backend/tests/test_media_downloader.py
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from unittest.mock import patch
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Agregar el directorio padre al path de Python
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.models import Patient, Caregiver, Message, MediaAttachment, MediaBlob
+from app.services.media_downloader import MediaDownloader
+from app.api import webhooks
+
+VOICE_NOTE = b"OggS" + os.urandom(200 * 1024)
+RECEIPT = b"\xff\xd8\xff" + os.urandom(1024)
+
+class MediaHandler(BaseHTTPRequestHandler):
+    """Sustituto local del host de medios de Twilio"""
+    files = {
+        "/Media/voice1": (VOICE_NOTE, "audio/ogg"),
+        "/Media/voice2": (VOICE_NOTE, "audio/ogg"),
+        "/Media/receipt": (RECEIPT, "image/jpeg"),
+    }
+
+    def do_GET(self):
+        if self.path not in self.files:
+            self.send_response(404)
+            self.end_headers()
+            return
+        content, content_type = self.files[self.path]
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+class TestMediaDownloader(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), MediaHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.storage_dir = tempfile.mkdtemp()
+        self.app = create_app('testing')
+        self.app.config['MEDIA_STORAGE_DIR'] = self.storage_dir
+        self.app.config['MEDIA_ALLOWED_HOSTS'] = '127.0.0.1'
+        self.app.config['MEDIA_CHUNK_SIZE'] = 4096
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        patient = Patient(name="María García", age=78)
+        db.session.add(patient)
+        db.session.flush()
+        caregiver = Caregiver(name="Ana Pérez", phone="+1234567890", patient_id=patient.id)
+        db.session.add(caregiver)
+        db.session.flush()
+        self.message = Message(content="", caregiver_id=caregiver.id, patient_id=patient.id)
+        db.session.add(self.message)
+        db.session.commit()
+        webhooks.message_deduplicator.clear()
+        self.downloader = MediaDownloader()
+
+    def tearDown(self):
+        self.downloader.shutdown()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.storage_dir, ignore_errors=True)
+
+    def _attachment(self, path):
+        attachment = MediaAttachment(message_id=self.message.id, url=f"{self.base_url}{path}")
+        db.session.add(attachment)
+        db.session.commit()
+        return attachment
+
+    def test_download_streams_to_content_addressed_blob(self):
+        attachment = self.downloader.download(self._attachment("/Media/voice1").id)
+
+        self.assertEqual(attachment.status, MediaAttachment.STATUS_DOWNLOADED)
+        self.assertEqual(attachment.content_type, "audio/ogg")
+        blob = attachment.blob
+        self.assertEqual(blob.size, len(VOICE_NOTE))
+        self.assertTrue(blob.path.endswith(blob.sha256))
+        self.assertEqual(self.downloader.blob_path(blob).read_bytes(), VOICE_NOTE)
+        self.assertEqual(self.message.media, [attachment])
+
+    def test_duplicate_content_is_stored_once(self):
+        first = self.downloader.download(self._attachment("/Media/voice1").id)
+        second = self.downloader.download(self._attachment("/Media/voice2").id)
+
+        self.assertEqual(first.blob_id, second.blob_id)
+        self.assertEqual(MediaBlob.query.count(), 1)
+        files = [path for path in Path(self.storage_dir).rglob("*") if path.is_file()]
+        self.assertEqual(len(files), 1)
+
+    def test_failed_download_leaves_no_partial_file(self):
+        self.app.config['MEDIA_MAX_BYTES'] = 1024
+        attachment = self.downloader.download(self._attachment("/Media/voice1").id)
+
+        self.assertEqual(attachment.status, MediaAttachment.STATUS_FAILED)
+        self.assertEqual(attachment.attempts, 1)
+        self.assertIn("supera", attachment.last_error)
+        self.assertEqual([path for path in Path(self.storage_dir).rglob("*") if path.is_file()], [])
+
+        missing = self.downloader.download(self._attachment("/Media/missing").id)
+        self.assertEqual(missing.status, MediaAttachment.STATUS_FAILED)
+
+    def test_disallowed_host_is_not_fetched(self):
+        self.app.config['MEDIA_ALLOWED_HOSTS'] = 'api.twilio.com'
+        attachment = self.downloader.download(self._attachment("/Media/voice1").id)
+
+        self.assertEqual(attachment.status, MediaAttachment.STATUS_FAILED)
+        self.assertIn("no permitido", attachment.last_error)
+
+    def test_webhook_registers_and_downloads_media(self):
+        # SQLite en memoria comparte una sola conexión entre hilos
+        self.app.config['MEDIA_DOWNLOAD_WORKERS'] = 1
+        with patch.object(webhooks, 'media_downloader', self.downloader):
+            response = self.client.post('/api/webhook/whatsapp', data={
+                "MessageSid": "SMmedia1",
+                "From": "whatsapp:+1234567890",
+                "Body": "",
+                "NumMedia": "2",
+                "MediaUrl0": f"{self.base_url}/Media/voice1",
+                "MediaContentType0": "audio/ogg",
+                "MediaUrl1": f"{self.base_url}/Media/receipt",
+                "MediaContentType1": "image/jpeg"
+            })
+            self.downloader.wait(timeout=10)
+
+        self.assertEqual(response.status_code, 200)
+        db.session.expire_all()
+        message = Message.query.filter_by(whatsapp_message_id="SMmedia1").one()
+        self.assertEqual(message.classification_job, None)
+        self.assertEqual(
+            sorted(attachment.status for attachment in message.media),
+            [MediaAttachment.STATUS_DOWNLOADED] * 2
+        )
+
+if __name__ == '__main__':
+    unittest.main()
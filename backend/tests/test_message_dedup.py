@@ -0,0 +1,71 @@
+# backend/tests/test_message_dedup.py
+import unittest
+import os
+import sys
+from unittest.mock import patch
+
+# Agregar el directorio padre al path de Python
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.models import Patient, Caregiver, Message, ClassificationJob
+from app.api import webhooks
+
+class TestMessageDedup(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        patient = Patient(name="María García", age=78)
+        db.session.add(patient)
+        db.session.flush()
+        db.session.add(Caregiver(name="Ana Pérez", phone="+1234567890", patient_id=patient.id))
+        db.session.commit()
+        webhooks.message_deduplicator.clear()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _post_message(self, sid):
+        return self.client.post('/api/webhook/whatsapp', data={
+            "MessageSid": sid,
+            "From": "whatsapp:+1234567890",
+            "Body": "Tomó la medicación de la mañana"
+        }, headers={"User-Agent": "TwilioProxy/1.1"})
+
+    def test_redelivery_is_acknowledged_without_writing(self):
+        first = self._post_message("SM100")
+        second = self._post_message("SM100")
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.get_json()["status"], "duplicate")
+        self.assertEqual(Message.query.count(), 1)
+        self.assertEqual(ClassificationJob.query.count(), 1)
+
+    def test_duplicate_found_in_database_after_restart(self):
+        self._post_message("SM200")
+        # Simula otro proceso de gunicorn sin el SID en memoria
+        webhooks.message_deduplicator.clear()
+
+        response = self._post_message("SM200")
+
+        self.assertEqual(response.get_json()["status"], "duplicate")
+        self.assertEqual(Message.query.count(), 1)
+
+    def test_concurrent_insert_race_returns_200(self):
+        self._post_message("SM300")
+
+        with patch.object(webhooks.message_deduplicator, 'is_duplicate', return_value=False):
+            response = self._post_message("SM300")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["status"], "duplicate")
+        self.assertEqual(Message.query.count(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
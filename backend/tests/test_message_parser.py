@@ -0,0 +1,86 @@
+# backend/tests/test_message_parser.py
+import unittest
+import os
+import sys
+
+# Agregar el directorio padre al path de Python
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.message_parser import (
+    InboundMessage, InboundRequest, ProviderAdapter, ProviderRegistry,
+    TwilioAdapter, GenericAdapter, provider_registry
+)
+
+TWILIO_FORM = {
+    "MessageSid": "SM123",
+    "From": "whatsapp:+5491112345678",
+    "Body": "La presión 130/85",
+    "NumMedia": "1",
+    "MediaUrl0": "https://api.twilio.com/media/ME1",
+    "MediaContentType0": "audio/ogg"
+}
+
+class TestProviderAdapters(unittest.TestCase):
+    def _resolve(self, payload, headers=None):
+        inbound = InboundRequest(headers or {}, payload)
+        adapter = provider_registry.resolve(inbound)
+        return adapter, adapter.parse(inbound.payload)
+
+    def test_twilio_form_is_parsed_with_media(self):
+        adapter, (messages, ignored) = self._resolve(TWILIO_FORM, {"User-Agent": "TwilioProxy/1.1"})
+
+        self.assertEqual(adapter.name, "twilio")
+        self.assertEqual(messages[0].message_id, "SM123")
+        self.assertEqual(messages[0].media, (("https://api.twilio.com/media/ME1", "audio/ogg"),))
+
+    def test_cloud_payload_yields_all_text_messages(self):
+        payload = {
+            "object": "whatsapp_business_account",
+            "entry": [{"changes": [{"value": {"messages": [
+                {"id": "wamid.1", "from": "5491112345678", "type": "text", "text": {"body": "hola"}},
+                {"id": "wamid.2", "from": "5491112345678", "type": "audio", "audio": {"id": "A1"}}
+            ]}}]}]
+        }
+
+        adapter, (messages, ignored) = self._resolve(payload)
+
+        self.assertEqual(adapter.name, "whatsapp_cloud")
+        self.assertTrue(adapter.batch)
+        self.assertEqual([m.message_id for m in messages], ["wamid.1"])
+        self.assertEqual(ignored, 1)
+
+    def test_messagebird_payload(self):
+        payload = {"message": {"id": "mb1", "originator": "+34698765432", "content": {"text": "durmió bien"}}}
+
+        adapter, (messages, _) = self._resolve(payload)
+
+        self.assertEqual(adapter.name, "messagebird")
+        self.assertEqual(messages[0].body, "durmió bien")
+
+    def test_generic_fallback_returns_message_instead_of_dropping_it(self):
+        adapter, (messages, _) = self._resolve({"from": "+34698765432", "text": "comió poco"})
+
+        self.assertEqual(adapter.name, "generic")
+        self.assertEqual(messages[0].sender, "+34698765432")
+
+    def test_custom_adapter_registers_before_generic(self):
+        class CustomAdapter(ProviderAdapter):
+            name = "custom"
+            def claims(self, inbound):
+                return "X-Custom" in inbound.headers
+            def parse(self, payload):
+                return [InboundMessage(self.name, payload["id"], payload["who"], payload["msg"])], 0
+
+        registry = ProviderRegistry([TwilioAdapter(), GenericAdapter()])
+        registry.register(CustomAdapter())
+
+        adapter = registry.resolve(InboundRequest({"X-Custom": "1"}, {"id": 1, "who": "+1", "msg": "x"}))
+        self.assertEqual(adapter.name, "custom")
+
+    def test_inbound_message_is_slotted(self):
+        message = InboundMessage("twilio", "SM1", "+1", "hola")
+        with self.assertRaises(AttributeError):
+            message.extra = True
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+# backend/tests/test_outbound_queue.py
+import unittest
+import os
+import sys
+import json
+import time
+import base64
+import threading
+from datetime import datetime
+from urllib.parse import parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from unittest.mock import patch
+
+# Agregar el directorio padre al path de Python
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.models import OutboundMessage
+from app.services.outbound_queue import OutboundQueue, OutboundDispatcher
+
+ACCOUNT_SID = "ACtest"
+AUTH_TOKEN = "secreto"
+
+class FakeTwilioHandler(BaseHTTPRequestHandler):
+    """API de mensajes de Twilio simulada: responde según `responses` y registra las peticiones"""
+    responses = []
+    requests = []
+    lock = threading.Lock()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        form = {key: values[0] for key, values in parse_qs(self.rfile.read(length).decode()).items()}
+        with self.lock:
+            self.requests.append({"path": self.path, "auth": self.headers.get("Authorization"), "form": form})
+            status, payload, headers = self.responses.pop(0) if self.responses else (201, None, {})
+            sid = f"SM{len(self.requests):032d}"
+        if payload is None:
+            payload = {"sid": sid, "status": "queued", "to": form.get("To")}
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class TestOutboundQueue(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTwilioHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        FakeTwilioHandler.responses = []
+        FakeTwilioHandler.requests = []
+        self.app = create_app('testing')
+        self.app.config.update(
+            TWILIO_ACCOUNT_SID=ACCOUNT_SID,
+            TWILIO_AUTH_TOKEN=AUTH_TOKEN,
+            TWILIO_WHATSAPP_NUMBER="+14155238886",
+            TWILIO_API_BASE=f"http://127.0.0.1:{self.server.server_port}",
+            OUTBOUND_RATE_PER_ACCOUNT=1000,
+            OUTBOUND_BURST=100
+        )
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.queue = OutboundQueue()
+        # SQLite en memoria comparte una sola conexión entre hilos
+        self.dispatcher = OutboundDispatcher(self.app, concurrency=1)
+
+    def tearDown(self):
+        self.dispatcher.stop()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_sends_and_stores_twilio_status(self):
+        self.queue.enqueue("whatsapp:+5493815122808", "Recibimos tu mensaje")
+
+        self.assertEqual(self.dispatcher.drain(), 1)
+
+        request = FakeTwilioHandler.requests[0]
+        self.assertEqual(request["path"], f"/2010-04-01/Accounts/{ACCOUNT_SID}/Messages.json")
+        self.assertEqual(request["auth"], "Basic " + base64.b64encode(f"{ACCOUNT_SID}:{AUTH_TOKEN}".encode()).decode())
+        self.assertEqual(request["form"], {
+            "From": "whatsapp:+14155238886", "To": "whatsapp:+5493815122808", "Body": "Recibimos tu mensaje"
+        })
+        db.session.expire_all()
+        message = OutboundMessage.query.one()
+        self.assertEqual(message.status, OutboundMessage.STATUS_SENT)
+        self.assertEqual(message.twilio_status, "queued")
+        self.assertTrue(message.twilio_sid.startswith("SM"))
+
+    def test_accepted_message_is_not_resent_when_recording_fails(self):
+        self.app.config.update(OUTBOUND_LOCK_TIMEOUT=0)
+        self.queue.enqueue("+5493815122808", "Recibimos tu mensaje")
+
+        with patch.object(self.dispatcher.queue, "mark_sent", side_effect=RuntimeError("database is locked")):
+            self.dispatcher.dispatch_batch()
+        # Con el bloqueo vencido, un mensaje que quedara en 'sending' se volvería a enviar
+        self.dispatcher.drain()
+
+        db.session.expire_all()
+        message = OutboundMessage.query.one()
+        self.assertEqual(message.status, OutboundMessage.STATUS_SENT)
+        self.assertTrue(message.twilio_sid.startswith("SM"))
+        self.assertEqual(len(FakeTwilioHandler.requests), 1)
+
+    def test_rate_limit_per_account(self):
+        self.app.config.update(OUTBOUND_RATE_PER_ACCOUNT=20, OUTBOUND_BURST=1)
+        dispatcher = OutboundDispatcher(self.app, concurrency=1)
+        for index in range(5):
+            self.queue.enqueue(f"+54938150000{index:02d}", "Resumen diario")
+
+        start = time.monotonic()
+        self.assertEqual(dispatcher.drain(), 5)
+        dispatcher.stop()
+
+        # 1 token inicial + 4 a 20 por segundo
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+    def test_retries_429_with_retry_after(self):
+        FakeTwilioHandler.responses = [(429, {"code": 20429, "message": "Too Many Requests"}, {"Retry-After": "30"})]
+        self.queue.enqueue("+5493815122808", "Recibimos tu mensaje")
+
+        self.dispatcher.drain()
+
+        db.session.expire_all()
+        message = OutboundMessage.query.one()
+        self.assertEqual(message.status, OutboundMessage.STATUS_QUEUED)
+        self.assertEqual(message.error_code, "20429")
+        self.assertGreater((message.next_attempt_at - datetime.utcnow()).total_seconds(), 25)
+
+        message.next_attempt_at = datetime.utcnow()
+        db.session.commit()
+        self.dispatcher.drain()
+        db.session.expire_all()
+        message = OutboundMessage.query.one()
+        self.assertEqual(message.status, OutboundMessage.STATUS_SENT)
+        self.assertEqual(message.attempts, 2)
+
+    def test_client_errors_are_not_retried(self):
+        FakeTwilioHandler.responses = [(400, {"code": 21211, "message": "Invalid 'To' Phone Number"}, {})]
+        self.queue.enqueue("+000", "Hola")
+
+        self.dispatcher.drain()
+
+        db.session.expire_all()
+        message = OutboundMessage.query.one()
+        self.assertEqual(message.status, OutboundMessage.STATUS_FAILED)
+        self.assertEqual(message.error_code, "21211")
+        self.assertEqual(len(FakeTwilioHandler.requests), 1)
+
+    def test_status_callback_updates_delivery(self):
+        self.queue.enqueue("+5493815122808", "Recibimos tu mensaje")
+        self.dispatcher.drain()
+        db.session.expire_all()
+        message = OutboundMessage.query.one()
+
+        response = self.client.post('/api/webhook/whatsapp/status', data={
+            "MessageSid": message.twilio_sid, "MessageStatus": "delivered"
+        })
+
+        self.assertEqual(response.status_code, 200)
+        db.session.expire_all()
+        self.assertEqual(OutboundMessage.query.one().twilio_status, "delivered")
+
+if __name__ == '__main__':
+    unittest.main()
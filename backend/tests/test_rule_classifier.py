@@ -0,0 +1,98 @@
+# backend/tests/test_rule_classifier.py
+import unittest
+import os
+import sys
+from unittest.mock import patch
+from prometheus_client import REGISTRY
+
+# Agregar el directorio padre al path de Python
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.classification_service import ClassificationService
+from app.services.rule_classifier import RuleClassifier
+from app.models import Message
+
+def extracted(result):
+    return [
+        (category["nombre"], subcategory["nombre"], subcategory["valor"])
+        for category in result["categorias"] for subcategory in category["subcategorias"]
+    ]
+
+class TestRuleClassifier(unittest.TestCase):
+    def setUp(self):
+        self.rules = RuleClassifier()
+
+    def test_vitals_are_fully_covered(self):
+        result, covered = self.rules.classify("Hoy le tomé la temperatura: 38,5 °C y la presión 130/85")
+
+        self.assertTrue(covered)
+        self.assertEqual(extracted(result), [
+            ("Salud Física", "Síntomas", "temperatura 38.5"),
+            ("Salud Física", "Síntomas", "presión 130/85"),
+        ])
+        self.assertEqual(result["categorias"][0]["subcategorias"][0]["confianza"], 0.95)
+
+    def test_oxygen_and_expenses(self):
+        oxygen, oxygen_covered = self.rules.classify("Oxígeno 96%")
+        expense, expense_covered = self.rules.classify("Gasté $3500 en farmacia")
+
+        self.assertTrue(oxygen_covered and expense_covered)
+        self.assertEqual(extracted(oxygen), [("Salud Física", "Síntomas", "oxígeno 96%")])
+        self.assertEqual(extracted(expense), [("Gastos", "Medicamentos", "$3500 en farmacia")])
+
+    def test_partial_match_goes_to_model(self):
+        result, covered = self.rules.classify("Temperatura 37.2 y está muy decaída")
+
+        self.assertFalse(covered)
+        self.assertEqual(extracted(result), [("Salud Física", "Síntomas", "temperatura 37.2")])
+
+    def test_implausible_values_go_to_model(self):
+        result, covered = self.rules.classify("Presión 80/120")
+
+        self.assertFalse(covered)
+        self.assertEqual(result["categorias"][0]["subcategorias"][0]["confianza"], 0.5)
+
+    def test_no_match(self):
+        self.assertEqual(self.rules.classify("Hoy durmió 6 horas"), (None, False))
+
+    def test_bypass_rate(self):
+        evaluated = REGISTRY.get_sample_value("rule_evaluated_total")
+        bypassed = REGISTRY.get_sample_value("rule_bypass_total")
+
+        for text in ["Presión 120/80", "Hoy durmió 6 horas", "Saturación 95", "Comió poco"]:
+            self.rules.classify(text)
+
+        self.assertEqual(REGISTRY.get_sample_value("rule_evaluated_total"), evaluated + 4)
+        self.assertEqual(REGISTRY.get_sample_value("rule_bypass_total"), bypassed + 2)
+
+        self.assertEqual(self.rules.stats(), {"evaluated": 4, "bypassed": 2, "bypass_rate": 0.5})
+
+class TestClassificationServiceRules(unittest.TestCase):
+    def setUp(self):
+        with patch('app.services.classification_service.GeminiService'):
+            self.service = ClassificationService()
+        self.service.rule_classifier = RuleClassifier()
+        self.gemini = self.service.gemini_service
+
+    def test_only_uncovered_messages_reach_the_model(self):
+        self.gemini.classify_messages.return_value = [
+            {"categorias": [], "resumen": "durmió"}, {"categorias": [], "resumen": "comió"}
+        ]
+        messages = [Message(content=text) for text in
+                    ["Presión 120/80", "Hoy durmió 6 horas", "Temperatura 36.8", "Comió poco"]]
+
+        results = self.service.classify_stored_messages(messages)
+
+        self.gemini.classify_messages.assert_called_once_with(["Hoy durmió 6 horas", "Comió poco"], deadline=None)
+        self.assertEqual([result["resumen"] for result in results],
+                         ["Presión 120/80", "durmió", "Temperatura 36.8", "comió"])
+        self.assertEqual(results[0]["origen"], "reglas")
+
+    def test_fully_covered_batch_skips_the_model(self):
+        self.service.classify_stored_messages([Message(content="Oxígeno 97%")])
+
+        self.gemini.classify_message.assert_not_called()
+        self.gemini.classify_messages.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+# backend/tests/test_whatsapp_cloud_webhook.py
+import unittest
+import os
+import sys
+
+# Agregar el directorio padre al path de Python
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.models import Patient, Caregiver, Message, ClassificationJob
+from app.api import webhooks
+from app.services.caregiver_resolver import caregiver_resolver
+from app.utils.message_parser import InboundMessage
+
+def cloud_message(message_id, sender, body, message_type="text"):
+    message = {"id": message_id, "from": sender, "timestamp": "1679123456", "type": message_type}
+    if message_type == "text":
+        message["text"] = {"body": body}
+    return message
+
+def cloud_payload(*message_groups):
+    return {
+        "object": "whatsapp_business_account",
+        "entry": [{
+            "id": "123456789",
+            "changes": [{"value": {"messaging_product": "whatsapp", "messages": messages}, "field": "messages"}]
+        } for messages in message_groups]
+    }
+
+class TestWhatsAppCloudWebhook(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        patient = Patient(name="María García", age=78)
+        db.session.add(patient)
+        db.session.flush()
+        db.session.add(Caregiver(name="Ana Pérez", phone="+5491112345678", patient_id=patient.id))
+        db.session.add(Caregiver(name="Juan Rodríguez", phone="+34698765432", patient_id=patient.id))
+        db.session.commit()
+        webhooks.message_deduplicator.clear()
+        caregiver_resolver.clear()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _post(self, payload):
+        return self.client.post('/api/webhook/whatsapp', json=payload)
+
+    def test_stores_and_enqueues_all_messages_in_payload(self):
+        payload = cloud_payload(
+            [
+                cloud_message("wamid.1", "5491112345678", "Hoy durmió 6 horas"),
+                cloud_message("wamid.2", "5491112345678", "La presión 130/85"),
+                cloud_message("wamid.3", "15550000000", "spam"),
+                cloud_message("wamid.4", "5491112345678", "", message_type="image")
+            ],
+            [
+                cloud_message("wamid.5", "34698765432", "Gastamos 5000 en remedios"),
+                cloud_message("wamid.5", "34698765432", "Gastamos 5000 en remedios")
+            ]
+        )
+
+        response = self._post(payload)
+
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(data["stored"], 3)
+        self.assertEqual(data["unknown_senders"], 1)
+        self.assertEqual(data["ignored"], 1)
+        self.assertEqual(data["duplicates"], 1)
+        self.assertEqual(Message.query.count(), 3)
+        self.assertEqual(ClassificationJob.query.count(), 3)
+
+    def test_messages_without_id_are_kept_and_enqueued_in_order(self):
+        messages = [
+            InboundMessage("whatsapp_cloud", None, "+5491112345678", "Hoy durmió 6 horas"),
+            InboundMessage("whatsapp_cloud", None, "+5491112345678", "La presión 130/85"),
+            InboundMessage("whatsapp_cloud", "wamid.3", "+5491112345678", "Comió poco"),
+            InboundMessage("whatsapp_cloud", "wamid.3", "+5491112345678", "Comió poco")
+        ]
+
+        response, status = webhooks.process_message_batch(messages)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(response.get_json()["stored"], 3)
+        self.assertEqual(response.get_json()["duplicates"], 1)
+        jobs = ClassificationJob.query.order_by(ClassificationJob.id).all()
+        self.assertEqual([job.message.content for job in jobs],
+                         ["Hoy durmió 6 horas", "La presión 130/85", "Comió poco"])
+
+    def test_redelivered_payload_is_not_stored_twice(self):
+        payload = cloud_payload([cloud_message("wamid.1", "5491112345678", "Tomó la medicación")])
+        self._post(payload)
+        webhooks.message_deduplicator.clear()
+
+        response = self._post(payload)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["duplicates"], 1)
+        self.assertEqual(Message.query.count(), 1)
+
+    def test_status_only_payload_is_acknowledged(self):
+        payload = {"object": "whatsapp_business_account", "entry": [{"changes": [{"value": {"statuses": []}}]}]}
+
+        response = self._post(payload)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["received"], 0)
+
+if __name__ == '__main__':
+    unittest.main()